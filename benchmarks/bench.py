@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Benchmark suite for data loading, saving, searching and drawing hot paths.
+Runs under offscreen Qt platform, on a copy of a dataset created by gen_dataset.py
+
+Usage :
+    $ ./gen_dataset.py /tmp/pm-data --products 10000 --purchases 500000
+    $ ./bench.py /tmp/pm-data -o results-0.2.1.json
+    $ ./bench.py /tmp/pm-data --compare results-0.2.1.json
+"""
+import sys, os
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pricemem")
+sys.path.insert(0, PACKAGE_DIR)
+
+# milliseconds from launch to first painted product list, which must not be exceeded
+COLD_START_BUDGET = 1000
+
+# list of (name, setup_func). setup_func(ctx) returns the function to be timed
+benchmarks = []
+
+def benchmark(name):
+    def register(setup_func):
+        benchmarks.append((name, setup_func))
+        return setup_func
+    return register
+
+
+class Context:
+    """ objects shared among benchmarks """
+    app = None
+    window = None
+
+
+# run in a new process, exits as soon as the product list is painted
+COLD_START_SCRIPT = """
+import sys, os
+sys.path.insert(0, %r)
+from PyQt5.QtCore import QEventLoop
+from PyQt5.QtWidgets import QApplication
+import main
+app = QApplication(sys.argv)
+app.setApplicationName("PriceMem")
+main.updateDataPaths()
+window = main.Window()
+while window.productsContainer is None:
+    app.processEvents(QEventLoop.WaitForMoreEvents)
+window.repaint()
+os._exit(0)
+"""
+
+@benchmark("cold start (first painted product list)")
+def bench_cold_start(ctx):
+    cmd = [sys.executable, "-c", COLD_START_SCRIPT % PACKAGE_DIR]
+    return lambda : subprocess.run(cmd, check=True)
+
+@benchmark("python -c 'import core' (headless startup)")
+def bench_import_core(ctx):
+    cmd = [sys.executable, "-c", "import core"]
+    return lambda : subprocess.run(cmd, cwd=PACKAGE_DIR, check=True)
+
+@benchmark("read_products_file")
+def bench_read_products(ctx):
+    return read_products_file
+
+@benchmark("read_purchases_file")
+def bench_read_purchases(ctx):
+    return read_purchases_file
+
+@benchmark("save_products_file")
+def bench_save_products(ctx):
+    return save_products_file
+
+@benchmark("save_purchases_file")
+def bench_save_purchases(ctx):
+    return save_purchases_file
+
+@benchmark("load_data(csv)")
+def bench_load_data_csv(ctx):
+    return lambda : (remove_snapshot(), load_data())
+
+@benchmark("load_data(snapshot)")
+def bench_load_data_snapshot(ctx):
+    # data files modified just before the snapshot are not trusted
+    old = time.time() - 60
+    for filename in data_filenames():
+        if os.path.exists(filename):
+            os.utime(filename, (old, old))
+    save_snapshot()
+    return load_data
+
+@benchmark("save_new_product")
+def bench_save_new_product(ctx):
+    App.last_product_id = App.products and App.products[-1][0] or "P00000"
+    return lambda : save_new_product("Benchmark Item", "Brand", "Grocery", "10", "", "", None)
+
+@benchmark("save_new_purchases")
+def bench_save_new_purchases(ctx):
+    pdt_id = App.products and App.products[0][0] or "P00001"
+    purchases = [["20240101", pdt_id, "Benchmark Item", "2kg", "100"] for i in range(100)]
+    return lambda : save_new_purchases([list(x) for x in purchases])
+
+@benchmark("Window.search")
+def bench_search(ctx):
+    return lambda : (ctx.window.search("rice oil"), wait_for_product_list(ctx))
+
+@benchmark("Window.search(clear)")
+def bench_search_clear(ctx):
+    return lambda : (ctx.window.search(""), wait_for_product_list(ctx))
+
+@benchmark("PurchaseHistoryDialog.updateTable(1 Year)")
+def bench_purchase_history(ctx):
+    dlg = PurchaseHistoryDialog(ctx.window)
+    dlg.filterCombo.setCurrentText("1 Year")
+    return dlg.updateTable
+
+@benchmark("PurchaseHistoryDialog.updateTable(Show All)")
+def bench_purchase_history_all(ctx):
+    dlg = PurchaseHistoryDialog(ctx.window)
+    dlg.filterCombo.setCurrentText("Show All")
+    return dlg.updateTable
+
+@benchmark("ProductHistoryDialog.updateTable")
+def bench_product_history(ctx):
+    # the most frequently purchased product is the worst case
+    counts = {}
+    for row in App.purchases:
+        counts[row[1]] = counts.get(row[1], 0) + 1
+    pdt_id = counts and max(counts, key=counts.get) or ""
+    product = [p for p in App.products if p[0]==pdt_id] or [[pdt_id]]
+    dlg = ProductHistoryDialog(product[0], ctx.window)
+    return dlg.updateTable
+
+@benchmark("Invoice.redraw")
+def bench_invoice_redraw(ctx):
+    invoice = Invoice(None)
+    for i in range(invoice.max_item):
+        invoice.addItem(["Item %d"%i, "2", "10.00", "20.00", ""])
+    return invoice.redraw
+
+
+def wait_for_product_list(ctx):
+    """ wait until all product widgets are created """
+    ctx.app.processEvents()
+    while ctx.window.pending_products:
+        ctx.app.processEvents()
+
+
+def run(func, repeat):
+    """ returns list of durations in seconds """
+    durations = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def summary(durations):
+    durations = sorted(durations)
+    return {"runs": durations, "min": durations[0],
+            "median": durations[len(durations)//2], "max": durations[-1]}
+
+
+def compare(results, old_results, threshold):
+    """ prints comparison table, returns list of regressed benchmark names """
+    regressions = []
+    print("%-45s %10s %10s %8s" % ("Benchmark", "Old (ms)", "New (ms)", "Ratio"))
+    for name, result in results["results"].items():
+        old = old_results["results"].get(name)
+        if not old:
+            print("%-45s %10s %10.2f %8s" % (name, "-", result["min"]*1000, "-"))
+            continue
+        ratio = result["min"]/old["min"] if old["min"] else 1.0
+        mark = ""
+        if ratio > threshold:
+            regressions.append(name)
+            mark = "  <-- regression"
+        print("%-45s %10.2f %10.2f %8.2f%s" % (name, old["min"]*1000, result["min"]*1000, ratio, mark))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PriceMem hot paths")
+    parser.add_argument("data_dir", help="dataset directory created by gen_dataset.py")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of runs per benchmark")
+    parser.add_argument("-k", "--filter", default="", help="run only benchmarks containing this text")
+    parser.add_argument("-o", "--output", help="save results as json in this file (default : stdout)")
+    parser.add_argument("--compare", help="compare with results json of previous version")
+    parser.add_argument("--threshold", type=float, default=1.2,
+            help="slowdown ratio treated as regression (default : 1.2)")
+    parser.add_argument("--cold-start-budget", type=float, default=COLD_START_BUDGET,
+            help="max ms from launch to first painted product list (default : %g)" % COLD_START_BUDGET)
+    args = parser.parse_args()
+
+    # work on a copy, because save_* benchmarks modify the data files
+    work_dir = tempfile.mkdtemp(prefix="pricemem-bench-")
+    data_dir = work_dir + "/PriceMem"
+    os.makedirs(data_dir)
+    for filename in ("products.csv", "purchases.csv"):
+        if os.path.exists(args.data_dir + "/" + filename):
+            shutil.copy(args.data_dir + "/" + filename, data_dir)
+    # images are copied too, as images of old versions are moved into the store
+    for dirname in ("archive", "images"):
+        if os.path.isdir(args.data_dir + "/" + dirname):
+            shutil.copytree(args.data_dir + "/" + dirname, data_dir + "/" + dirname)
+    # keep the user's settings untouched
+    os.environ["XDG_CONFIG_HOME"] = work_dir
+    os.environ["XDG_DATA_HOME"] = work_dir
+
+    global App, QApplication, Invoice, PurchaseHistoryDialog, ProductHistoryDialog
+    global read_products_file, read_purchases_file, save_products_file, save_purchases_file
+    global save_new_product, save_new_purchases
+    global load_data, save_snapshot, remove_snapshot, data_filenames
+    from PyQt5.QtCore import QT_VERSION_STR
+    from PyQt5.QtWidgets import QApplication
+    from common import App
+    from file_io import (read_products_file, read_purchases_file, save_products_file,
+            save_purchases_file, save_new_product, save_new_purchases)
+    from purchase_manager import PurchaseHistoryDialog, ProductHistoryDialog
+    from invoice import Invoice
+    from core import load_data
+    from core.snapshot import save_snapshot, remove_snapshot, data_filenames
+    import main as pricemem_main
+
+    ctx = Context()
+    ctx.app = QApplication(sys.argv)
+    ctx.app.setApplicationName("PriceMem")
+    pricemem_main.updateDataPaths()
+
+    results = {"pricemem_version": pricemem_main.__version__,
+            "python": platform.python_version(), "qt": QT_VERSION_STR,
+            "platform": platform.platform(), "results": {}}
+
+    start = time.perf_counter()
+    App.window = ctx.window = pricemem_main.Window()
+    ctx.app.processEvents()
+    results["results"]["Window.__init__"] = summary([time.perf_counter() - start])
+    # data is loaded in background, and product list is built in batches
+    while not App.data_loaded or ctx.window.pending_products:
+        ctx.app.processEvents()
+    results["results"]["Window.__init__(data loaded)"] = summary([time.perf_counter() - start])
+    results["dataset"] = {"products": len(App.products), "purchases": len(App.purchases)}
+
+    try:
+        for name, setup_func in benchmarks:
+            if args.filter not in name:
+                continue
+            func = setup_func(ctx)
+            results["results"][name] = summary(run(func, args.repeat))
+            print("%-45s %10.2f ms" % (name, results["results"][name]["min"]*1000), file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    elif not args.compare:
+        json.dump(results, sys.stdout, indent=2)
+
+    failed = False
+    cold_start = results["results"].get("cold start (first painted product list)")
+    if cold_start and cold_start["min"]*1000 > args.cold_start_budget:
+        print("Cold start %.0f ms exceeds budget of %g ms" % (cold_start["min"]*1000,
+                args.cold_start_budget), file=sys.stderr)
+        failed = True
+    if args.compare:
+        with open(args.compare) as f:
+            old_results = json.load(f)
+        if compare(results, old_results, args.threshold):
+            failed = True
+    return failed and 1 or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
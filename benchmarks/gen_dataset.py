@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Generates a synthetic shop dataset (products.csv, purchases.csv and product
+images) in PriceMem data format, for benchmarking.
+
+Usage :
+    $ ./gen_dataset.py OUTPUT_DIR --products 100000 --purchases 5000000 --images 1000
+"""
+import sys, os
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+categories = ["Unknown", "Electronics", "Electricals", "Grocery", "Hardware",
+        "Mobile Accessories", "Stationary", "Services"]
+
+words = ["Rice", "Wheat", "Oil", "Sugar", "Salt", "Soap", "Bulb", "Wire", "Switch",
+    "Charger", "Cable", "Pen", "Notebook", "Battery", "Fan", "Holder", "Tape",
+    "Screw", "Nail", "Hammer", "Glue", "Tea", "Coffee", "Biscuit", "Shampoo"]
+
+brands = ["", "Aroma", "Philips", "Havells", "Tata", "Classmate", "Anchor",
+    "Samsung", "Eveready", "Fevicol", "Lux", "Dettol", "Bajaj", "Parle"]
+
+units = ["", "", "kg", "pcs", "m", "L"]
+
+
+def product_name(rnd):
+    name = " ".join(rnd.choice(words) for i in range(rnd.randint(1,3)))
+    size = rnd.randint(1,500)
+    # some names have delimiters, which must be quoted in csv
+    if rnd.random() < 0.05:
+        return '%s, %d"' % (name, size)
+    return "%s %d" % (name, size)
+
+
+def generate_products(filename, count, rnd):
+    """ write products file, returns list of (pdt_id, title, sell_price) """
+    products = []
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        f.write("ID, Name, Brand, Category, Price, Description, Barcode\n")
+        for i in range(1, count+1):
+            pdt_id = "P%05d" % i
+            name, brand = product_name(rnd), rnd.choice(brands)
+            price = rnd.randint(5, 5000)
+            desc = rnd.random() < 0.1 and "Imported; warranty 1 yr" or ""
+            barcode = rnd.random() < 0.5 and "890%010d" % i or ""
+            writer.writerow([pdt_id, name, brand, rnd.choice(categories), str(price), desc, barcode])
+            # same as get_product_title()
+            title = brand and "%s (%s)" % (name, brand) or name
+            products.append((pdt_id, title, price))
+    return products
+
+
+def generate_purchases(filename, count, products, years, rnd):
+    """ write purchases file sorted by date, spread over last few years """
+    end = date.today()
+    start = end - timedelta(days=365*years)
+    days = (end-start).days + 1
+    per_day, extra = divmod(count, days)
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        f.write("Date, Product ID, Deleted Product Title, Quantity, Price\n")
+        for d in range(days):
+            day = (start + timedelta(days=d)).strftime("%Y%m%d")
+            for i in range(per_day + (d < extra)):
+                pdt_id, title, sell_price = rnd.choice(products)
+                qty = rnd.randint(1, 50)
+                rate = sell_price * rnd.uniform(0.6, 0.95)
+                # title is stored only for deleted products
+                writer.writerow([day, pdt_id, "",
+                        "%d%s" % (qty, rnd.choice(units)), "%.2f" % (qty*rate)])
+
+
+def generate_images(images_dir, products, count, rnd):
+    from PyQt5.QtGui import QImage, QColor
+    if not os.path.exists(images_dir):
+        os.makedirs(images_dir)
+    for pdt_id, title, price in rnd.sample(products, min(count, len(products))):
+        img = QImage(256, 256, QImage.Format_RGB32)
+        img.fill(QColor(rnd.randint(0,255), rnd.randint(0,255), rnd.randint(0,255)))
+        img.save(images_dir + "/%s.jpg" % pdt_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate PriceMem benchmark dataset")
+    parser.add_argument("output_dir", help="directory where data files are written")
+    parser.add_argument("--products", type=int, default=100000, help="number of products")
+    parser.add_argument("--purchases", type=int, default=5000000, help="number of purchase rows")
+    parser.add_argument("--images", type=int, default=1000, help="number of product images")
+    parser.add_argument("--years", type=int, default=5, help="purchase history span in years")
+    parser.add_argument("--seed", type=int, default=1, help="random seed, for reproducible data")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+    products = generate_products(args.output_dir + "/products.csv", args.products, rnd)
+    generate_purchases(args.output_dir + "/purchases.csv", args.purchases, products, args.years, rnd)
+    if args.images:
+        generate_images(args.output_dir + "/images", products, args.images, rnd)
+    print("Dataset saved in %s" % args.output_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QDialog, QLabel, QGridLayout, QComboBox, QDialogButtonBox, QTabWidget,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+
+from core.common import get_product_title, to_readable_date
+from core.history import get_date_range, get_purchase_titles
+from core.analytics import get_monthly_spend, get_top_products, get_margins
+from core.profiler import timed
+
+# number of products shown in top products
+TOP_PRODUCTS_COUNT = 50
+
+
+def create_table(parent, headers):
+    table = QTableWidget(parent)
+    table.setAlternatingRowColors(True)
+    table.setColumnCount(len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+    table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+    table.verticalHeader().setDefaultSectionSize(25)
+    table.setEditTriggers(QTableWidget.NoEditTriggers)
+    return table
+
+def fill_table(table, rows):
+    """ set rows of texts in table, first column is left aligned """
+    table.setRowCount(len(rows))
+    for row, row_data in enumerate(rows):
+        for col, text in enumerate(row_data):
+            item = QTableWidgetItem(text)
+            if col:
+                item.setTextAlignment(Qt.AlignCenter)
+            table.setItem(row, col, item)
+
+
+class AnalyticsDialog(QDialog):
+    """ spend by month, top products and margins """
+    def __init__(self, parent):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle("Reports")
+        self.resize(640, 480)
+
+        filterLabel = QLabel("Filter :", self)
+        self.filterCombo = QComboBox(self)
+        self.filterCombo.addItems(["1 Month", "6 Months", "1 Year", "Show All"])
+        self.filterCombo.setCurrentIndex(2)
+        groupLabel = QLabel("Spend by :", self)
+        self.groupCombo = QComboBox(self)
+        self.groupCombo.addItem("Category", "category")
+        self.groupCombo.addItem("Brand", "brand")
+        self.tabWidget = QTabWidget(self)
+        self.spendTable = create_table(self, ["Month", "Name", "Spend"])
+        self.topProductsTable = create_table(self, ["Product", "Spend"])
+        self.marginsTable = create_table(self, ["Product", "Sell Price", "Purchase Rate",
+                                                "Margin", "Margin %"])
+        self.tabWidget.addTab(self.spendTable, "Monthly Spend")
+        self.tabWidget.addTab(self.topProductsTable, "Top Products")
+        self.tabWidget.addTab(self.marginsTable, "Margins")
+        self.btnBox = QDialogButtonBox(QDialogButtonBox.Close, Qt.Horizontal, self)
+
+        layout = QGridLayout(self)
+        layout.addWidget(filterLabel, 0,0,1,1)
+        layout.addWidget(self.filterCombo, 0,1,1,1)
+        layout.addWidget(groupLabel, 0,2,1,1)
+        layout.addWidget(self.groupCombo, 0,3,1,1)
+        layout.addWidget(self.tabWidget, 1,0,1,5)
+        layout.addWidget(self.btnBox, 2,0,1,5)
+        layout.setColumnStretch(4, 1)
+
+        self.filterCombo.currentIndexChanged.connect(self.updateReports)
+        self.groupCombo.currentIndexChanged.connect(self.updateReports)
+        self.btnBox.accepted.connect(self.accept)
+        self.btnBox.rejected.connect(self.reject)
+
+        self.updateReports()
+        self.updateMargins()
+
+    def updateReports(self):
+        """ update spend reports of selected period """
+        start_date, end_date = get_date_range(self.filterCombo.currentText())
+        field = self.groupCombo.currentData()
+        empty_text = "No Category" if field=="category" else "No Brand"
+        rows = []
+        spend = get_monthly_spend(field, start_date, end_date)
+        # latest month first, and highest spend first in a month
+        for month in sorted(spend, reverse=True):
+            totals = sorted(spend[month].items(), key=lambda item : item[1], reverse=True)
+            month = to_readable_date(month + "01")[3:]
+            rows += [[month, value is None and "Deleted Products" or value or empty_text,
+                        "%.2f" % total] for value, total in totals]
+        fill_table(self.spendTable, rows)
+        titles = get_purchase_titles()
+        top = get_top_products(start_date, end_date, TOP_PRODUCTS_COUNT)
+        fill_table(self.topProductsTable, [[titles.get(pdt_id, pdt_id), "%.2f" % total]
+                                            for pdt_id, total in top])
+
+    @timed("AnalyticsDialog.updateMargins")
+    def updateMargins(self):
+        """ margins are of current price, so not filtered by period """
+        fill_table(self.marginsTable, [[get_product_title(product), product[4],
+                        "%g" % round(rate, 2), "%g" % margin, "%g" % percent]
+                        for product, rate, margin, percent in get_margins()])
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" charts drawn with QPainter """
+from datetime import datetime
+
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+
+from core.common import to_readable_date
+
+PURCHASE_RATE_COLOR = QColor("#1f5fbf")
+SELL_PRICE_COLOR = QColor("#e07000")
+
+
+def date_to_days(date):
+    """ returns day number of YYYYMMDD date, or None if invalid """
+    try:
+        return datetime.strptime(date, "%Y%m%d").toordinal()
+    except ValueError:
+        return None
+
+
+class PriceChart(QWidget):
+    """ purchase rates as points joined by line, and sell price as steps """
+    def __init__(self, parent):
+        QWidget.__init__(self, parent)
+        self.setMinimumHeight(160)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        self.rates = []
+        self.sell_prices = []
+
+    def setData(self, rates, sell_prices):
+        """ rates is list of (date, rate) of purchases, sell_prices is list of
+        (date, price) of sell price versions, dates are YYYYMMDD """
+        self.rates = [(date_to_days(date), rate) for date, rate in rates if date_to_days(date)]
+        self.sell_prices = []
+        for date, price in sell_prices:
+            try:
+                self.sell_prices.append((date_to_days(date), float(price)))
+            except ValueError:
+                pass
+        self.update()
+
+    def paintEvent(self, ev):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), Qt.white)
+        today = datetime.today().toordinal()
+        days = [day for day, value in self.rates + self.sell_prices if day] + [today]
+        values = [value for day, value in self.rates + self.sell_prices]
+        if not values:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No purchases")
+            return
+        first_day = min(days)
+        low, high = min(values), max(values)
+        margin, text_height = 8, painter.fontMetrics().height()
+        left = painter.fontMetrics().width("%g" % high) + 2*margin
+        area = QRectF(left, margin + text_height, self.width() - left - margin,
+                        self.height() - 2*margin - 2*text_height)
+        x_scale = area.width() / max(today - first_day, 1)
+        y_scale = area.height() / ((high - low) or 1)
+        def point(day, value):
+            return QPointF(area.left() + (day - first_day)*x_scale,
+                            area.bottom() - (value - low)*y_scale)
+        # axes and labels
+        painter.setPen(QColor("#999999"))
+        painter.drawLine(area.bottomLeft(), area.bottomRight())
+        painter.drawLine(area.bottomLeft(), area.topLeft())
+        painter.setPen(Qt.black)
+        painter.drawText(QRectF(0, area.top() - text_height/2, left - margin, text_height),
+                            Qt.AlignRight, "%g" % high)
+        painter.drawText(QRectF(0, area.bottom() - text_height/2, left - margin, text_height),
+                            Qt.AlignRight, "%g" % low)
+        for day, align in ((first_day, Qt.AlignLeft), (today, Qt.AlignRight)):
+            date = to_readable_date(datetime.fromordinal(day).strftime("%Y%m%d"))
+            painter.drawText(QRectF(area.left(), area.bottom(), area.width(), text_height),
+                                align, date)
+        # sell price is effective from a version until next version,
+        # the version of unknown date is drawn from start
+        steps = []
+        for i, (day, price) in enumerate(self.sell_prices):
+            if i:
+                steps.append(point(day or first_day, self.sell_prices[i-1][1]))
+            steps.append(point(day or first_day, price))
+        if steps:
+            steps.append(QPointF(area.right(), steps[-1].y()))
+            painter.setPen(QPen(SELL_PRICE_COLOR, 2))
+            painter.drawPolyline(QPolygonF(steps))
+        if self.rates:
+            points = [point(day, rate) for day, rate in sorted(self.rates)]
+            painter.setPen(QPen(PURCHASE_RATE_COLOR, 1.5))
+            painter.drawPolyline(QPolygonF(points))
+            painter.setBrush(PURCHASE_RATE_COLOR)
+            for p in points:
+                painter.drawEllipse(p, 2.5, 2.5)
+        # legend
+        painter.setPen(PURCHASE_RATE_COLOR)
+        painter.drawText(QPointF(left, margin + text_height*0.8), "Purchase Rate")
+        painter.setPen(SELL_PRICE_COLOR)
+        painter.drawText(QPointF(left + painter.fontMetrics().width("Purchase Rate") + 2*margin,
+                            margin + text_height*0.8), "Sell Price")
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Qt independent core of PriceMem : product and purchase data, storage, search
+and aggregation. The GUI is a client of this package, and it can also be used
+from batch scripts without loading PyQt5, eg.
+
+    from pricemem.core import App, set_data_dir, load_data, search_products
+    set_data_dir("/path/to/PriceMem")
+    load_data()
+    print(search_products("rice"))
+"""
+from .common import (App, set_data_dir, get_product_title, get_quantity_number,
+    is_valid_date, to_sortable_date, to_readable_date, notify_data_changed
+)
+from .file_io import *
+from .stock import build_stock_ledger, get_stock, get_stock_text
+from .search import search_products
+from .facets import get_facet_counts, get_categories, filter_products
+from .barcodes import get_product_by_barcode
+from .ordering import SORT_ORDERS, sort_products
+from .history import (get_date_range, get_purchases, get_product_history,
+    get_purchase_titles, get_purchase_title, get_purchase_on
+)
+from .prices import get_price_versions, get_sell_price_on, apply_price_versions
+from .analytics import get_monthly_spend, get_top_products, get_margins
+from .forecast import get_reorder_report, get_reorder_date
+from .repricing import REPRICE_RULES, preview_repricing, apply_repricing
+from .images import get_image_path, set_product_image, set_product_images, migrate_images
+from .replication import load_replication
+from .snapshot import load_snapshot, save_snapshot
+from .archive import archive_cutoff_date
+
+
+def load_data(progress=None):
+    """ load all data files into App, or the snapshot of them if unchanged.
+    progress(stage) is called with 'products' when products are loaded, and with
+    'purchases' when purchases, sales and stock are also loaded. so a GUI loading
+    data in other thread can show products before the rest is loaded """
+    migrate_products()
+    snapshot = load_snapshot()
+    if not snapshot:
+        App.products = read_products_file()
+        App.deleted_products = read_deleted_products_file()
+    # prices changed without rewriting products file
+    apply_price_versions()
+    if progress:
+        progress("products")
+    if not snapshot:
+        migrate_purchases()
+        App.purchases = read_purchases_file()
+        build_stock_ledger(read_sales_file())
+    # the snapshot was of archived data, unless a year has been closed after that
+    if not snapshot or snapshot["archived_cutoff"]!=archive_cutoff_date():
+        archive_closed_years()
+        save_snapshot()
+    # ids of deleted products which are in purchases or sales are not reused,
+    # all of them have entry in stock ledger
+    App.last_product_id = "P00000"
+    update_last_product_id(App.products + [[pdt_id] for pdt_id in App.stock]
+                        + [[pdt_id] for pdt_id in App.deleted_products])
+    load_replication()
+    migrate_images()
+    notify_data_changed("reload", None, False)
+    if progress:
+        progress("purchases")
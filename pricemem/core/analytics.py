@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Spend and margin reports.
+
+Spend of purchases is rolled up per month as {month : {pdt_id : spend}},
+where month is YYYYMM. Reports of a period by category, brand or product are
+summed from the rollups of its months, so a report of many years adds up
+a few thousand numbers instead of going through all purchase rows.
+
+The rollup of loaded purchases (of open years, see archive.py) is built on
+first report, then kept up to date as purchases are added or deleted. The
+rollup of an archived year is computed once, and saved in
+ARCHIVE_DIR/rollups.pickle along with the index entry of the year. It is
+computed again only if the segment of that year changes. That file is only
+a cache, and can be deleted anytime.
+"""
+import os
+import pickle
+
+from .common import App, data_listeners
+from .archive import get_index, iter_archived_purchases
+from .history import get_last_rate
+from .profiler import timed
+
+# fields of products by which spend is reported
+SPEND_FIELDS = {"brand": 2, "category": 3}
+
+
+class Analytics:
+    # {month : {pdt_id : spend}} of loaded purchases
+    months = {}
+    # App.purchases of which the rollup is built
+    purchases = None
+    # {year : (index entry, {month : {pdt_id : spend}})} of archived years
+    archived = {}
+    # the rollups file which has been loaded in archived
+    filename = None
+
+
+def rollups_filename():
+    return App.ARCHIVE_DIR + "/rollups.pickle"
+
+
+def parse_price(price):
+    try:
+        return float(price)
+    except ValueError:# invalid price is not counted
+        return 0.0
+
+def add_spend(months, rows, sign=1):
+    """ add spend of purchase rows to {month : {pdt_id : spend}} """
+    for row in rows:
+        spends = months.get(row[0][:6])
+        if spends is None:
+            spends = months[row[0][:6]] = {}
+        spends[row[1]] = spends.get(row[1], 0) + sign*parse_price(row[4])
+
+
+@timed("build_spend_rollup")
+def build_spend_rollup():
+    months = {}
+    add_spend(months, App.purchases)
+    Analytics.months, Analytics.purchases = months, App.purchases
+
+def on_data_changed(op, data, local):
+    if op=="reload":
+        Analytics.purchases = None
+    # the rollup was not up to date before this change
+    if Analytics.purchases is None:
+        return
+    if op=="add_purchases":
+        add_spend(Analytics.months, data)
+    elif op=="delete_purchases":
+        # deleted rows may be of archive, whose rollups are checked by index entry
+        deleted = len(Analytics.purchases) - len(App.purchases)
+        if deleted==len(data):
+            add_spend(Analytics.months, data, -1)
+        elif deleted:
+            Analytics.purchases = None
+            return
+    Analytics.purchases = App.purchases
+
+data_listeners.append(on_data_changed)
+
+
+def load_archived_rollups():
+    if Analytics.filename==rollups_filename():
+        return
+    try:
+        with open(rollups_filename(), "rb") as f:
+            archived = pickle.load(f)
+    except Exception:# not exists, or corrupted
+        archived = {}
+    Analytics.archived, Analytics.filename = archived, rollups_filename()
+
+@timed("get_archived_rollups")
+def get_archived_rollups(start_year, end_year):
+    """ returns {year : {month : {pdt_id : spend}}} of archived years in range """
+    load_archived_rollups()
+    index, result, changed = get_index(), {}, False
+    for year, entry in index.items():
+        if not start_year <= year <= end_year:
+            continue
+        cached = Analytics.archived.get(year)
+        if not cached or cached[0]!=entry:
+            months = {}
+            add_spend(months, iter_archived_purchases(year + "0101", year + "1231"))
+            cached = Analytics.archived[year] = (entry, months)
+            changed = True
+        result[year] = cached[1]
+    if changed:
+        # rollups of years which are not in archive anymore are not kept
+        Analytics.archived = {year: Analytics.archived[year] for year in index
+                                    if year in Analytics.archived}
+        tmp_filename = "%s.%d.tmp" % (rollups_filename(), os.getpid())
+        try:
+            with open(tmp_filename, "wb") as f:
+                pickle.dump(Analytics.archived, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_filename, rollups_filename())
+        except OSError:
+            pass
+    return result
+
+
+def get_month_rollups(start_date=None, end_date=None):
+    """ returns list of (month, {pdt_id : spend}) of months between two YYYYMMDD
+    dates, including the months of those dates. a month may be repeated, as
+    purchases of a closed year may also be in loaded purchases """
+    start_month = (start_date or "0")[:6]
+    end_month = (end_date or "9")[:6]
+    if Analytics.purchases is not App.purchases:
+        build_spend_rollup()
+    rollups = [item for item in Analytics.months.items() if start_month<=item[0]<=end_month]
+    for months in get_archived_rollups(start_month[:4], end_month[:4]).values():
+        rollups += [item for item in months.items() if start_month<=item[0]<=end_month]
+    return rollups
+
+
+@timed("get_monthly_spend")
+def get_monthly_spend(field, start_date=None, end_date=None):
+    """ returns {month : {value : spend}} where field is 'category' or 'brand'.
+    value is None for deleted products """
+    column = SPEND_FIELDS[field]
+    values = {product[0]: product[column] for product in App.products}
+    result = {}
+    for month, spends in get_month_rollups(start_date, end_date):
+        totals = result.setdefault(month, {})
+        for pdt_id, spend in spends.items():
+            value = values.get(pdt_id)
+            totals[value] = totals.get(value, 0) + spend
+    return {month: {value: round(spend, 2) for value, spend in totals.items() if round(spend, 2)}
+                for month, totals in result.items()}
+
+@timed("get_top_products")
+def get_top_products(start_date=None, end_date=None, count=10):
+    """ returns list of (pdt_id, spend) of the products on which most has been
+    spent in the period, in decreasing order of spend """
+    totals = {}
+    for month, spends in get_month_rollups(start_date, end_date):
+        for pdt_id, spend in spends.items():
+            totals[pdt_id] = totals.get(pdt_id, 0) + spend
+    # spend of deleted purchases may be left as zero
+    totals = [(pdt_id, round(spend, 2)) for pdt_id, spend in totals.items() if round(spend, 2)]
+    return sorted(totals, key=lambda item : item[1], reverse=True)[:count]
+
+@timed("get_margins")
+def get_margins():
+    """ returns list of [product, rate, margin, margin percent] of products having
+    valid price and purchased in open years, where margin is current sell price
+    minus rate of last purchase. the lowest margin percent comes first """
+    margins = []
+    for product in App.products:
+        rate = get_last_rate(product[0])
+        price = parse_price(product[4])
+        if rate is None or price<=0:
+            continue
+        margin = price - rate
+        margins.append([product, rate, round(margin, 2), round(100*margin/price, 2)])
+    margins.sort(key=lambda item : item[3])
+    return margins
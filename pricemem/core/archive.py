@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Compressed archive of purchases of closed years.
+
+Purchases older than the last OPEN_YEARS years are moved from purchases.csv
+to one lzma compressed segment per year (ARCHIVE_DIR/purchases-YYYY.csv.xz),
+so they are neither parsed on start nor rewritten on every save. A segment is
+decompressed, as a stream, only by the queries which reach into its year.
+
+ARCHIVE_DIR/index.json keeps {year : {"file", "rows", "stock", "normalized"}}
+where stock is {pdt_id : total purchased quantity}, so the stock ledger and
+product history do not need to open the segments.
+"""
+import os
+import csv
+import json
+import lzma
+from datetime import datetime
+
+from .common import App, get_quantity_number, normalize_purchase
+from .locking import FileLock
+from .profiler import timed
+
+# current year and the previous years which are kept in purchases.csv
+OPEN_YEARS = 2
+
+
+class Archive:
+    # cached index, and the index file and its modification time
+    index = {}
+    filename = None
+    mtime = None
+
+
+def index_filename():
+    return App.ARCHIVE_DIR + "/index.json"
+
+def segment_filename(year):
+    return App.ARCHIVE_DIR + "/purchases-%s.csv.xz" % year
+
+
+def get_index():
+    """ returns {year : {"file", "rows", "stock"}}, reloaded if changed by other instance """
+    filename = index_filename()
+    try:
+        mtime = os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        Archive.index, Archive.filename, Archive.mtime = {}, None, None
+        return Archive.index
+    # the data directory may have been changed
+    if (filename, mtime)!=(Archive.filename, Archive.mtime):
+        with open(filename) as f:
+            Archive.index = json.load(f)
+        Archive.filename, Archive.mtime = filename, mtime
+    return Archive.index
+
+def save_index(index):
+    tmp_filename = "%s.%d.tmp" % (index_filename(), os.getpid())
+    with open(tmp_filename, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_filename, index_filename())
+    Archive.index, Archive.filename = index, index_filename()
+    Archive.mtime = os.stat(index_filename()).st_mtime_ns
+
+
+def archive_cutoff_date():
+    """ purchases before this YYYYMMDD date are archived """
+    return "%d0101" % (datetime.today().year - OPEN_YEARS + 1)
+
+def is_archivable(row, cutoff):
+    return len(row[0])==8 and row[0].isdigit() and row[0] < cutoff
+
+
+def read_segment(year):
+    """ generator of purchase rows in segment, decompressed as a stream """
+    try:
+        with lzma.open(segment_filename(year), "rt", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                if len(row)==5:
+                    yield row
+    except FileNotFoundError:
+        return
+
+def write_segment(year, rows):
+    """ write the whole segment from list or iterator of rows, and returns its index entry """
+    stock = {}
+    count = 0
+    tmp_filename = "%s.%d.tmp" % (segment_filename(year), os.getpid())
+    with lzma.open(tmp_filename, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        for row in rows:
+            writer.writerow(row)
+            stock[row[1]] = stock.get(row[1], 0) + get_quantity_number(row[3])
+            count += 1
+    os.replace(tmp_filename, segment_filename(year))
+    return {"file": os.path.basename(segment_filename(year)), "rows": count,
+            "stock": stock, "normalized": True}
+
+
+@timed("archive_purchases")
+def archive_purchases(rows):
+    """ add rows of closed years to their segments.
+    must be called with the archive locked, i.e inside FileLock(index_filename()) """
+    years = {}
+    for row in rows:
+        years.setdefault(row[0][:4], []).append(row)
+    index = dict(get_index())
+    for year, year_rows in years.items():
+        if year in index:
+            year_rows = list(read_segment(year)) + year_rows
+        year_rows.sort(key=lambda x : x[0])
+        index[year] = write_segment(year, year_rows)
+    save_index(index)
+
+
+def delete_archived_purchases(rows):
+    """ delete the rows from segments, returns list of deleted rows """
+    deleted = []
+    years = {}
+    for row in rows:
+        years.setdefault(row[0][:4], []).append(row)
+    with FileLock(index_filename()):
+        index = dict(get_index())
+        for year, year_rows in years.items():
+            if year not in index:
+                continue
+            segment_rows = list(read_segment(year))
+            for row in year_rows:
+                if row in segment_rows:
+                    segment_rows.remove(row)
+                    deleted.append(row)
+            if len(segment_rows)==index[year]["rows"]:
+                continue
+            if segment_rows:
+                index[year] = write_segment(year, segment_rows)
+            else:
+                os.remove(segment_filename(year))
+                del index[year]
+        if deleted:
+            save_index(index)
+    return deleted
+
+
+def normalize_segments(product_titles):
+    """ remove titles of existing products from segments written by old versions.
+    each segment is converted as a stream """
+    if all(entry.get("normalized") for entry in get_index().values()):
+        return
+    with FileLock(index_filename()):
+        index = dict(get_index())
+        for year, entry in index.items():
+            if not entry.get("normalized"):
+                rows = (normalize_purchase(row, product_titles) for row in read_segment(year))
+                index[year] = write_segment(year, rows)
+        save_index(index)
+
+
+def iter_archived_purchases(start_date=None, end_date=None, pdt_id=None):
+    """ generator of archived purchases between two YYYYMMDD dates (both inclusive),
+    of all products or of one product. only the segments of those years are read """
+    start_date = start_date or "0"
+    end_date = end_date or "9"
+    for year, entry in sorted(get_index().items()):
+        if not start_date[:4] <= year <= end_date[:4]:
+            continue
+        if pdt_id and pdt_id not in entry["stock"]:
+            continue
+        for row in read_segment(year):
+            if start_date<=row[0]<=end_date and (not pdt_id or row[1]==pdt_id):
+                yield row
+
+
+def get_archived_stock():
+    """ returns {pdt_id : total purchased quantity} of all archived purchases """
+    stock = {}
+    for entry in get_index().values():
+        for pdt_id, quantity in entry["stock"].items():
+            stock[pdt_id] = stock.get(pdt_id, 0) + quantity
+    return stock
+
+
+def get_archived_count():
+    return sum(entry["rows"] for entry in get_index().values())
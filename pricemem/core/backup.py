@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Incremental backups of the data directory.
+
+Each backup is a full copy of the data directory in DATA_DIR/backups/DATE-TIME,
+but a file which is unchanged since the previous backup is hard linked to the
+file of that backup instead of being copied. So the images, which are rarely
+changed, are stored once however many backups are made.
+
+A file is unchanged if its size and modification time are same as of the file
+in previous backup (those are copied with the file). An image is unchanged if
+a file of same name exists, because the name is the hash of the content (see
+images.py).
+
+On restore the files in subdirectories (images, archive) are hard linked from
+the backup, because those are only replaced, never modified in place. The data
+files in the data directory itself are copied, as new rows are appended to them.
+The replication files are not restored, as the deltas already sent to other
+nodes can not be taken back.
+"""
+import os
+import time
+import shutil
+from contextlib import nullcontext
+
+from .common import App, notify_data_changed
+from .file_io import file_states
+from .locking import FileLock
+from .snapshot import remove_snapshot, RACY_TIME_NS
+from .prices import prices_filename
+from . import images, archive
+
+# files which are not backed up
+SKIPPED_FILES = ("backups", "snapshot.pickle", "rollups.pickle")
+# files which are not restored (see replication.py)
+REPLICATION_FILES = ("node_id", "deltas.log", "sync_state.json")
+
+
+def backups_dir():
+    return App.DATA_DIR + "/backups"
+
+def list_backups():
+    """ returns names of backups, oldest first """
+    if not os.path.isdir(backups_dir()):
+        return []
+    return sorted(name for name in os.listdir(backups_dir())
+                    if not name.endswith(".tmp"))
+
+
+def lock_data_file(path):
+    """ returns the lock taken while the file or directory is written """
+    if path==App.IMAGES_DIR:
+        return FileLock(images.index_filename())
+    if path==App.ARCHIVE_DIR:
+        return FileLock(archive.index_filename())
+    if path in (App.PRODUCTS_FILE, App.PURCHASES_FILE, App.SALES_FILE,
+                App.DELETED_PRODUCTS_FILE, prices_filename()):
+        return FileLock(path)
+    return nullcontext()
+
+def list_data_files(data_dir):
+    """ returns names of files and directories in data_dir to be backed up """
+    return sorted(name for name in os.listdir(data_dir) if name not in SKIPPED_FILES
+                    and not name.endswith((".lock", ".tmp")))
+
+
+def backup_file(src, dst, prev, prev_time, stats):
+    """ copy src to dst, or hard link the file prev of previous backup if it
+    is same as src. a directory is backed up recursively """
+    if os.path.isdir(src):
+        os.mkdir(dst)
+        for name in list_data_files(src):
+            backup_file(src + "/" + name, dst + "/" + name,
+                        prev and prev + "/" + name, prev_time, stats)
+        return
+    if prev and os.path.isfile(prev):
+        st, prev_st = os.stat(src), os.stat(prev)
+        unchanged = os.path.dirname(src)==App.IMAGES_DIR and src.endswith(".jpg") or (
+                    (st.st_size, st.st_mtime_ns)==(prev_st.st_size, prev_st.st_mtime_ns)
+                    # may have been modified again without change of mtime
+                    and st.st_mtime_ns < prev_time - RACY_TIME_NS)
+        if unchanged:
+            try:
+                os.link(prev, dst)
+                stats["linked"] += 1
+                return
+            except OSError:# file system does not support hard links
+                pass
+    shutil.copy2(src, dst)
+    stats["copied"] += 1
+
+
+def backup_data(label=""):
+    """ make a new backup, label is appended to its name. returns the name of
+    backup and {"copied", "linked"} number of files """
+    name = time.strftime("%Y%m%d-%H%M%S") + (label and "-" + label)
+    backups = list_backups()
+    prev_name = backups and backups[-1]
+    while name in backups:# more than one backup in a second
+        name += "+"
+    prev = prev_name and backups_dir() + "/" + prev_name
+    prev_time = prev and os.stat(prev).st_mtime_ns
+    tmp_dir = "%s/%s.tmp" % (backups_dir(), name)
+    os.makedirs(tmp_dir)
+    stats = {"copied": 0, "linked": 0}
+    try:
+        for filename in list_data_files(App.DATA_DIR):
+            src = App.DATA_DIR + "/" + filename
+            # so that a file is not copied while other instance is writing it
+            with lock_data_file(src):
+                backup_file(src, tmp_dir + "/" + filename,
+                            prev and prev + "/" + filename, prev_time, stats)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    # an incomplete backup is never listed
+    os.rename(tmp_dir, backups_dir() + "/" + name)
+    return name, stats
+
+
+def link_files(src_dir, dst_dir):
+    """ hard link the files of backup directory into data directory """
+    for name in os.listdir(src_dir):
+        try:
+            os.link(src_dir + "/" + name, dst_dir + "/" + name)
+        except OSError:# file system does not support hard links
+            shutil.copy2(src_dir + "/" + name, dst_dir + "/" + name)
+
+def remove_file(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def restore_backup(name):
+    """ replace the data files with those of the backup, and load them """
+    from . import load_data
+    backup_dir = backups_dir() + "/" + name
+    if not name or not os.path.isdir(backup_dir):
+        raise FileNotFoundError("Backup '%s' does not exist" % name)
+    filenames = set(list_data_files(backup_dir)) | set(list_data_files(App.DATA_DIR))
+    for filename in sorted(filenames - set(REPLICATION_FILES)):
+        path = App.DATA_DIR + "/" + filename
+        src = backup_dir + "/" + filename
+        with lock_data_file(path):
+            if os.path.isdir(path) or os.path.isdir(src):
+                # the lock file may be inside the directory, so only its content is removed
+                os.makedirs(path, exist_ok=True)
+                for entry in list_data_files(path):
+                    remove_file(path + "/" + entry)
+                if os.path.isdir(src):
+                    link_files(src, path)
+            else:
+                remove_file(path)
+                if os.path.exists(src):
+                    shutil.copy2(src, path)
+    remove_snapshot()
+    file_states.clear()
+    load_data()
+    notify_data_changed("reload", None)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="PriceMem data backup")
+    parser.add_argument("--data-dir", default=App.DATA_DIR, help="PriceMem data directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backup", help="make a new backup")
+    subparsers.add_parser("list", help="show names of backups")
+    cmd = subparsers.add_parser("restore", help="restore data from a backup")
+    cmd.add_argument("name", help="name of backup")
+    args = parser.parse_args()
+
+    from . import set_data_dir
+    set_data_dir(args.data_dir)
+    if args.command=="backup":
+        name, stats = backup_data()
+        print("Backup %s : copied %d, linked %d files" % (name, stats["copied"], stats["linked"]))
+    elif args.command=="list":
+        for name in list_backups():
+            print(name)
+    else:
+        restore_backup(args.name)
+        print("Restored %s" % args.name)
+
+
+if __name__ == "__main__":
+    main()
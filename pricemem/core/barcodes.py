@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Index of products by barcode (or SKU), so that a scanned code is found
+without scanning all products.
+
+The index is {barcode : {pdt_id : product}}, as two products may have been
+given same barcode by mistake. Like facets.py, it is updated when a product
+is added, edited or deleted, and built again if App.products has been loaded
+without notification.
+"""
+from .common import App, data_listeners
+
+
+class Barcodes:
+    # {barcode : {pdt_id : product}}
+    index = {}
+    # {pdt_id : barcode} as indexed, so that old barcode of an edited product is known
+    barcodes = {}
+    # the product list of which the index is built
+    products = None
+
+
+def build_barcodes():
+    index, barcodes = {}, {}
+    for product in App.products:
+        if product[6]:
+            index.setdefault(product[6], {})[product[0]] = product
+            barcodes[product[0]] = product[6]
+    Barcodes.index, Barcodes.barcodes = index, barcodes
+    Barcodes.products = App.products
+
+
+def remove_from_barcodes(pdt_id):
+    barcode = Barcodes.barcodes.pop(pdt_id, None)
+    if barcode is None:
+        return
+    products = Barcodes.index[barcode]
+    del products[pdt_id]
+    if not products:
+        del Barcodes.index[barcode]
+
+def add_to_barcodes(product):
+    if product[6]:
+        Barcodes.index.setdefault(product[6], {})[product[0]] = product
+        Barcodes.barcodes[product[0]] = product[6]
+
+
+def on_data_changed(op, data, local):
+    if op not in ("add_product", "edit_product", "delete_product"):
+        if op=="reload":
+            Barcodes.products = None
+        return
+    # the index was not up to date before this change
+    if Barcodes.products is None:
+        return
+    remove_from_barcodes(data[0])
+    if op!="delete_product":
+        add_to_barcodes(data)
+    Barcodes.products = App.products
+
+data_listeners.append(on_data_changed)
+
+
+def get_product_by_barcode(barcode):
+    """ returns the product having the barcode, or None """
+    if Barcodes.products is not App.products:
+        build_barcodes()
+    products = Barcodes.index.get(barcode.strip())
+    return products and next(iter(products.values())) or None
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" client for the price lookup server (see server.py) """
+import os
+import json
+from urllib.request import urlopen, Request
+from urllib.parse import urlencode
+
+
+class PriceClient:
+    def __init__(self, url, timeout=5, token=None):
+        """ url is like 'http://192.168.1.10:8421'. token required by the server for
+        POST requests may be given in url like 'TOKEN@192.168.1.10:8421' """
+        if "://" not in url:
+            url = "http://" + url
+        scheme, address = url.split("://", 1)
+        if "@" in address:
+            url_token, address = address.split("@", 1)
+            token = token or url_token
+        self.url = (scheme + "://" + address).rstrip("/")
+        self.timeout = timeout
+        self.token = token or os.environ.get("PRICEMEM_SERVER_TOKEN", "")
+
+    def get(self, path, **query):
+        url = self.url + path + (query and "?" + urlencode(query) or "")
+        with urlopen(url, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def post(self, path, data):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = "Bearer " + self.token
+        request = Request(self.url + path, data=json.dumps(data).encode("utf-8"), headers=headers)
+        with urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def products(self):
+        """ all products, in same format as App.products """
+        return [product_from_dict(p) for p in self.get("/products")]
+
+    def search(self, text):
+        return [product_from_dict(p) for p in self.get("/search", q=text)]
+
+    def product(self, pdt_id):
+        """ product details as dict, including stock """
+        return self.get("/product", id=pdt_id)
+
+    def price(self, pdt_id):
+        return self.get("/price", id=pdt_id)["price"]
+
+    def history(self, pdt_id):
+        return self.get("/history", id=pdt_id)
+
+    def saveNewPurchases(self, purchases):
+        return self.post("/purchases", {"purchases": purchases})
+
+    def saveNewSales(self, sales):
+        return self.post("/sales", {"sales": sales})
+
+
+def product_from_dict(p):
+    # servers of old versions do not send barcode
+    return [p["id"], p["name"], p["brand"], p["category"], p["price"], p["description"],
+            p.get("barcode", "")]
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+import os
+import re
+import calendar
+from datetime import datetime
+
+# container for global variables. the lists and dicts of data are replaced by
+# new ones on change instead of being modified, so that threads reading them
+# (e.g price server) always see a consistent state
+class App:
+    # Various Data paths (overridden on app start)
+    DATA_DIR =       os.path.expanduser("~/.local/share/PriceMem")
+    IMAGES_DIR =     DATA_DIR + "/images"
+    PRODUCTS_FILE =  DATA_DIR + "/products.csv"
+    PURCHASES_FILE = DATA_DIR + "/purchases.csv"
+    SALES_FILE =     DATA_DIR + "/sales.csv"
+    DELETED_PRODUCTS_FILE = DATA_DIR + "/deleted_products.csv"
+    ARCHIVE_DIR =    DATA_DIR + "/archive"
+    # each item is [pdt_id, name, brand, category, price, description, barcode]
+    products = []
+    # each item is [date, pdt_id, title, quantity, price]. title is empty if it is
+    # the title of the product, then it is shown from App.products (see
+    # history.get_purchase_title). otherwise it is the title at time of purchase.
+    # purchases of closed years are not loaded, those are in the archive (see archive.py)
+    purchases = []
+    # title of products deleted after purchases were normalized, {pdt_id : title}
+    deleted_products = {}
+    # stock on hand, {pdt_id : quantity}
+    stock = {}
+    last_product_id = "P00000"
+    # appended to ids of new products, so that replication nodes (see replication.py)
+    # do not generate same id, e.g '-3fa2b1' in 'P00012-3fa2b1'
+    product_id_suffix = ""
+    # product category of last added new product
+    last_category = "Unknown"
+
+
+# functions called as func(op, data, local) after data is changed. op is one of
+# 'add_product', 'edit_product', 'delete_product' (data is the product),
+# 'add_purchases', 'delete_purchases', 'add_sales' (data is list of rows),
+# 'reload' (data files were reloaded fully, data is None).
+# local is False when the change was made by other instance or replication.
+data_listeners = []
+
+def notify_data_changed(op, data, local=True):
+    for func in data_listeners:
+        func(op, data, local)
+
+
+def set_data_dir(data_dir):
+    """ set the directory where all data files are stored """
+    App.DATA_DIR = data_dir
+    App.IMAGES_DIR = App.DATA_DIR + "/images"
+    App.PRODUCTS_FILE = App.DATA_DIR + "/products.csv"
+    App.PURCHASES_FILE = App.DATA_DIR + "/purchases.csv"
+    App.SALES_FILE = App.DATA_DIR + "/sales.csv"
+    App.DELETED_PRODUCTS_FILE = App.DATA_DIR + "/deleted_products.csv"
+    App.ARCHIVE_DIR = App.DATA_DIR + "/archive"
+
+
+def get_product_title(product):
+    """ get title in 'NAME (BRAND)' format """
+    s = "%s" % product[1]# name
+    s += product[2] and " (%s)"%product[2] or ""# brand
+    return s
+
+def find_product(pdt_id):
+    """ returns the product having the id, or None """
+    for product in App.products:
+        if product[0]==pdt_id:
+            return product
+
+def product_id_number(pdt_id):
+    """ returns 12 for 'P00012' or 'P00012-3fa2b1', or 0 if the id is not in this format """
+    try:
+        return int(pdt_id[1:].split("-")[0])
+    except ValueError:
+        return 0
+
+def get_product_titles():
+    """ returns {pdt_id : title} of existing products """
+    return {product[0]: get_product_title(product) for product in App.products}
+
+def normalize_purchase(row, product_titles):
+    """ title is removed from purchase row if it is same as title of the product.
+    it is kept if the product does not exist or the id was used for other item
+    (ids were reused after clearing products in old versions) """
+    if row[2] and product_titles.get(row[1])==row[2]:
+        row[2] = ""
+    return row
+
+
+# matches 1 or 1kg or 1.0kg or 1.0 kg
+quantity_re = re.compile("(\d+([.]\d+)?)\D*")
+
+def get_quantity_number(text):
+    """ returns 1.0 from 1.0kg """
+    match = quantity_re.match(text)
+    if match:
+        return float(match.group(1))
+    else:
+        return 1
+
+
+def is_valid_date(date):
+    try:
+        datetime.strptime(date, "%d/%m/%Y")
+        return True
+    except:
+        return False
+
+# equivalent to datetime.strptime(date, "%d/%m/%Y").strftime("%Y%m%d")
+def to_sortable_date(date):
+    """ convert from human readable DD/MM/YYYY to sortable YYYYMMDD format """
+    return date[6:] + date[3:5] + date[:2]
+
+def to_readable_date(date):
+    """ convert from sortable YYYYMMDD to human readable DD/MM/YYYY format """
+    return "%s/%s/%s" % (date[6:], date[4:6], date[:4])
+
+def monthdelta(date, delta):
+    m, y = (date.month+delta) % 12, date.year + ((date.month)+delta-1) // 12
+    m = m or 12
+    d = min(date.day, calendar.monthrange(y, m)[1])
+    return date.replace(day=d,month=m, year=y).strftime("%Y%m%d")
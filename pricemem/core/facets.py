@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Index of products by category and brand, so that the product list can be
+filtered by them and the number of products of each can be shown without
+scanning all products.
+
+The index is {field : {value : {pdt_id : product}}}. It is updated when a
+product is added, edited or deleted (see common.data_listeners), and built
+again if App.products has been loaded without notification (e.g by load_data).
+"""
+from .common import App, data_listeners
+
+# facet name and index of the product field
+FACET_FIELDS = {"category": 3, "brand": 2}
+
+
+class Facets:
+    # {field : {value : {pdt_id : product}}}
+    index = {}
+    # {pdt_id : (category, brand)} as indexed, so that old values of an edited
+    # product are known
+    values = {}
+    # the product list of which the index is built
+    products = None
+
+
+def build_facets():
+    index = {field: {} for field in FACET_FIELDS}
+    values = {}
+    for product in App.products:
+        for field, i in FACET_FIELDS.items():
+            index[field].setdefault(product[i], {})[product[0]] = product
+        values[product[0]] = tuple(product[i] for i in FACET_FIELDS.values())
+    Facets.index, Facets.values = index, values
+    Facets.products = App.products
+
+def get_facets():
+    if Facets.products is not App.products:
+        build_facets()
+    return Facets.index
+
+
+def remove_from_facets(pdt_id):
+    old_values = Facets.values.pop(pdt_id, None)
+    if old_values is None:
+        return
+    for field, value in zip(FACET_FIELDS, old_values):
+        products = Facets.index[field][value]
+        del products[pdt_id]
+        if not products:
+            del Facets.index[field][value]
+
+def add_to_facets(product):
+    for field, i in FACET_FIELDS.items():
+        Facets.index[field].setdefault(product[i], {})[product[0]] = product
+    Facets.values[product[0]] = tuple(product[i] for i in FACET_FIELDS.values())
+
+
+def on_data_changed(op, data, local):
+    if op not in ("add_product", "edit_product", "delete_product"):
+        if op=="reload":
+            Facets.products = None
+        return
+    # the index was not up to date before this change
+    if Facets.products is None:
+        return
+    remove_from_facets(data[0])
+    if op!="delete_product":
+        add_to_facets(data)
+    Facets.products = App.products
+
+data_listeners.append(on_data_changed)
+
+
+def get_facet_counts(field):
+    """ returns {value : number of products} of the field e.g 'category' """
+    return {value: len(products) for value, products in get_facets()[field].items()}
+
+def get_categories():
+    """ returns categories of all products, sorted """
+    return sorted(get_facets()["category"])
+
+
+def filter_products(products=None, category=None, brand=None):
+    """ returns the products having the category and brand, None means any.
+    products is a list to filter (e.g search result), by default all products """
+    index = get_facets()
+    selected = [index[field].get(value, {}) for field, value in
+                    (("category", category), ("brand", brand)) if value is not None]
+    if not selected:
+        return App.products if products is None else products
+    if products is None:
+        selected.sort(key=len)
+        return [product for pdt_id, product in selected[0].items()
+                    if all(pdt_id in ids for ids in selected[1:])]
+    return [product for product in products if all(product[0] in ids for ids in selected)]
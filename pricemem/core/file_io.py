@@ -0,0 +1,484 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+import os, shutil
+import io
+import csv
+import locale
+import gc
+from contextlib import contextmanager
+from .common import (App, notify_data_changed, get_product_title, normalize_purchase,
+    find_product, product_id_number, get_product_titles
+)
+from .stock import build_stock_ledger, add_stock, remove_stock
+from .profiler import timed
+from .locking import FileLock
+from .images import remove_product_images
+from .archive import (archive_cutoff_date, is_archivable, archive_purchases,
+    delete_archived_purchases, index_filename, normalize_segments
+)
+
+def csv_string(text):
+    """ quotes string for csv when required """
+    delimiters = (",", ";", "\t", '"', "\n", "\r")# double quote and newline are not delimiter
+    for d in delimiters:
+        if d in text:
+            # double quote inside string should be replaced with two double quotes
+            return '"%s"' % text.replace('"', '""')
+    return text
+
+
+# header lines of data files
+PRODUCTS_HEADER = "ID, Name, Brand, Category, Price, Description, Barcode\n"
+# old versions had no barcode column
+OLD_PRODUCTS_HEADER = "ID, Name, Brand, Category, Price, Description\n"
+# title is stored only for deleted products. old versions stored title of
+# every product, with header "Date, Product ID, Title, Quantity, Price"
+PURCHASES_HEADER = "Date, Product ID, Deleted Product Title, Quantity, Price\n"
+SALES_HEADER = "Date, Invoice No, Product ID, Quantity, Price\n"
+DELETED_PRODUCTS_HEADER = "ID, Title\n"
+
+# {filename : (offset, signature)}, the position upto which a file has been read
+# or written by us, and the bytes just before that position. if the signature
+# bytes are unchanged, the file has only been appended by other instances.
+file_states = {}
+SIGNATURE_SIZE = 64
+
+
+def remember_file_state(filename, offset):
+    with open(filename, "rb") as f:
+        start = max(0, offset-SIGNATURE_SIZE)
+        f.seek(start)
+        file_states[filename] = (offset, f.read(offset-start))
+
+
+@contextmanager
+def gc_paused():
+    """ parsing creates millions of lists, and each few hundred of them trigger
+    the cyclic garbage collector, which then scans all the rows created so far.
+    rows never have reference cycles, so it only slows down parsing """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_csv_file(filename, row_len):
+    """ read all rows having row_len columns, except the header line """
+    try:
+        with open(filename) as f, gc_paused():
+            reader = csv.reader(f)
+            next(reader, None)# ignore the header line
+            rows = [row for row in reader if len(row)==row_len]
+            # at end of file, so this is the file size
+            remember_file_state(filename, f.buffer.tell())
+            return rows
+    except FileNotFoundError:
+        file_states.pop(filename, None)
+        return []
+
+
+def read_new_csv_rows(filename, row_len):
+    """ returns rows appended to the file since it was last read or written by us,
+    or None if the file has been rewritten, and needs to be read again fully """
+    state = file_states.get(filename)
+    if not state:
+        return None if os.path.exists(filename) else []
+    offset, signature = state
+    try:
+        with open(filename, "rb") as f:
+            f.seek(offset-len(signature))
+            if f.read(len(signature))!=signature:
+                return None
+            data = f.read()
+    except FileNotFoundError:
+        file_states.pop(filename)
+        return None
+    # the last line may be incomplete, if it is being written now
+    data = data[:data.rfind(b"\n")+1]
+    if not data:
+        return []
+    file_states[filename] = (offset+len(data), (signature+data)[-SIGNATURE_SIZE:])
+    text = data.decode(locale.getpreferredencoding(False))
+    return [row for row in csv.reader(io.StringIO(text)) if len(row)==row_len]
+
+
+def write_csv_file(filename, header, rows):
+    """ write whole file with header line and rows, through a temporary file.
+    must be called with the file locked, after loading the changes made by other
+    instances, otherwise those would be overwritten """
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    tmp_filename = "%s.%d.tmp" % (filename, os.getpid())
+    with open(tmp_filename, "w") as f:
+        f.write(header)
+        for item in rows:
+            f.write(",".join(map(csv_string, item)) + "\n")
+    os.replace(tmp_filename, filename)
+    remember_file_state(filename, os.path.getsize(filename))
+
+
+def append_csv_rows(filename, header, rows):
+    """ append rows to file, the file is created with header line if not exists.
+    must be called with the file locked, after loading rows appended by others """
+    if not os.path.exists(App.DATA_DIR):
+        os.makedirs(App.DATA_DIR)
+    with open(filename, "a") as f:
+        start = os.fstat(f.fileno()).st_size
+        if start==0:
+            f.write(header)
+        for item in rows:
+            f.write(",".join(map(csv_string, item)) + "\n")
+        f.flush()
+        end = os.fstat(f.fileno()).st_size
+    state = file_states.get(filename)
+    if start==0 or state and state[0]==start:
+        remember_file_state(filename, end)
+
+
+@timed("read_products_file")
+def read_products_file():
+    """ read products file and return list of products """
+    return read_csv_file(App.PRODUCTS_FILE, 7)
+
+
+@timed("save_products_file")
+def save_products_file(change=None):
+    """ save whole products data into products file. products changed by other
+    instances are loaded first under the lock, then change() is called to make
+    our change on the latest data. returns what change() returns """
+    with FileLock(App.PRODUCTS_FILE):
+        sync_products()
+        result = change and change()
+        write_csv_file(App.PRODUCTS_FILE, PRODUCTS_HEADER, App.products)
+    return result
+
+@timed("save_new_product")
+def save_new_product(name, brand, category, price, description, barcode=""):
+    """ append new product data to products file """
+    with FileLock(App.PRODUCTS_FILE):
+        # products added by other instances must be loaded before generating id,
+        # so the id is always greater than all ids in the file
+        sync_products()
+        # existing products file is corrupted, or none of the data files exist.
+        # checked under the lock, as other instance may be creating the file now
+        if not App.products and (os.path.exists(App.PRODUCTS_FILE)
+                or not os.path.exists(App.PURCHASES_FILE)):
+            remove_products_data()# resets pdt_id and deletes images
+        pdt_id = "P%05d%s" % (product_id_number(App.last_product_id)+1, App.product_id_suffix)
+
+        item = [pdt_id, name, brand, category, price, description, barcode]
+        append_csv_rows(App.PRODUCTS_FILE, PRODUCTS_HEADER, [item])
+    App.products = App.products + [item]
+    App.last_product_id = pdt_id
+    notify_data_changed("add_product", item)
+    return item
+
+def update_product(product, name, brand, category, price, description, barcode=None):
+    """ change details of the product in place, and save products file.
+    if only the price is changed, it is only appended to prices file.
+    barcode is not changed if None """
+    from .prices import save_price_change
+    if barcode is None:
+        barcode = product[6]
+    values = [name, brand, category, price, description, barcode]
+    if price!=product[4]:
+        save_price_change(product[0], product[4], price)
+        current = find_product(product[0])
+        # products file is rewritten only if other details are changed, or
+        # the product has been deleted by other instance
+        if current and values[:3]+values[4:]==product[1:4]+product[5:]:
+            current[4] = product[4] = price
+            notify_data_changed("edit_product", current)
+            return
+    def change():
+        # the product list may have been reloaded, or product deleted by other instance
+        current = find_product(product[0])
+        if not current:
+            current = list(product)
+            App.products = App.products + [current]
+        current[1:] = values
+        return current
+    current = save_products_file(change)
+    product[1:] = values
+    notify_data_changed("edit_product", current)
+
+def delete_product(product):
+    def change():
+        App.products = [item for item in App.products if item[0]!=product[0]]
+    save_products_file(change)
+    remember_deleted_products([product])
+    remove_product_images([product[0]])
+    notify_data_changed("delete_product", product)
+
+def remember_deleted_products(products):
+    """ keep titles of deleted products for showing their purchases """
+    rows = [[product[0], get_product_title(product)] for product in products]
+    if not rows:
+        return
+    with FileLock(App.DELETED_PRODUCTS_FILE):
+        append_csv_rows(App.DELETED_PRODUCTS_FILE, DELETED_PRODUCTS_HEADER, rows)
+    deleted_products = dict(App.deleted_products)
+    deleted_products.update(rows)
+    App.deleted_products = deleted_products
+
+def read_deleted_products_file():
+    """ returns {pdt_id : title} """
+    return dict(read_csv_file(App.DELETED_PRODUCTS_FILE, 2))
+
+def sync_deleted_products():
+    """ load titles of products deleted by other instances.
+    returns True if App.deleted_products has changed """
+    rows = read_new_csv_rows(App.DELETED_PRODUCTS_FILE, 2)
+    if rows is None:
+        App.deleted_products = read_deleted_products_file()
+        return True
+    if rows:
+        deleted_products = dict(App.deleted_products)
+        deleted_products.update(rows)
+        App.deleted_products = deleted_products
+    return bool(rows)
+
+def sync_products():
+    """ load products added or changed by other instances.
+    returns True if App.products has changed """
+    rows = read_new_csv_rows(App.PRODUCTS_FILE, 7)
+    if rows is None:
+        from .prices import apply_price_versions
+        App.products = read_products_file()
+        apply_price_versions()
+        App.deleted_products = read_deleted_products_file()
+        update_last_product_id(App.products)
+        notify_data_changed("reload", None, False)
+        return True
+    if rows:
+        App.products = App.products + rows
+    update_last_product_id(rows)
+    for item in rows:
+        notify_data_changed("add_product", item, False)
+    return bool(rows)
+
+def update_last_product_id(products):
+    """ ids of deleted products are not reused, so last id is never decreased """
+    last = product_id_number(App.last_product_id)
+    for item in products:
+        number = product_id_number(item[0])
+        if number > last:
+            App.last_product_id, last = item[0], number
+
+
+
+
+@timed("read_purchases_file")
+def read_purchases_file():
+    return read_csv_file(App.PURCHASES_FILE, 5)
+
+@timed("save_purchases_file")
+def save_purchases_file(change=None):
+    """ save whole purchases data into purchases file, sorted by date. like
+    save_products_file(), change() is called after loading changes of others """
+    with FileLock(App.PURCHASES_FILE):
+        sync_purchases()
+        result = change and change()
+        App.purchases = sorted(App.purchases, key=lambda x : x[0])
+        write_csv_file(App.PURCHASES_FILE, PURCHASES_HEADER, App.purchases)
+    return result
+
+
+@timed("save_new_purchases")
+def save_new_purchases(purchases):
+    """ append purchases to purchases file. titles same as the product are removed """
+    product_titles = get_product_titles()
+    for item in purchases:
+        normalize_purchase(item, product_titles)
+    with FileLock(App.PURCHASES_FILE):
+        sync_purchases()
+        append_csv_rows(App.PURCHASES_FILE, PURCHASES_HEADER, purchases)
+    App.purchases = App.purchases + purchases
+    add_stock([(item[1], item[3]) for item in purchases])
+    notify_data_changed("add_purchases", purchases)
+
+def delete_purchases(purchases):
+    """ remove the purchase items and save the purchases file. items of closed
+    years may be in archive. returns list of deleted items, those removed from
+    App.purchases first """
+    deleted, archived = [], []
+    with FileLock(App.PURCHASES_FILE):
+        sync_purchases()
+        remaining = list(App.purchases)
+        for item in purchases:
+            try:
+                remaining.remove(item)
+                deleted.append(item)
+            except ValueError:
+                archived.append(item)
+        if deleted:
+            App.purchases = remaining
+            write_csv_file(App.PURCHASES_FILE, PURCHASES_HEADER, App.purchases)
+    if archived:
+        deleted += delete_archived_purchases(archived)
+    remove_stock([(item[1], item[3]) for item in deleted])
+    if deleted:
+        notify_data_changed("delete_purchases", deleted)
+    return deleted
+
+def sync_purchases():
+    """ load purchases added or changed by other instances.
+    returns True if App.purchases has changed """
+    rows = read_new_csv_rows(App.PURCHASES_FILE, 5)
+    if rows is None:
+        App.purchases = read_purchases_file()
+        build_stock_ledger(read_sales_file())
+        notify_data_changed("reload", None, False)
+        return True
+    if rows:
+        App.purchases = App.purchases + rows
+    add_stock([(item[1], item[3]) for item in rows])
+    if rows:
+        notify_data_changed("add_purchases", rows, False)
+    return bool(rows)
+
+
+def read_header(filename):
+    try:
+        with open(filename) as f:
+            return f.readline()
+    except FileNotFoundError:
+        return ""
+
+@timed("migrate_products")
+def migrate_products():
+    """ add empty barcode column to products file of old format """
+    if read_header(App.PRODUCTS_FILE)!=OLD_PRODUCTS_HEADER:
+        return
+    with FileLock(App.PRODUCTS_FILE):
+        if read_header(App.PRODUCTS_FILE)!=OLD_PRODUCTS_HEADER:
+            return# converted by other instance
+        tmp_filename = "%s.%d.tmp" % (App.PRODUCTS_FILE, os.getpid())
+        with open(App.PRODUCTS_FILE) as f, open(tmp_filename, "w") as tmp:
+            reader = csv.reader(f)
+            next(reader, None)
+            tmp.write(PRODUCTS_HEADER)
+            for item in reader:
+                if len(item)==6:
+                    item.append("")
+                tmp.write(",".join(map(csv_string, item)) + "\n")
+        os.replace(tmp_filename, App.PRODUCTS_FILE)
+        file_states.pop(App.PRODUCTS_FILE, None)
+
+@timed("migrate_purchases")
+def migrate_purchases():
+    """ convert purchases file and archive of old format, where every row has
+    product title, to normalized format. the file is converted as a stream """
+    product_titles = get_product_titles()
+    normalize_segments(product_titles)
+    if read_header(App.PURCHASES_FILE) in (PURCHASES_HEADER, ""):
+        return
+    with FileLock(App.PURCHASES_FILE):
+        if read_header(App.PURCHASES_FILE)==PURCHASES_HEADER:
+            return# converted by other instance
+        tmp_filename = "%s.%d.tmp" % (App.PURCHASES_FILE, os.getpid())
+        with open(App.PURCHASES_FILE) as f, open(tmp_filename, "w") as tmp:
+            reader = csv.reader(f)
+            next(reader, None)
+            tmp.write(PURCHASES_HEADER)
+            for item in reader:
+                if len(item)==5:
+                    normalize_purchase(item, product_titles)
+                tmp.write(",".join(map(csv_string, item)) + "\n")
+        os.replace(tmp_filename, App.PURCHASES_FILE)
+        file_states.pop(App.PURCHASES_FILE, None)
+
+
+def archive_closed_years():
+    """ move purchases of closed years from purchases file to compressed archive.
+    returns number of archived items """
+    cutoff = archive_cutoff_date()
+    if not any(is_archivable(row, cutoff) for row in App.purchases):
+        return 0
+    def change():
+        rows = [row for row in App.purchases if is_archivable(row, cutoff)]
+        if rows:
+            archive_purchases(rows)
+            App.purchases = [row for row in App.purchases if not is_archivable(row, cutoff)]
+        return len(rows)
+    # the archive is locked first, as other instance may be archiving the same rows
+    with FileLock(index_filename()):
+        return save_purchases_file(change)
+
+
+@timed("read_sales_file")
+def read_sales_file():
+    """ read sales file and return list of [date, invoice_no, pdt_id, quantity, price] """
+    return read_csv_file(App.SALES_FILE, 5)
+
+@timed("save_new_sales")
+def save_new_sales(sales):
+    """ append sold items of a finalized invoice to sales file """
+    with FileLock(App.SALES_FILE):
+        sync_sales()
+        append_csv_rows(App.SALES_FILE, SALES_HEADER, sales)
+    remove_stock([(item[2], item[3]) for item in sales])
+    notify_data_changed("add_sales", sales)
+
+def sync_sales():
+    """ update stock with sales saved by other instances.
+    returns True if stock has changed """
+    rows = read_new_csv_rows(App.SALES_FILE, 5)
+    if rows is None:
+        build_stock_ledger(read_sales_file())
+        return True
+    remove_stock([(item[2], item[3]) for item in rows])
+    if rows:
+        notify_data_changed("add_sales", rows, False)
+    return bool(rows)
+
+
+def clear_products_data():
+    with FileLock(App.PRODUCTS_FILE):
+        remove_products_data()
+    notify_data_changed("reload", None)
+
+def remove_products_data():
+    """ must be called with products file locked """
+    from .prices import remove_price_versions
+    # delete products file
+    if os.path.exists(App.PRODUCTS_FILE):
+        os.remove(App.PRODUCTS_FILE)
+    file_states.pop(App.PRODUCTS_FILE, None)
+    # delete images
+    if os.path.exists(App.IMAGES_DIR):
+        shutil.rmtree(App.IMAGES_DIR)
+    remove_price_versions()
+    # purchases of the products are kept, so are their titles
+    if App.purchases or os.path.exists(App.ARCHIVE_DIR):
+        remember_deleted_products(App.products)
+    # reset last product id, ids in purchases and sales are not reused
+    App.products = []
+    App.last_product_id = "P00000"
+    update_last_product_id([[pdt_id] for pdt_id in App.stock])
+
+def clear_purchases_data():
+    # delete purchases file
+    with FileLock(App.PURCHASES_FILE):
+        if os.path.exists(App.PURCHASES_FILE):
+            os.remove(App.PURCHASES_FILE)
+    file_states.pop(App.PURCHASES_FILE, None)
+    App.purchases = []
+    with FileLock(index_filename()):
+        if os.path.exists(App.ARCHIVE_DIR):
+            shutil.rmtree(App.ARCHIVE_DIR)
+    # titles of deleted products were kept only for purchases
+    with FileLock(App.DELETED_PRODUCTS_FILE):
+        if os.path.exists(App.DELETED_PRODUCTS_FILE):
+            os.remove(App.DELETED_PRODUCTS_FILE)
+    file_states.pop(App.DELETED_PRODUCTS_FILE, None)
+    App.deleted_products = {}
+    # only the sold quantities are left in the ledger
+    build_stock_ledger(read_sales_file())
+    notify_data_changed("reload", None)
+
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Reorder suggestions, from how often and how much each product is purchased.
+
+A product purchased at least twice is used up at the rate of quantity
+purchased before the last purchase, divided by days from first to last
+purchase. So the quantity of last purchase is expected to run out after
+that quantity divided by the daily usage.
+
+Only loaded purchases (of open years, see archive.py) are used. Forecast of
+a product is cached with its list of purchase rows, which is replaced only
+when its purchases change (see history.py). So after the first report, only
+the products purchased since then are computed again.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+
+from .common import App, get_quantity_number
+from .history import get_product_purchases
+from .profiler import timed
+
+
+# the same few quantity texts (e.g '1', '5kg') are in most purchases
+quantity_number = lru_cache(maxsize=4096)(get_quantity_number)
+
+
+class Forecasts:
+    # {pdt_id : (purchase rows, forecast)}
+    cache = {}
+
+
+def date_to_day(text):
+    """ returns day number of YYYYMMDD date """
+    return date(int(text[:4]), int(text[4:6]), int(text[6:8])).toordinal()
+
+def forecast_purchases(rows):
+    """ returns forecast of purchase rows of a product sorted by date as
+    {"count", "interval", "quantity", "daily_usage", "last_date", "run_out_date"}
+    interval is average days between purchases, quantity is average quantity
+    per purchase. returns None if it can not be estimated """
+    if len(rows) < 2:
+        return None
+    try:
+        first, last = date_to_day(rows[0][0]), date_to_day(rows[-1][0])
+    except ValueError:# invalid date
+        return None
+    quantities = [quantity_number(row[3]) for row in rows]
+    # all purchased on same day, or nothing used
+    if last==first or not sum(quantities[:-1]):
+        return None
+    daily_usage = sum(quantities[:-1]) / (last - first)
+    run_out = last + int(quantities[-1] / daily_usage)
+    return {
+        "count": len(rows),
+        "interval": (last - first) / (len(rows) - 1),
+        "quantity": sum(quantities) / len(rows),
+        "daily_usage": daily_usage,
+        "last_date": rows[-1][0],
+        "run_out_date": date.fromordinal(min(run_out, date.max.toordinal())).strftime("%Y%m%d"),
+    }
+
+
+@timed("get_reorder_report")
+def get_reorder_report(until_date=None):
+    """ returns list of (product, forecast) of products which are expected to run
+    out on or before YYYYMMDD date (all if None), the earliest running out first """
+    cache, forecasts = Forecasts.cache, {}
+    result = []
+    for product in App.products:
+        rows = get_product_purchases(product[0])
+        cached = cache.get(product[0])
+        if cached is None or cached[0] is not rows:
+            cached = (rows, forecast_purchases(rows))
+        forecasts[product[0]] = cached
+        forecast = cached[1]
+        if forecast and (until_date is None or forecast["run_out_date"] <= until_date):
+            result.append((product, forecast))
+    # forecasts of deleted products are not kept
+    Forecasts.cache = forecasts
+    result.sort(key=lambda item : item[1]["run_out_date"])
+    return result
+
+def get_reorder_date(days):
+    """ returns YYYYMMDD date after days from today, for get_reorder_report() """
+    return (date.today() + timedelta(days=days)).strftime("%Y%m%d")
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" purchase history queries """
+from bisect import bisect_right
+from datetime import datetime
+from itertools import chain
+
+from .common import App, data_listeners, get_quantity_number, get_product_titles, monthdelta
+from .archive import iter_archived_purchases, archive_cutoff_date
+
+
+def get_date_range(date_filter):
+    """ returns (start_date, end_date) in YYYYMMDD format for filters
+    '1 Month', '6 Months' and '1 Year'. returns (None,None) for 'Show All' """
+    months = {"1 Month": 1, "6 Months": 6, "1 Year": 12}
+    if date_filter not in months:
+        return None, None
+    today = datetime.today()
+    return monthdelta(today, -months[date_filter]), today.strftime("%Y%m%d")
+
+
+def get_purchases(start_date=None, end_date=None):
+    """ purchases between two YYYYMMDD dates (both inclusive), sorted by date.
+    the archive is read only if start date is in a closed year """
+    purchases = App.purchases
+    if start_date or end_date:
+        start_date = start_date or "0"
+        end_date = end_date or "9"
+        purchases = filter(lambda x : start_date<=x[0]<=end_date, purchases)
+    if not start_date or start_date < archive_cutoff_date():
+        purchases = chain(iter_archived_purchases(start_date, end_date), purchases)
+    return sorted(purchases, key=lambda x : x[0])
+
+
+def get_purchase_titles():
+    """ returns {pdt_id : title} of existing and deleted products """
+    titles = dict(App.deleted_products)
+    titles.update(get_product_titles())
+    return titles
+
+def get_purchase_title(row, titles):
+    """ title of product of a purchase row, titles is from get_purchase_titles() """
+    return row[2] or titles.get(row[1]) or row[1]
+
+
+# index of loaded purchases by product, so that history of a product is found
+# without scanning all purchases. a product's list is replaced on change, so
+# that anything derived from it (e.g a drawn sparkline) can be cached by identity
+class ProductPurchases:
+    # {pdt_id : purchase rows sorted by date}
+    index = {}
+    # {pdt_id : dates of the rows}, for binary search
+    dates = {}
+    # App.purchases of which the index is built
+    purchases = None
+
+
+def build_product_purchases():
+    index = {}
+    for row in sorted(App.purchases, key=lambda x : x[0]):
+        index.setdefault(row[1], []).append(row)
+    ProductPurchases.index = index
+    ProductPurchases.dates = {pdt_id: [row[0] for row in rows] for pdt_id, rows in index.items()}
+    ProductPurchases.purchases = App.purchases
+
+def get_product_purchases(pdt_id):
+    """ returns loaded purchase rows of the product sorted by date. the same
+    list is returned until purchases of the product change """
+    if ProductPurchases.purchases is not App.purchases:
+        build_product_purchases()
+    return ProductPurchases.index.get(pdt_id, [])
+
+
+def update_product_purchases(pdt_id, added=(), deleted=()):
+    rows = list(ProductPurchases.index.get(pdt_id, []))
+    for row in deleted:
+        if row in rows:
+            rows.remove(row)
+    dates = [row[0] for row in rows]
+    for row in added:
+        i = bisect_right(dates, row[0])
+        rows.insert(i, row)
+        dates.insert(i, row[0])
+    if rows:
+        ProductPurchases.index[pdt_id] = rows
+        ProductPurchases.dates[pdt_id] = dates
+    else:
+        ProductPurchases.index.pop(pdt_id, None)
+        ProductPurchases.dates.pop(pdt_id, None)
+
+def on_data_changed(op, data, local):
+    if op=="reload":
+        ProductPurchases.purchases = None
+    if ProductPurchases.purchases is None or op not in ("add_purchases", "delete_purchases"):
+        return
+    rows_of_product = {}
+    for row in data:
+        rows_of_product.setdefault(row[1], []).append(row)
+    for pdt_id, rows in rows_of_product.items():
+        if op=="add_purchases":
+            update_product_purchases(pdt_id, added=rows)
+        else:
+            update_product_purchases(pdt_id, deleted=rows)
+    ProductPurchases.purchases = App.purchases
+
+data_listeners.append(on_data_changed)
+
+
+def get_rate(row):
+    """ price per unit quantity of purchase row """
+    return float(row[4])/get_quantity_number(row[3])
+
+def get_last_rate(pdt_id):
+    """ returns rate of last loaded purchase of the product, or None """
+    for row in reversed(get_product_purchases(pdt_id)):
+        try:
+            return get_rate(row)
+        except (ValueError, ZeroDivisionError):# invalid price or quantity
+            pass
+    return None
+
+def get_purchase_on(pdt_id, date):
+    """ returns the last purchase of the product on or before YYYYMMDD date as
+    [date, quantity, price, rate], or None if not purchased till then """
+    rows = get_product_purchases(pdt_id)
+    i = bisect_right(ProductPurchases.dates.get(pdt_id, []), date)
+    if i:
+        row = rows[i-1]
+    else:
+        # not in loaded purchases, so it may be in archive
+        row = None
+        for archived in iter_archived_purchases(end_date=date, pdt_id=pdt_id):
+            if not row or archived[0] >= row[0]:
+                row = archived
+        if not row:
+            return None
+    return [row[0], row[3], row[4], get_rate(row)]
+
+def get_product_history(pdt_id):
+    """ purchases of a product sorted by date. each item is
+    [date, quantity, price, rate], rate is price per unit quantity """
+    purchases = chain(iter_archived_purchases(pdt_id=pdt_id), get_product_purchases(pdt_id))
+    purchases = sorted(purchases, key=lambda x : x[0])
+    return [[row[0], row[3], row[4], get_rate(row)] for row in purchases]
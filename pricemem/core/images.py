@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Content addressed store of product images.
+
+Each image is saved once as IMAGES_DIR/HASH.jpg, where HASH is sha1 of the
+encoded image, so products having same photo share one file. IMAGES_DIR/index.json
+keeps {pdt_id : HASH}. The number of products referring to a file is counted
+from the index, and the file is removed when no product refers to it.
+
+Images are given as encoded bytes, so this module does not need Qt. The GUI
+encodes them (see pricemem/images.py).
+"""
+import os
+import json
+import hashlib
+from collections import Counter
+
+from .common import App
+from .locking import FileLock
+
+
+class Images:
+    # cached index, and the index file and its modification time
+    index = {}
+    filename = None
+    mtime = None
+
+
+def index_filename():
+    return App.IMAGES_DIR + "/index.json"
+
+def image_filename(digest):
+    return App.IMAGES_DIR + "/%s.jpg" % digest
+
+
+def get_index():
+    """ returns {pdt_id : hash}, reloaded if changed by other instance """
+    filename = index_filename()
+    try:
+        mtime = os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        Images.index, Images.filename, Images.mtime = {}, None, None
+        return Images.index
+    if (filename, mtime)!=(Images.filename, Images.mtime):
+        with open(filename) as f:
+            Images.index = json.load(f)
+        Images.filename, Images.mtime = filename, mtime
+    return Images.index
+
+def save_index(index):
+    tmp_filename = "%s.%d.tmp" % (index_filename(), os.getpid())
+    with open(tmp_filename, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_filename, index_filename())
+    Images.index, Images.filename = index, index_filename()
+    Images.mtime = os.stat(index_filename()).st_mtime_ns
+
+
+def get_image_path(pdt_id):
+    """ returns filename of product image, or None if it has no image """
+    digest = get_index().get(pdt_id)
+    return digest and image_filename(digest)
+
+def get_reference_counts():
+    """ returns {hash : number of products having the image} """
+    return Counter(get_index().values())
+
+
+def set_product_images(images):
+    """ images is {pdt_id : jpeg data}, data None removes image of the product """
+    with FileLock(index_filename()):
+        index = dict(get_index())
+        for pdt_id, data in images.items():
+            if data is None:
+                index.pop(pdt_id, None)
+                continue
+            digest = hashlib.sha1(data).hexdigest()
+            if not os.path.exists(image_filename(digest)):
+                tmp_filename = "%s.%d.tmp" % (image_filename(digest), os.getpid())
+                with open(tmp_filename, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_filename, image_filename(digest))
+            index[pdt_id] = digest
+        # remove the files no longer referred
+        counts = Counter(index.values())
+        for digest in set(get_index().values()):
+            if not counts[digest] and os.path.exists(image_filename(digest)):
+                os.remove(image_filename(digest))
+        save_index(index)
+
+def set_product_image(pdt_id, data):
+    set_product_images({pdt_id: data})
+
+def remove_product_images(pdt_ids):
+    images = {pdt_id: None for pdt_id in pdt_ids if pdt_id in get_index()}
+    if images:
+        set_product_images(images)
+
+
+def migrate_images():
+    """ move images saved by old versions as IMAGES_DIR/PDT_ID.jpg into the store """
+    if not os.path.isdir(App.IMAGES_DIR) or os.path.exists(index_filename()):
+        return
+    with FileLock(index_filename()):
+        if os.path.exists(index_filename()):
+            return# moved by other instance
+        index = {}
+        for filename in os.listdir(App.IMAGES_DIR):
+            pdt_id, ext = os.path.splitext(filename)
+            if ext!=".jpg":
+                continue
+            filename = App.IMAGES_DIR + "/" + filename
+            with open(filename, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            if os.path.exists(image_filename(digest)):
+                os.remove(filename)
+            else:
+                os.replace(filename, image_filename(digest))
+            index[pdt_id] = digest
+        # the index is created even if there is no image, so this is done only once
+        save_index(index)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Advisory file locking across processes, so that multiple PriceMem instances
+can safely write in a shared data directory. A lock is taken on a separate
+FILENAME.lock file, and is released automatically if the process dies.
+"""
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:# Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT = 10# seconds
+
+
+class LockTimeout(OSError):
+    pass
+
+
+class FileLock:
+    """ usage :
+        with FileLock(App.PURCHASES_FILE):
+            # write to purchases file
+    """
+    def __init__(self, filename, timeout=LOCK_TIMEOUT):
+        self.lock_filename = filename + ".lock"
+        self.timeout = timeout
+        self.fd = None
+
+    def __enter__(self):
+        dirname = os.path.dirname(self.lock_filename)
+        if dirname:
+            # other instance may be creating it at the same time
+            os.makedirs(dirname, exist_ok=True)
+        self.fd = os.open(self.lock_filename, os.O_RDWR|os.O_CREAT, 0o666)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                lock_fd(self.fd)
+                return self
+            except OSError:
+                if time.monotonic() > deadline:
+                    os.close(self.fd)
+                    self.fd = None
+                    raise LockTimeout("Could not lock %s in %g seconds" % (self.lock_filename, self.timeout))
+                time.sleep(0.01)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        unlock_fd(self.fd)
+        os.close(self.fd)
+        self.fd = None
+
+
+def lock_fd(fd):
+    """ raises OSError if already locked by other process """
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_EX|fcntl.LOCK_NB)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+def unlock_fd(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
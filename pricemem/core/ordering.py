@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Sort orders of the product list, kept sorted as data changes.
+
+For each order a list of (key, pdt_id) is kept sorted. When a product is
+added, edited or deleted, or purchases are added or deleted, only the keys
+of the affected products are removed and inserted again by binary search
+(see common.data_listeners). So a page of products in any order is taken
+from the list without sorting all products again.
+
+Purchase recency and frequency are of the loaded purchases (the open years,
+see archive.py). Products purchased only in archived years come after those.
+"""
+from bisect import bisect_left, insort
+
+from .common import App, data_listeners, product_id_number
+from .profiler import timed
+
+# name of sort orders, in the order shown to user
+SORT_ORDERS = ("name", "price", "recently_purchased", "frequently_purchased",
+                "recently_added")
+
+
+class Ordering:
+    # {order : [(key, pdt_id), ...]} sorted
+    sorted_keys = {}
+    # {order : {pdt_id : key}}
+    keys = {}
+    # {pdt_id : product}
+    products = {}
+    # {pdt_id : last purchase date}, {pdt_id : number of purchases}
+    last_purchase = {}
+    purchase_count = {}
+    # the data lists of which the index is built
+    data = None
+
+
+def price_number(price):
+    try:
+        return float(price)
+    except ValueError:# invalid price comes last
+        return float("inf")
+
+def date_number(date):
+    return int(date) if date.isdigit() else 0
+
+def get_sort_keys(product):
+    """ returns {order : key} of the product """
+    pdt_id, name = product[0], product[1].lower()
+    last = Ordering.last_purchase.get(pdt_id)
+    return {
+        "name": (name, product[2].lower(), pdt_id),
+        "price": (price_number(product[4]), name, pdt_id),
+        # products never purchased come last
+        "recently_purchased": (last is None, -date_number(last or ""), name, pdt_id),
+        "frequently_purchased": (-Ordering.purchase_count.get(pdt_id, 0), name, pdt_id),
+        "recently_added": (-product_id_number(pdt_id), pdt_id),
+    }
+
+
+@timed("build_ordering")
+def build_ordering():
+    last_purchase, purchase_count = {}, {}
+    for row in App.purchases:
+        pdt_id = row[1]
+        purchase_count[pdt_id] = purchase_count.get(pdt_id, 0) + 1
+        if row[0] > last_purchase.get(pdt_id, ""):
+            last_purchase[pdt_id] = row[0]
+    Ordering.last_purchase, Ordering.purchase_count = last_purchase, purchase_count
+    keys = {order: {} for order in SORT_ORDERS}
+    for product in App.products:
+        for order, key in get_sort_keys(product).items():
+            keys[order][product[0]] = key
+    Ordering.keys = keys
+    Ordering.sorted_keys = {order: sorted((key, pdt_id) for pdt_id, key in keys[order].items())
+                                for order in SORT_ORDERS}
+    Ordering.products = {product[0]: product for product in App.products}
+    Ordering.data = (App.products, App.purchases)
+
+def get_ordering():
+    if Ordering.data is None or Ordering.data[0] is not App.products or (
+            Ordering.data[1] is not App.purchases):
+        build_ordering()
+    return Ordering.sorted_keys
+
+
+def remove_product_keys(pdt_id):
+    for order in SORT_ORDERS:
+        key = Ordering.keys[order].pop(pdt_id, None)
+        if key is not None:
+            sorted_keys = Ordering.sorted_keys[order]
+            del sorted_keys[bisect_left(sorted_keys, (key, pdt_id))]
+
+def change_product_keys(product):
+    """ move the product only in the orders whose key has changed """
+    pdt_id = product[0]
+    for order, key in get_sort_keys(product).items():
+        old_key = Ordering.keys[order].get(pdt_id)
+        if key==old_key:
+            continue
+        sorted_keys = Ordering.sorted_keys[order]
+        if old_key is not None:
+            del sorted_keys[bisect_left(sorted_keys, (old_key, pdt_id))]
+        Ordering.keys[order][pdt_id] = key
+        insort(sorted_keys, (key, pdt_id))
+
+def update_product_keys(pdt_ids):
+    for pdt_id in pdt_ids:
+        product = Ordering.products.get(pdt_id)
+        if product:
+            change_product_keys(product)
+
+
+def add_purchases(rows):
+    for row in rows:
+        pdt_id = row[1]
+        Ordering.purchase_count[pdt_id] = Ordering.purchase_count.get(pdt_id, 0) + 1
+        if row[0] > Ordering.last_purchase.get(pdt_id, ""):
+            Ordering.last_purchase[pdt_id] = row[0]
+
+def remove_purchases(rows):
+    recheck = set()
+    for row in rows:
+        pdt_id = row[1]
+        count = Ordering.purchase_count.get(pdt_id, 0) - 1
+        if count > 0:
+            Ordering.purchase_count[pdt_id] = count
+        else:
+            Ordering.purchase_count.pop(pdt_id, None)
+        if row[0]==Ordering.last_purchase.get(pdt_id):
+            recheck.add(pdt_id)
+    # last purchase date of these may have changed, found in one pass
+    if recheck:
+        for pdt_id in recheck:
+            Ordering.last_purchase.pop(pdt_id, None)
+        for row in App.purchases:
+            if row[1] in recheck and row[0] > Ordering.last_purchase.get(row[1], ""):
+                Ordering.last_purchase[row[1]] = row[0]
+
+
+def on_data_changed(op, data, local):
+    if op=="reload":
+        Ordering.data = None
+    # the index was not up to date before this change
+    if Ordering.data is None:
+        return
+    if op in ("add_product", "edit_product"):
+        Ordering.products[data[0]] = data
+        change_product_keys(data)
+    elif op=="delete_product":
+        remove_product_keys(data[0])
+        Ordering.products.pop(data[0], None)
+    elif op in ("add_purchases", "delete_purchases"):
+        if op=="add_purchases":
+            add_purchases(data)
+        else:
+            # deleted rows of archive were never counted. those deleted from
+            # loaded purchases come first (see delete_purchases)
+            remove_purchases(data[:len(Ordering.data[1]) - len(App.purchases)])
+        update_product_keys(set(row[1] for row in data))
+    Ordering.data = (App.products, App.purchases)
+
+data_listeners.append(on_data_changed)
+
+
+def sort_products(order, products=None, start=0, count=None):
+    """ returns the products sorted in the order (one of SORT_ORDERS). products
+    is a list to sort (e.g search result), by default all products. only
+    the page of count products from start is returned, if count is given """
+    sorted_keys = get_ordering()[order]
+    end = None if count is None else start + count
+    if products is None:
+        return [Ordering.products[pdt_id] for key, pdt_id in sorted_keys[start:end]]
+    # a small list is sorted by the keys, otherwise filtered from the sorted list
+    keys = Ordering.keys[order]
+    if len(products) * 8 < len(sorted_keys):
+        # products deleted by other instance are not in the index
+        products = [product for product in products if product[0] in keys]
+        products.sort(key=lambda product: keys[product[0]])
+        return products[start:end]
+    selected = set(product[0] for product in products)
+    return [Ordering.products[pdt_id] for key, pdt_id in sorted_keys
+                if pdt_id in selected][start:end]
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Versions of sell price of products, so that the price on any date is known.
+
+Each change of sell price is appended to DATA_DIR/prices.csv as
+[date, pdt_id, price]. The price was effective from that date, until the date
+of next version. When the price of a product is changed first time, its
+previous price is also saved with date 00000000, as its starting date is not
+known. The file is indexed as {pdt_id : (dates, prices)} sorted by date, so
+the price on a date is found by binary search.
+
+When only the price of a product is changed, products.csv is not rewritten.
+So the price in products.csv may be older, and the price of the latest
+version is set in App.products whenever products are loaded from the file.
+"""
+import os
+from bisect import bisect_right
+from datetime import datetime
+
+from .common import App, data_listeners, notify_data_changed, find_product
+from .file_io import read_csv_file, read_new_csv_rows, append_csv_rows, file_states
+from .locking import FileLock
+
+PRICES_HEADER = "Date, Product ID, Price\n"
+# date of a price whose starting date is not known
+UNKNOWN_DATE = "00000000"
+
+
+class PriceVersions:
+    # {pdt_id : (dates, prices)}
+    index = {}
+    # the prices file of which the index is built
+    filename = None
+
+
+def prices_filename():
+    return App.DATA_DIR + "/prices.csv"
+
+
+def add_versions(index, rows):
+    """ add [date, pdt_id, price] rows to index. a row of a date replaces the
+    earlier row of same date, as rows are in order of change """
+    for date, pdt_id, price in rows:
+        dates, prices = index.get(pdt_id, ([], []))
+        i = bisect_right(dates, date)
+        if i and dates[i-1]==date:
+            prices = prices[:i-1] + [price] + prices[i:]
+        else:
+            dates, prices = dates[:i] + [date] + dates[i:], prices[:i] + [price] + prices[i:]
+        index[pdt_id] = (dates, prices)
+
+def sync_price_versions():
+    """ load price versions saved by other instances """
+    rows = read_new_csv_rows(prices_filename(), 3)
+    if rows is None or PriceVersions.filename!=prices_filename():
+        index = {}
+        add_versions(index, read_csv_file(prices_filename(), 3))
+        PriceVersions.index, PriceVersions.filename = index, prices_filename()
+    elif rows:
+        index = dict(PriceVersions.index)
+        add_versions(index, rows)
+        PriceVersions.index = index
+
+def on_data_changed(op, data, local):
+    # the data directory may have been changed
+    if op=="reload":
+        PriceVersions.filename = None
+
+data_listeners.append(on_data_changed)
+
+
+def save_price_change(pdt_id, old_price, price, date=None):
+    """ append new sell price version of the product, effective from YYYYMMDD
+    date, by default today """
+    save_price_changes([(pdt_id, old_price, price)], date)
+
+def save_price_changes(changes, date=None):
+    """ append sell price versions of many products at once. changes is list of
+    (pdt_id, old_price, new_price) """
+    date = date or datetime.today().strftime("%Y%m%d")
+    with FileLock(prices_filename()):
+        sync_price_versions()
+        rows = []
+        for pdt_id, old_price, price in changes:
+            if pdt_id not in PriceVersions.index:
+                rows.append([UNKNOWN_DATE, pdt_id, old_price])
+            rows.append([date, pdt_id, price])
+        append_csv_rows(prices_filename(), PRICES_HEADER, rows)
+    index = dict(PriceVersions.index)
+    add_versions(index, rows)
+    PriceVersions.index = index
+
+def remove_price_versions():
+    """ delete price versions of all products, when products are cleared.
+    otherwise a new product would get the prices of deleted one of same id """
+    with FileLock(prices_filename()):
+        if os.path.exists(prices_filename()):
+            os.remove(prices_filename())
+    file_states.pop(prices_filename(), None)
+    PriceVersions.index, PriceVersions.filename = {}, prices_filename()
+
+
+def apply_price_versions():
+    """ set latest price versions (including those saved by other instances)
+    in App.products. returns the changed products """
+    sync_price_versions()
+    index, changed = PriceVersions.index, []
+    products = []
+    for product in App.products:
+        versions = index.get(product[0])
+        if versions and versions[1][-1]!=product[4]:
+            product = product[:4] + [versions[1][-1]] + product[5:]
+            changed.append(product)
+        products.append(product)
+    if changed:
+        App.products = products
+    return changed
+
+def sync_prices():
+    """ load price changes saved by other instances. returns True if price of
+    any product has changed """
+    changed = apply_price_versions()
+    for product in changed:
+        notify_data_changed("edit_product", product, False)
+    return bool(changed)
+
+
+def get_price_versions(pdt_id):
+    """ returns list of (date, price) of sell price versions of the product """
+    sync_price_versions()
+    return list(zip(*PriceVersions.index.get(pdt_id, ([], []))))
+
+def get_sell_price_on(pdt_id, date):
+    """ returns sell price of the product on YYYYMMDD date, None if not known.
+    the current price is returned for a product whose price was never changed """
+    sync_price_versions()
+    versions = PriceVersions.index.get(pdt_id)
+    if not versions:
+        product = find_product(pdt_id)
+        return product and product[4]
+    dates, prices = versions
+    i = bisect_right(dates, date)
+    return prices[i-1] if i else None
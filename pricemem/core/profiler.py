@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Opt-in timing of hot paths (file loading/saving, search, list building, drawing).
+Enabled by setting PRICEMEM_PROFILE=1 environment variable, or from main menu.
+Recorded events can be exported in Chrome trace event format, which can be
+opened in chrome://tracing or https://ui.perfetto.dev
+"""
+import os
+import time
+import json
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+
+class Profiler:
+    enabled = os.environ.get("PRICEMEM_PROFILE", "0") not in ("", "0")
+    # chrome trace events, oldest ones are dropped when full
+    events = deque(maxlen=200000)
+    # functions called as func(name, duration_ms) after each measurement
+    listeners = []
+    # all timestamps are relative to this
+    start_time = time.perf_counter()
+
+
+def set_profiling_enabled(enable):
+    Profiler.enabled = enable
+
+
+@contextmanager
+def measure(name, **args):
+    """ time the code inside 'with' block. extra keyword args are saved in trace """
+    if not Profiler.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        event = {"name": name, "cat": "pricemem", "ph": "X",
+                "ts": (start-Profiler.start_time)*1e6, "dur": (end-start)*1e6,
+                "pid": os.getpid(), "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        Profiler.events.append(event)
+        for func in Profiler.listeners:
+            func(name, (end-start)*1000)
+
+
+def timed(name):
+    """ decorator to measure each call of a function """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Profiler.enabled:
+                return func(*args, **kwargs)
+            with measure(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_trace(filename):
+    """ save recorded events as Chrome trace event json """
+    with open(filename, "w") as f:
+        json.dump({"traceEvents": list(Profiler.events), "displayTimeUnit": "ms"}, f)
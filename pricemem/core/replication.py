@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Replication of products, purchases and sales between shop terminals (nodes).
+
+Each node records its own changes in a sequence numbered delta log
+(DATA_DIR/deltas.log, one json object per line). Deltas received from other
+nodes are also kept in the log, so that they are passed on to further nodes.
+Which deltas a node has is known from its version vector {node_id : last seq},
+so nodes exchange only the deltas the other one does not have, either through
+a shared folder or through the price server (see server.py).
+
+Concurrent changes of a product are resolved deterministically, the change
+with greater (time, node_id) wins on every node. Ids of products added on a
+node end with a part of its node id (see App.product_id_suffix), so products
+added on different nodes never get the same id.
+
+When replication is enabled, existing data is recorded as seed deltas. Seeded
+purchases and sales which a receiving node already has (e.g both nodes started
+from a copy of same data directory) are not added again.
+
+Usage :
+    $ python3 -m pricemem.core.replication --data-dir DIR enable
+    $ python3 -m pricemem.core.replication --data-dir DIR sync-folder SHARED_FOLDER
+    $ python3 -m pricemem.core.replication --data-dir DIR sync-server HOST:PORT
+"""
+import os
+import sys
+import json
+import time
+from collections import Counter
+
+from .common import App, data_listeners, notify_data_changed, set_data_dir
+from .file_io import (save_products_file, save_new_purchases, delete_purchases,
+    save_new_sales, update_last_product_id, remember_deleted_products, read_sales_file
+)
+from .locking import FileLock
+from .history import get_purchases
+from .images import remove_product_images
+from .prices import save_price_change
+
+PRODUCT_OPS = ("add_product", "edit_product", "delete_product")
+# number of purchase rows in one delta, when existing data is recorded
+BATCH_SIZE = 1000
+
+
+class Replication:
+    enabled = False
+    node_id = ""
+    # {node_id : seq of last delta we have from that node}
+    vector = {}
+    # {pdt_id : [time, node_id]} version of the last applied change of a product
+    product_versions = {}
+    # bytes of delta log read
+    log_offset = 0
+    # True while applying deltas of other nodes, so that those are not recorded again
+    applying = False
+
+
+def log_filename():
+    return App.DATA_DIR + "/deltas.log"
+
+def node_filename():
+    return App.DATA_DIR + "/node_id"
+
+def state_filename():
+    return App.DATA_DIR + "/sync_state.json"
+
+
+def load_replication():
+    """ load replication state of current data directory """
+    Replication.enabled = os.path.exists(node_filename())
+    Replication.node_id = ""
+    Replication.vector = {}
+    Replication.product_versions = {}
+    Replication.log_offset = 0
+    App.product_id_suffix = ""
+    if Replication.enabled:
+        with open(node_filename()) as f:
+            Replication.node_id = f.read().strip()
+        App.product_id_suffix = "-" + Replication.node_id[:6]
+        read_new_log_entries()
+
+
+def enable_replication():
+    """ make this data directory a node. existing data is recorded as deltas,
+    so a new node with empty data directory receives everything """
+    if Replication.enabled:
+        return
+    if not os.path.exists(App.DATA_DIR):
+        os.makedirs(App.DATA_DIR)
+    with open(node_filename(), "w") as f:
+        import uuid
+        f.write(uuid.uuid4().hex[:12])
+    load_replication()
+    changes = [("add_product", product) for product in App.products]
+    purchases = get_purchases()
+    for i in range(0, len(purchases), BATCH_SIZE):
+        changes.append(("seed_purchases", purchases[i:i+BATCH_SIZE]))
+    sales = read_sales_file()
+    for i in range(0, len(sales), BATCH_SIZE):
+        changes.append(("seed_sales", sales[i:i+BATCH_SIZE]))
+    record_deltas(changes)
+
+
+def on_data_changed(op, data, local):
+    """ records local changes """
+    if not Replication.enabled or Replication.applying or not local or op=="reload":
+        return
+    record_deltas([(op, data)])
+
+data_listeners.append(on_data_changed)
+
+
+def record_deltas(changes):
+    """ append list of (op, data) to delta log with next sequence numbers """
+    with FileLock(log_filename()):
+        # the log may have been appended by other instance using same data directory
+        read_new_log_entries()
+        node = Replication.node_id
+        lines = []
+        for op, data in changes:
+            entry = {"node": node, "seq": Replication.vector.get(node, 0)+1,
+                    "time": time.time(), "op": op, "data": data}
+            update_state(entry)
+            lines.append(json.dumps(entry))
+        append_log_lines(lines)
+
+
+def append_log_lines(lines):
+    """ must be called with log locked, after reading new entries """
+    if not lines:
+        return
+    with open(log_filename(), "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        Replication.log_offset = os.fstat(f.fileno()).st_size
+
+
+def read_new_log_entries():
+    """ read deltas appended to log since last read, and update state """
+    entries = []
+    try:
+        with open(log_filename(), "rb") as f:
+            f.seek(Replication.log_offset)
+            data = f.read()
+    except FileNotFoundError:
+        return entries
+    data = data[:data.rfind(b"\n")+1]
+    Replication.log_offset += len(data)
+    for line in data.decode("utf-8").splitlines():
+        if line:
+            entry = json.loads(line)
+            update_state(entry)
+            entries.append(entry)
+    return entries
+
+
+def update_state(entry):
+    node, seq = entry["node"], entry["seq"]
+    if seq > Replication.vector.get(node, 0):
+        # replaced, as the price server may be sending it from other thread
+        Replication.vector = dict(Replication.vector)
+        Replication.vector[node] = seq
+    if entry["op"] in PRODUCT_OPS:
+        version = [entry["time"], node]
+        pdt_id = entry["data"][0]
+        if version > Replication.product_versions.get(pdt_id, [0, ""]):
+            Replication.product_versions[pdt_id] = version
+
+
+def get_deltas_since(vector):
+    """ deltas in our log which are not in the given version vector """
+    deltas = []
+    try:
+        with open(log_filename(), encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break# incomplete line
+                entry = json.loads(line)
+                if entry["seq"] > vector.get(entry["node"], 0):
+                    deltas.append(entry)
+    except FileNotFoundError:
+        pass
+    return deltas
+
+
+def apply_deltas(entries):
+    """ apply deltas received from other nodes. deltas already applied are
+    ignored. returns number of applied deltas """
+    if not Replication.enabled:
+        raise RuntimeError("Replication is not enabled")
+    with FileLock(log_filename()):
+        read_new_log_entries()
+        # deltas of a node must be applied in order without gap
+        vector = dict(Replication.vector)
+        accepted = []
+        for entry in sorted(entries, key=lambda e : (e["node"], e["seq"])):
+            if entry["seq"]==vector.get(entry["node"], 0)+1:
+                vector[entry["node"]] = entry["seq"]
+                accepted.append(entry)
+        if not accepted:
+            return 0
+        Replication.applying = True
+        try:
+            apply_changes(accepted)
+        finally:
+            Replication.applying = False
+        # keep them in our log, to pass on to other nodes
+        for entry in accepted:
+            update_state(entry)
+        append_log_lines([json.dumps(entry) for entry in accepted])
+    return len(accepted)
+
+
+def apply_changes(entries):
+    product_entries = [entry for entry in entries if entry["op"] in PRODUCT_OPS]
+    new_purchases, deleted_purchases, new_sales = [], [], []
+    seed_purchases, seed_sales = [], []
+    for entry in entries:
+        op, data = entry["op"], entry["data"]
+        if op=="add_purchases":
+            new_purchases += data
+        elif op=="delete_purchases":
+            deleted_purchases += data
+        elif op=="add_sales":
+            new_sales += data
+        elif op=="seed_purchases":
+            seed_purchases += data
+        elif op=="seed_sales":
+            seed_sales += data
+    if seed_purchases:
+        new_purchases = missing_rows(seed_purchases, get_purchases()) + new_purchases
+    if seed_sales:
+        new_sales = missing_rows(seed_sales, read_sales_file()) + new_sales
+
+    if product_entries:
+        old_prices = {}
+        def change():
+            # prices changed by other instances (loaded before change) are already versioned
+            old_prices.update((product[0], product[4]) for product in App.products)
+            return apply_product_changes(product_entries)
+        # applied on the latest products file, under its lock
+        removed_products = save_products_file(change)
+        # price changed on other node is versioned from the date of change
+        for product in App.products:
+            old_price = old_prices.get(product[0])
+            if old_price is not None and old_price!=product[4]:
+                version = Replication.product_versions.get(product[0], [time.time()])
+                date = time.strftime("%Y%m%d", time.localtime(version[0]))
+                save_price_change(product[0], old_price, product[4], date)
+        remember_deleted_products(removed_products)
+        remove_product_images([product[0] for product in removed_products])
+        notify_data_changed("reload", None, False)
+    if new_purchases:
+        save_new_purchases(new_purchases)
+    if deleted_purchases:
+        delete_purchases(deleted_purchases)
+    if new_sales:
+        save_new_sales(new_sales)
+
+
+def missing_rows(rows, existing_rows):
+    """ returns the rows which are not in existing rows. a row which occurs
+    twice in rows is missing once if it occurs once in existing rows """
+    counts = Counter(map(tuple, existing_rows))
+    missing = []
+    for row in rows:
+        key = tuple(row)
+        if counts[key]:
+            counts[key] -= 1
+        else:
+            missing.append(row)
+    return missing
+
+
+def apply_product_changes(entries):
+    """ returns list of removed products """
+    products = list(App.products)
+    index = {product[0]: i for i, product in enumerate(products)}
+    removed = []
+    for entry in entries:
+        data = entry["data"]
+        # the latest change wins
+        version = [entry["time"], entry["node"]]
+        if version <= Replication.product_versions.get(data[0], [0, ""]):
+            continue
+        Replication.product_versions[data[0]] = version
+        i = index.get(data[0])
+        # products of nodes running old versions have no barcode
+        data = list(data) + [""]*(7-len(data))
+        if entry["op"]=="delete_product":
+            if i is not None:
+                removed.append(products[i])
+                products[i] = None
+                del index[data[0]]
+        elif i is not None:
+            products[i] = data
+        else:
+            index[data[0]] = len(products)
+            products.append(data)
+    App.products = [product for product in products if product]
+    update_last_product_id(App.products)
+    return removed
+
+
+def load_sync_state():
+    try:
+        with open(state_filename()) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"exported": 0, "imported": {}}
+
+def save_sync_state(state):
+    with open(state_filename(), "w") as f:
+        json.dump(state, f)
+
+
+def sync_folder(folder):
+    """ exchange deltas through a shared folder, where each node appends its log
+    to NODE_ID.log file. returns (number of sent deltas, number of received deltas) """
+    enable_replication()
+    state = load_sync_state()
+    # send new part of our log
+    data = b""
+    with FileLock(log_filename()):
+        if os.path.exists(log_filename()):
+            with open(log_filename(), "rb") as f:
+                f.seek(state["exported"])
+                data = f.read()
+    data = data[:data.rfind(b"\n")+1]
+    if data:
+        with open(folder + "/%s.log" % Replication.node_id, "ab") as f:
+            f.write(data)
+        state["exported"] += len(data)
+    sent = data.count(b"\n")
+    # receive new deltas from logs of other nodes. a log may contain deltas of a
+    # third node which can be applied only after those in other log, so logs are
+    # read again until nothing more is applied.
+    received = 0
+    while True:
+        count = 0
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(".log") or filename==Replication.node_id + ".log":
+                continue
+            count += import_log_file(folder + "/" + filename, state)
+        received += count
+        if not count:
+            break
+    save_sync_state(state)
+    return sent, received
+
+
+def import_log_file(filename, state):
+    """ apply new deltas of a log file in shared folder, returns number of applied deltas """
+    key = os.path.basename(filename)
+    offset = state["imported"].get(key, 0)
+    with open(filename, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    lines = data[:data.rfind(b"\n")+1].splitlines(keepends=True)
+    entries = [json.loads(line) for line in lines]
+    count = apply_deltas(entries)
+    # the rejected deltas (because of gap in sequence) are read again next time
+    for line, entry in zip(lines, entries):
+        if entry["seq"] > Replication.vector.get(entry["node"], 0):
+            break
+        offset += len(line)
+    state["imported"][key] = offset
+    return count
+
+
+def sync_server(url):
+    """ exchange deltas with price server. returns (sent, received) """
+    from .client import PriceClient
+    enable_replication()
+    client = PriceClient(url)
+    server_vector = client.get("/sync")["vector"]
+    deltas = get_deltas_since(server_vector)
+    result = client.post("/sync", {"vector": Replication.vector, "deltas": deltas})
+    return len(deltas), apply_deltas(result["deltas"])
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="PriceMem data replication")
+    parser.add_argument("--data-dir", default=App.DATA_DIR, help="PriceMem data directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("enable", help="make the data directory a replication node")
+    subparsers.add_parser("status", help="show version vector")
+    cmd = subparsers.add_parser("sync-folder", help="sync through shared folder")
+    cmd.add_argument("folder")
+    cmd = subparsers.add_parser("sync-server", help="sync with price server")
+    cmd.add_argument("url", help="HOST:PORT of price server")
+    args = parser.parse_args()
+
+    from . import load_data
+    set_data_dir(args.data_dir)
+    load_data()
+    if args.command=="enable":
+        enable_replication()
+        print("Node id : %s" % Replication.node_id)
+    elif args.command=="status":
+        print("Node id : %s" % (Replication.node_id or "(replication not enabled)"))
+        for node, seq in sorted(Replication.vector.items()):
+            print("  %s : %d" % (node, seq))
+    else:
+        if args.command=="sync-folder":
+            sent, received = sync_folder(args.folder)
+        else:
+            sent, received = sync_server(args.url)
+        print("Sent %d, received %d deltas" % (sent, received))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
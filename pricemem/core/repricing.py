@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Change sell price of many products at once, e.g after a price hike of supplier.
+
+The products are selected by search, category or brand (see search.py and
+facets.py), and new prices are computed by a rule. The changes are shown for
+preview, then saved as price versions in a single append to prices file, so
+products file is not rewritten (see prices.py).
+"""
+from .common import App, notify_data_changed
+from .history import get_last_rate
+from .prices import save_price_changes
+from .profiler import timed
+
+# percent : price increased by value percent
+# amount : value added to price
+# margin : value percent over last purchase rate
+REPRICE_RULES = ("percent", "amount", "margin")
+
+
+def format_price(price):
+    return "%g" % round(price, 2)
+
+def round_price(price, step):
+    """ round price to nearest multiple of step, if step is not zero """
+    if not step:
+        return price
+    return max(round(price/step), 1) * step
+
+def get_new_price(product, rule, value, round_to=0):
+    """ returns new price of the product as text, or None if it can not be
+    computed (invalid price, or never purchased for margin rule) """
+    if rule=="margin":
+        rate = get_last_rate(product[0])
+        if rate is None:
+            return None
+        price = rate * (1 + value/100)
+    else:
+        try:
+            price = float(product[4])
+        except ValueError:
+            return None
+        price = price * (1 + value/100) if rule=="percent" else price + value
+    if price < 0:
+        return None
+    return format_price(round_price(price, round_to))
+
+
+@timed("preview_repricing")
+def preview_repricing(products, rule, value, round_to=0):
+    """ returns list of (product, new_price) of the products whose price changes """
+    if rule not in REPRICE_RULES:
+        raise ValueError("Unknown repricing rule : %s" % rule)
+    changes = []
+    for product in products:
+        price = get_new_price(product, rule, value, round_to)
+        if price is not None and price!=product[4]:
+            changes.append((product, price))
+    return changes
+
+@timed("apply_repricing")
+def apply_repricing(changes, date=None):
+    """ save new prices of preview_repricing(), effective from YYYYMMDD date
+    (default today). the products are changed in place. returns the changed
+    products, those deleted by other instances are skipped """
+    products = {product[0]: product for product in App.products}
+    current = []
+    for product, price in changes:
+        item = products.get(product[0])
+        if item:
+            current.append((product, item, price))
+    if not current:
+        return []
+    save_price_changes([(item[0], item[4], price) for product, item, price in current], date)
+    for product, item, price in current:
+        item[4] = product[4] = price
+        notify_data_changed("edit_product", item)
+    return [item for product, item, price in current]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+from .common import App
+from .profiler import timed
+
+
+@timed("search_products")
+def search_products(text, products=None):
+    """ returns products whose name contains any of the words in text,
+    sorted according to number of matched words """
+    if products is None:
+        products = App.products
+    if not text:
+        return products
+    result = []# list of (index, matches_count) tuple
+    words = [x.lower() for x in text.split()]
+    i = 0
+    for product in products:
+        product_name = product[1].lower()
+        matches = 0 # number of matched words
+        for word in words:
+            if word in product_name:
+                matches += 1
+        if matches:
+            result.append((i, matches))
+        i += 1
+    # sort the result, according to number of matched words
+    result = sorted(result, key=lambda x: x[1])
+    return [products[i[0]] for i in result]
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Local HTTP/JSON price lookup server, so that multiple billing counters can
+share the data of one PriceMem data directory.
+
+Queries are answered from the in-memory data on the event loop, so any number
+of readers are served concurrently. Writes are queued and applied one by one
+in a single worker thread, so readers are never blocked by file writing. The
+writer replaces the data lists instead of modifying them (see App), so a reader
+sees either the old or the new data. Queries which may read the archive or the
+delta log run in a pool of reader threads, so they do not block the event loop.
+Changes saved by other instances using the same data directory (e.g the
+PriceMem app) are loaded every second by the writer thread.
+
+By default the server listens on localhost only. To serve other counters, give
+--host 0.0.0.0 and a --token (or PRICEMEM_SERVER_TOKEN environment variable),
+then POST requests must have 'Authorization: Bearer TOKEN' header.
+
+Usage :
+    $ python3 -m pricemem.core.server --data-dir ~/.local/share/PriceMem --port 8421
+
+GET  /products                      all products
+GET  /search?q=TEXT                 products matching text
+GET  /product?id=P00001             product details with stock
+GET  /price?id=P00001               sell price of product
+GET  /history?id=P00001             purchase history of product
+GET  /purchases?from=YYYYMMDD&to=YYYYMMDD
+POST /purchases  {"purchases": [[date, pdt_id, title, quantity, price], ...]}
+POST /sales      {"sales": [[date, invoice_no, pdt_id, quantity, price], ...]}
+GET  /sync                          version vector of replication deltas
+POST /sync       {"vector": {...}, "deltas": [...]}, returns {"deltas": [...]}
+                 which the client does not have (see replication.py)
+"""
+import os
+import sys
+import json
+import hmac
+import math
+import asyncio
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from .common import App, set_data_dir, quantity_re
+from .file_io import (save_new_purchases, save_new_sales, sync_products, sync_purchases,
+    sync_sales)
+from .prices import sync_prices
+from .stock import get_stock
+from .search import search_products
+from .history import get_purchases, get_product_history, get_purchase_titles, get_purchase_title
+from .replication import Replication, enable_replication, apply_deltas, get_deltas_since
+from . import load_data
+
+DEFAULT_PORT = 8421
+# number of threads for slow queries
+READER_THREADS = 4
+# seconds between checks for changes saved by other instances
+SYNC_INTERVAL = 1.0
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+def find_product(pdt_id):
+    for product in App.products:
+        if product[0]==pdt_id:
+            return product
+    raise HttpError(404, "Product %s not found" % pdt_id)
+
+def validate_rows(rows, pdt_id_col, usage):
+    """ returns rows as lists of str. raises HttpError if rows is not a list of
+    [date, ..., quantity, price] with YYYYMMDD date, product id at pdt_id_col,
+    quantity like '2' or '1.5kg' and price a number """
+    if not isinstance(rows, list):
+        raise HttpError(400, usage)
+    result = []
+    for row in rows:
+        if not isinstance(row, list) or len(row)!=5:
+            raise HttpError(400, usage)
+        row = [str(value) for value in row]
+        date, pdt_id, quantity, price = row[0], row[pdt_id_col], row[3], row[4]
+        try:
+            if len(date)!=8:
+                raise ValueError
+            datetime.strptime(date, "%Y%m%d")
+        except ValueError:
+            raise HttpError(400, "Invalid date '%s', must be YYYYMMDD" % date)
+        if not pdt_id or "\n" in pdt_id:
+            raise HttpError(400, "Invalid product id '%s'" % pdt_id)
+        if not quantity_re.fullmatch(quantity):
+            raise HttpError(400, "Invalid quantity '%s'" % quantity)
+        try:
+            if not math.isfinite(float(price)):
+                raise ValueError
+        except ValueError:
+            raise HttpError(400, "Invalid price '%s'" % price)
+        result.append(row)
+    return result
+
+
+def product_to_dict(product):
+    pdt_id, name, brand, category, price, description, barcode = product
+    return {"id": pdt_id, "name": name, "brand": brand, "category": category,
+            "price": price, "description": description, "barcode": barcode}
+
+
+def sync_files():
+    """ load changes saved by other instances """
+    sync_products()
+    sync_prices()
+    sync_purchases()
+    sync_sales()
+
+
+class PriceServer:
+    def __init__(self, token=""):
+        # POST requests require this token, if given
+        self.token = token
+        # all writes are done serially in this thread
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.reader = ThreadPoolExecutor(max_workers=READER_THREADS)
+        self.sync_interval = SYNC_INTERVAL
+        self.get_handlers = {
+            "/products": self.getProducts,
+            "/search": self.search,
+            "/product": self.getProduct,
+            "/price": self.getPrice,
+            "/history": self.getHistory,
+            "/purchases": self.getPurchases,
+            "/sync": self.getVector,
+        }
+        self.post_handlers = {
+            "/purchases": self.addPurchases,
+            "/sales": self.addSales,
+            "/sync": self.sync,
+        }
+
+    async def start(self, host, port):
+        """ start listening and loading changes of other instances, returns the server """
+        server = await asyncio.start_server(self.handleConnection, host, port)
+        self.sync_task = asyncio.ensure_future(self.syncFiles())
+        return server
+
+    async def serve(self, host, port):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def syncFiles(self):
+        """ only the new rows are loaded if a file was appended """
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.write(sync_files)
+            except Exception as e:
+                print("Could not load changed data : %s" % e)
+
+    # ------------------------ Request Handlers -------------------------
+
+    def getProducts(self, query):
+        return [product_to_dict(p) for p in App.products]
+
+    def search(self, query):
+        return [product_to_dict(p) for p in search_products(query.get("q", ""))]
+
+    def getProduct(self, query):
+        product = product_to_dict(find_product(query.get("id")))
+        product["stock"] = get_stock(product["id"])
+        return product
+
+    def getPrice(self, query):
+        product = find_product(query.get("id"))
+        return {"id": product[0], "price": product[4]}
+
+    async def getHistory(self, query):
+        find_product(query.get("id"))
+        history = await self.read(get_product_history, query.get("id"))
+        return [{"date": date, "quantity": quantity, "price": price, "rate": rate}
+                for date, quantity, price, rate in history]
+
+    async def getPurchases(self, query):
+        return await self.read(self.purchaseList, query.get("from"), query.get("to"))
+
+    def purchaseList(self, start_date, end_date):
+        titles = get_purchase_titles()
+        purchases = get_purchases(start_date, end_date)
+        return [row[:2] + [get_purchase_title(row, titles)] + row[3:] for row in purchases]
+
+    async def addPurchases(self, data):
+        purchases = validate_rows(data.get("purchases"), 1,
+                "purchases must be list of [date, pdt_id, title, quantity, price]")
+        await self.write(save_new_purchases, purchases)
+        return {"saved": len(purchases)}
+
+    async def addSales(self, data):
+        sales = validate_rows(data.get("sales"), 2,
+                "sales must be list of [date, invoice_no, pdt_id, quantity, price]")
+        await self.write(save_new_sales, sales)
+        return {"saved": len(sales)}
+
+    def getVector(self, query):
+        if not Replication.enabled:
+            raise HttpError(400, "Replication is not enabled on server")
+        return {"vector": Replication.vector}
+
+    async def sync(self, data):
+        if not Replication.enabled:
+            raise HttpError(400, "Replication is not enabled on server")
+        if not isinstance(data.get("vector"), dict) or not isinstance(data.get("deltas"), list):
+            raise HttpError(400, "vector and deltas are required")
+        await self.write(apply_deltas, data["deltas"])
+        return {"deltas": await self.read(get_deltas_since, data["vector"])}
+
+    async def write(self, func, *args):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.writer, func, *args)
+
+    async def read(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.reader, func, *args)
+
+    # ----------------------------- HTTP --------------------------------
+
+    async def handleConnection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.readRequest(reader)
+                except ValueError:# malformed request line or header
+                    self.writeResponse(writer, 400, {"error": "Malformed request"}, False)
+                    await writer.drain()
+                    break
+                if not request:
+                    break
+                method, path, query, body, auth, keep_alive = request
+                status, result = await self.handleRequest(method, path, query, body, auth)
+                self.writeResponse(writer, status, result, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def readRequest(self, reader):
+        """ returns (method, path, query, body, auth, keep_alive) or None if connection closed """
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, target, version = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, value = line.decode("latin-1").split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        body = length and await reader.readexactly(length) or b""
+        url = urlsplit(target)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        keep_alive = headers.get("connection", "").lower()!="close" and version.strip()=="HTTP/1.1"
+        auth = headers.get("authorization", "")
+        return method, url.path, query, body, auth, keep_alive
+
+    async def handleRequest(self, method, path, query, body, auth=""):
+        """ returns (status, json_serializable_result) """
+        try:
+            if method=="GET" and path in self.get_handlers:
+                result = self.get_handlers[path](query)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                return 200, result
+            if method=="POST" and path in self.post_handlers:
+                if self.token and not hmac.compare_digest(auth.encode("utf-8"),
+                                                ("Bearer " + self.token).encode("utf-8")):
+                    raise HttpError(401, "Invalid or missing token")
+                try:
+                    data = json.loads(body.decode("utf-8"))
+                except ValueError:
+                    raise HttpError(400, "Request body is not valid json")
+                return 200, await self.post_handlers[path](data)
+            if path in self.get_handlers or path in self.post_handlers:
+                raise HttpError(405, "%s not allowed on %s" % (method, path))
+            raise HttpError(404, "%s not found" % path)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    def writeResponse(self, writer, status, result, keep_alive):
+        body = json.dumps(result).encode("utf-8")
+        head = ["HTTP/1.1 %d %s" % (status, STATUS_TEXT[status]),
+                "Content-Type: application/json",
+                "Content-Length: %d" % len(body),
+                "Connection: %s" % (keep_alive and "keep-alive" or "close")]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PriceMem price lookup server")
+    parser.add_argument("--data-dir", default=App.DATA_DIR, help="PriceMem data directory")
+    parser.add_argument("--host", default="127.0.0.1",
+            help="address to listen on (default : localhost only, 0.0.0.0 for all)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port (default : %d)" % DEFAULT_PORT)
+    parser.add_argument("--token", default=os.environ.get("PRICEMEM_SERVER_TOKEN", ""),
+            help="token required for POST requests (default : $PRICEMEM_SERVER_TOKEN)")
+    parser.add_argument("--replication", action="store_true", help="allow nodes to sync with this server")
+    args = parser.parse_args()
+
+    set_data_dir(args.data_dir)
+    load_data()
+    if args.replication:
+        enable_replication()
+    if args.host not in ("127.0.0.1", "localhost", "::1") and not args.token:
+        print("Warning : anyone in the network can add purchases and sales, use --token")
+    print("Serving %d products from %s on %s:%d" % (len(App.products), App.DATA_DIR, args.host, args.port))
+    try:
+        asyncio.run(PriceServer(args.token).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
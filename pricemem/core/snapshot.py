@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Binary snapshot of loaded data, so that unchanged data files are not parsed
+again on next start.
+
+The snapshot (DATA_DIR/snapshot.pickle) is written after data is loaded from
+the csv files, and on exit. It keeps the size and modification time of every
+data file it was made from. If any of those differs on next start, or the
+snapshot can not be read, the csv files are parsed as usual. So the snapshot
+is only a cache, and can be deleted anytime.
+"""
+import os
+import pickle
+
+from .common import App
+from .file_io import file_states, gc_paused
+from .archive import index_filename, archive_cutoff_date, is_archivable
+from .profiler import timed
+
+# changed whenever format of the snapshot or of the data in it changes
+SNAPSHOT_VERSION = 2
+# a file modified this close to the snapshot time may be modified again without
+# change of its mtime (FAT has 2 second resolution), so it is always parsed
+RACY_TIME_NS = 2 * 10**9
+
+
+def snapshot_filename():
+    return App.DATA_DIR + "/snapshot.pickle"
+
+def data_filenames():
+    """ files from which the data in snapshot is derived """
+    return [App.PRODUCTS_FILE, App.PURCHASES_FILE, App.SALES_FILE,
+            App.DELETED_PRODUCTS_FILE, index_filename()]
+
+
+def pack_rows(rows):
+    """ returns list of columns, each column values joined by NUL character.
+    unpickling a few long strings is much faster than millions of small lists """
+    columns = ["\0".join(column) for column in zip(*rows)]
+    # a value containing NUL can not be split correctly
+    if any(column.count("\0")!=len(rows)-1 for column in columns):
+        return rows
+    return columns
+
+def unpack_rows(columns, row_len):
+    if len(columns)!=row_len or not isinstance(columns[0], str):
+        return columns# not packed, or no rows
+    return list(map(list, zip(*[column.split("\0") for column in columns])))
+
+
+def get_file_stat(filename):
+    """ returns (size, mtime) or None if file does not exist """
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+@timed("save_snapshot")
+def save_snapshot():
+    """ save loaded data. nothing is saved if a data file has been changed by
+    other instance after we have read it, as our data is not of that file """
+    files = {}
+    for filename in data_filenames():
+        stat = get_file_stat(filename)
+        state = file_states.get(filename)
+        if filename!=index_filename() and (state and state[0]) != (stat and stat[0]):
+            return False
+        files[filename] = stat
+    cutoff = archive_cutoff_date()
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "files": files,
+        # purchases are checked for archiving on start, unless already done this year
+        "archived_cutoff": not any(is_archivable(row, cutoff) for row in App.purchases) and cutoff,
+        "file_states": {filename: file_states.get(filename) for filename in data_filenames()},
+        "products": pack_rows(App.products),
+        "purchases": pack_rows(App.purchases),
+        "deleted_products": App.deleted_products,
+        "stock": App.stock,
+    }
+    tmp_filename = "%s.%d.tmp" % (snapshot_filename(), os.getpid())
+    try:
+        with open(tmp_filename, "wb") as f, gc_paused():
+            pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, snapshot_filename())
+    except OSError:
+        return False
+    return True
+
+
+@timed("load_snapshot")
+def load_snapshot():
+    """ load data from snapshot if it is of current data files. returns
+    the loaded snapshot, or None if the data files must be parsed """
+    try:
+        with open(snapshot_filename(), "rb") as f, gc_paused():
+            snapshot_mtime = os.fstat(f.fileno()).st_mtime_ns
+            snapshot = pickle.loads(f.read())
+    except Exception:# not exists, corrupted, or written by other version
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version")!=SNAPSHOT_VERSION:
+        return None
+    files = {filename: get_file_stat(filename) for filename in data_filenames()}
+    if snapshot["files"]!=files:
+        return None
+    if any(stat and stat[1] > snapshot_mtime - RACY_TIME_NS for stat in files.values()):
+        return None
+    with gc_paused():
+        App.products = unpack_rows(snapshot["products"], 7)
+        App.purchases = unpack_rows(snapshot["purchases"], 5)
+    App.deleted_products = snapshot["deleted_products"]
+    App.stock = snapshot["stock"]
+    # so that rows appended after the snapshot are read incrementally
+    for filename, state in snapshot["file_states"].items():
+        if state:
+            file_states[filename] = state
+        else:
+            file_states.pop(filename, None)
+    return snapshot
+
+
+def remove_snapshot():
+    if os.path.exists(snapshot_filename()):
+        os.remove(snapshot_filename())
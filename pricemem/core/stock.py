@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+"""
+Stock ledger. Purchases add quantity and sold items of finalized (printed)
+invoices subtract it. The whole history is scanned only once on startup,
+afterwards App.stock is updated by the difference on every change.
+"""
+from .common import App, get_quantity_number
+from .archive import get_archived_stock
+
+
+def build_stock_ledger(sales):
+    """ calculate stock of every product from purchases and sales history """
+    stock = get_archived_stock()
+    for date, pdt_id, title, quantity, price in App.purchases:
+        stock[pdt_id] = stock.get(pdt_id, 0) + get_quantity_number(quantity)
+    for date, invoice_no, pdt_id, quantity, price in sales:
+        stock[pdt_id] = stock.get(pdt_id, 0) - get_quantity_number(quantity)
+    App.stock = stock
+
+def add_stock(items, sign=1):
+    """ items is list of (pdt_id, quantity), quantity is str like '2' or '1.5kg'.
+    the ledger is replaced, as the price server reads it in other threads """
+    if not items:
+        return
+    stock = dict(App.stock)
+    for pdt_id, quantity in items:
+        stock[pdt_id] = stock.get(pdt_id, 0) + sign*get_quantity_number(quantity)
+    App.stock = stock
+
+def remove_stock(items):
+    add_stock(items, -1)
+
+def get_stock(pdt_id):
+    return App.stock.get(pdt_id, 0)
+
+def get_stock_text(pdt_id):
+    """ stock in human readable format, eg. 'In Stock : 5' """
+    return "In Stock : %g" % round(get_stock(pdt_id), 3)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" encoding of product images for the image store (see core/images.py),
+and bulk import of a folder of photos """
+import os
+
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QImage, QImageWriter
+
+from core.common import App, get_product_title
+from core.images import set_product_images
+
+# images are scaled down to fit in this size
+MAX_IMAGE_SIZE = 256
+JPEG_QUALITY = 80
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def encode_image(image):
+    """ returns jpeg data of the QImage, scaled down if larger than MAX_IMAGE_SIZE """
+    if image.width() > MAX_IMAGE_SIZE or image.height() > MAX_IMAGE_SIZE:
+        image = image.scaled(MAX_IMAGE_SIZE, MAX_IMAGE_SIZE, Qt.KeepAspectRatio,
+                                Qt.SmoothTransformation)
+    data = QByteArray()
+    buff = QBuffer(data)
+    buff.open(QIODevice.WriteOnly)
+    writer = QImageWriter(buff, b"jpg")
+    writer.setQuality(JPEG_QUALITY)
+    writer.setOptimizedWrite(True)# smaller file with optimized huffman tables
+    writer.write(image)
+    return bytes(data)
+
+def encode_image_file(filename):
+    """ returns jpeg data of image file, or None if it is not an image.
+    this runs in worker processes """
+    image = QImage(filename)
+    if image.isNull():
+        return None
+    return encode_image(image)
+
+
+def match_photos(folder):
+    """ returns {pdt_id : filename} of photos whose name (without extension) is
+    product id, or product name, or title (NAME (BRAND)) of the product """
+    products = {}
+    for product in App.products:
+        for key in (product[0], product[1], get_product_title(product)):
+            products.setdefault(key.strip().lower(), []).append(product[0])
+    photos = {}
+    for filename in sorted(os.listdir(folder)):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() not in PHOTO_EXTENSIONS:
+            continue
+        # a photo named same as products of different brands is used for all of them
+        for pdt_id in products.get(name.strip().lower(), []):
+            photos.setdefault(pdt_id, os.path.join(folder, filename))
+    return photos
+
+
+def import_photos(folder, progress=None):
+    """ set matched photos of folder as product images. photos are decoded and
+    resized in a pool of processes. progress(done, total) is called after each
+    photo. returns number of products whose image was set """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    photos = match_photos(folder)
+    filenames = sorted(set(photos.values()))
+    images = {}
+    # spawn instead of fork, as forking a process having Qt threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(mp_context=context) as pool:
+        for i, data in enumerate(pool.map(encode_image_file, filenames, chunksize=4)):
+            images[filenames[i]] = data
+            if progress:
+                progress(i+1, len(filenames))
+    product_images = {pdt_id: images[filename] for pdt_id, filename in photos.items()
+                        if images[filename]}
+    set_product_images(product_images)
+    return len(product_images)
@@ -8,12 +8,18 @@ from PyQt5.QtGui import (QPixmap, QPainter, QPen, QFontMetrics, QFont, QIcon,
 )
 from PyQt5.QtWidgets import (QGridLayout, QVBoxLayout, QHBoxLayout, QFormLayout,
     QSizePolicy, QDialog, QDialogButtonBox, QFrame, QGroupBox, QWidget, QScrollArea,
-    QLabel, QLineEdit, QPushButton, QCompleter, QMenu
+    QLabel, QLineEdit, QPushButton, QCompleter, QMenu, QMessageBox
 )
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
 
 from purchase_manager import ProductInput, DateEdit
+from core.common import App, is_valid_date, to_sortable_date, get_product_title
+from core.file_io import save_new_sales
+from core.stock import get_stock_text
+from core.profiler import timed, measure
+from core.client import PriceClient
 
+import os
 from datetime import datetime
 
 
@@ -31,6 +37,8 @@ class InvoiceDialog(QDialog):
         shop_name = self.settings.value("ShopName", "ARINDAMSOFT COMPANY")
         shop_addr = self.settings.value("ShopAddr", "Kshirgram, Purba Bardhaman")
         shop_contact = self.settings.value("ShopContact", "arindamsoft94@gmail.com")
+        # price server url, empty means use local data files
+        server_url = os.environ.get("PRICEMEM_SERVER", self.settings.value("ServerUrl", ""))
         self.settings.endGroup()
 
         self.frame = QFrame(self)
@@ -60,6 +68,7 @@ class InvoiceDialog(QDialog):
         self.itemEdit = ProductInput(self.groupBox_2)
         self.itemEdit.button.hide()# hide the add product button
         self.itemEdit.setPlaceholderText("Item Name")
+        self.stockLabel = QLabel(self.groupBox_2)
         self.quantityEdit = QLineEdit(self.groupBox_2)
         self.quantityEdit.setPlaceholderText("Quantity")
         self.quantityEdit.setValidator(QDoubleValidator(0.0, 99999.0, 3, self.quantityEdit))
@@ -89,6 +98,9 @@ class InvoiceDialog(QDialog):
         self.shopAddrEdit = QLineEdit(self.frame_3)
         self.shopContactLabel = QLabel("Contact :", self.frame_3)
         self.shopContactEdit = QLineEdit(self.frame_3)
+        self.serverLabel = QLabel("Price Server :", self.frame_3)
+        self.serverEdit = QLineEdit(self.frame_3)
+        self.serverEdit.setPlaceholderText("host:port (optional)")
         self.toggleShopSettingsVisibility()
 
         self.scrollArea = QScrollArea(self)
@@ -127,6 +139,7 @@ class InvoiceDialog(QDialog):
         self.gridLayout_2.addWidget(self.quantityEdit, 1, 0, 1, 1)
         self.gridLayout_2.addWidget(self.rateEdit, 1, 1, 1, 1)
         self.gridLayout_2.addWidget(self.priceEdit, 1, 2, 1, 1)
+        self.gridLayout_2.addWidget(self.stockLabel, 2, 0, 1, 2)
         self.gridLayout_2.addWidget(self.addItemBtn, 2, 2, 1, 1)
 
         self.hboxLayout = QHBoxLayout(self.frame_2)
@@ -138,6 +151,7 @@ class InvoiceDialog(QDialog):
         self.formLayout_3.addRow(self.shopNameLabel, self.shopNameEdit)
         self.formLayout_3.addRow(self.shopAddrLabel, self.shopAddrEdit)
         self.formLayout_3.addRow(self.shopContactLabel, self.shopContactEdit)
+        self.formLayout_3.addRow(self.serverLabel, self.serverEdit)
 
         self.verticalLayout = QVBoxLayout(self.frame)
         self.verticalLayout.addWidget(self.frame_1)
@@ -158,6 +172,7 @@ class InvoiceDialog(QDialog):
         self.shopNameEdit.setText(shop_name)
         self.shopAddrEdit.setText(shop_addr)
         self.shopContactEdit.setText(shop_contact)
+        self.serverEdit.setText(server_url)
 
         # --------- Connect Signals ------------
         self.invoice.editItemRequested.connect(self.editItem)
@@ -167,6 +182,7 @@ class InvoiceDialog(QDialog):
         self.addressEdit.textChanged.connect(self.updateInvoiceData)
         self.mobNoEdit.textChanged.connect(self.updateInvoiceData)
         self.itemEdit.productSelected.connect(self.onProductSelect)
+        self.itemEdit.barcodeScanned.connect(self.onBarcodeScan)
         self.quantityEdit.textEdited.connect(self.onQuantityChange)
         self.rateEdit.textEdited.connect(self.onRateChange)
         self.priceEdit.textEdited.connect(self.onPriceChange)
@@ -177,13 +193,16 @@ class InvoiceDialog(QDialog):
         self.shopNameEdit.textChanged.connect(self.updateInvoiceData)
         self.shopAddrEdit.textChanged.connect(self.updateInvoiceData)
         self.shopContactEdit.textChanged.connect(self.updateInvoiceData)
+        self.serverEdit.editingFinished.connect(self.connectToServer)
         self.printBtn.clicked.connect(self.printInvoice)
         self.newBtn.clicked.connect(self.newInvoice)
         self.buttonBox.accepted.connect(self.accept)
         self.buttonBox.rejected.connect(self.reject)
 
         self.updateInvoiceData()
-        self.itemEdit.updateData()# load auto-completion data
+        self.client = None
+        self.server_url = None
+        self.connectToServer()# also loads auto-completion data
         self.resize(win_w, win_h)
         if win_maximized:
             self.setWindowFlags(Qt.Window)# without this line the maximize does not work
@@ -221,11 +240,39 @@ class InvoiceDialog(QDialog):
         self.shopAddrEdit.setHidden(hide)
         self.shopContactLabel.setHidden(hide)
         self.shopContactEdit.setHidden(hide)
+        self.serverLabel.setHidden(hide)
+        self.serverEdit.setHidden(hide)
         self.shopSettingsBtn.setText("Shop Settings" if hide else "Hide Settings")
 
 
+    def connectToServer(self):
+        """ use price server if server url is given, otherwise local data """
+        url = self.serverEdit.text().strip()
+        if url==self.server_url:
+            return
+        self.server_url = url
+        self.client = None
+        products = App.products
+        if url:
+            client = PriceClient(url)
+            try:
+                products = client.products()
+                self.client = client
+            except (OSError, ValueError) as e:
+                QMessageBox.warning(self, "Server Error",
+                    "Could not connect to price server, using local data.\n%s" % e)
+        self.itemEdit.updateData(products)
+
     def onProductSelect(self, product):
         self.rateEdit.setText(product[4])
+        if self.client:
+            try:
+                stock = self.client.product(product[0])["stock"]
+                self.stockLabel.setText("In Stock : %g" % round(stock, 3))
+            except (OSError, ValueError):
+                self.stockLabel.clear()
+        else:
+            self.stockLabel.setText(get_stock_text(product[0]))
 
     def onQuantityChange(self, quantity):
         if quantity and self.rateEdit.text():
@@ -249,19 +296,51 @@ class InvoiceDialog(QDialog):
         price = self.priceEdit.text()
         if not item or not quantity or not rate or not price:
             return
-        self.invoice.addItem([item, quantity, "%.2f"%float(rate), "%.2f"%float(price)])
+        # items typed without selecting from list are not tracked in stock
+        pdt_id = self.itemEdit.product and self.itemEdit.product[0] or ""
+        self.invoice.addItem([item, quantity, "%.2f"%float(rate), "%.2f"%float(price), pdt_id])
         self.clearAddItemsWidget()
         self.invoice.redraw()
 
+    def onBarcodeScan(self, product):
+        """ add one of the scanned product, or one more if it is already in invoice """
+        # invoice has only a few items, so searching them is fast
+        for item in self.invoice.item_list:
+            if item[4]==product[0]:
+                quantity = float(item[1]) + 1
+                item[1] = "%g" % quantity
+                item[3] = "%.2f" % (quantity*float(item[2]))
+                break
+        else:
+            try:
+                rate = "%.2f" % float(product[4])
+            except ValueError:
+                # invalid price, so rate is to be typed
+                self.itemEdit.setText(get_product_title(product))
+                self.itemEdit.product = product
+                self.quantityEdit.setText("1")
+                self.onProductSelect(product)
+                self.rateEdit.setFocus()
+                return
+            self.invoice.addItem([get_product_title(product), "1", rate, rate, product[0]])
+        self.invoice.redraw()
+
     def editItem(self, item):
-        item, quantity, rate, price = item
+        item, quantity, rate, price, pdt_id = item
         self.itemEdit.setText(item)
+        self.itemEdit.product = self.findProduct(pdt_id)
         self.quantityEdit.setText(quantity)
         self.rateEdit.setText("%g"%float(rate))
         self.priceEdit.setText("%g"%float(price))
 
+    def findProduct(self, pdt_id):
+        for product in self.itemEdit.products:
+            if product[0]==pdt_id:
+                return product
+
     def clearAddItemsWidget(self):
         self.itemEdit.clear()
+        self.stockLabel.clear()
         self.quantityEdit.clear()
         self.rateEdit.clear()
         self.priceEdit.clear()
@@ -295,11 +374,31 @@ class InvoiceDialog(QDialog):
             transform = QTransform.fromScale(scale, scale)
             #transform.translate(rect.x(), rect.y())
             painter.setTransform(transform)
-            self.invoice.drawOnPainter(painter, page_w_px, page_h_px)
-            painter.end()
+            with measure("Invoice.print"):
+                self.invoice.drawOnPainter(painter, page_w_px, page_h_px)
+                painter.end()
             invoice_no = self.invoiceNoEdit.text()
             if invoice_no and int(invoice_no) > self.last_invoice_no:
                 self.last_invoice_no = int(invoice_no)
+                # invoice is finalized when printed first time, so deduct from stock
+                self.saveSales()
+
+    def saveSales(self):
+        date = self.dateEdit.text()
+        date = is_valid_date(date) and to_sortable_date(date) or datetime.today().strftime("%Y%m%d")
+        invoice_no = self.invoice.invoice_no
+        sales = [[date, invoice_no, pdt_id, quantity, price]
+                for item, quantity, rate, price, pdt_id in self.invoice.item_list if pdt_id]
+        if not sales:
+            return
+        if self.client:
+            try:
+                self.client.saveNewSales(sales)
+                return
+            except (OSError, ValueError) as e:
+                QMessageBox.warning(self, "Server Error",
+                    "Could not save sales to price server, saving locally.\n%s" % e)
+        save_new_sales(sales)
 
 
     def done(self, val):
@@ -313,6 +412,7 @@ class InvoiceDialog(QDialog):
         self.settings.setValue("ShopName", self.shopNameEdit.text())
         self.settings.setValue("ShopAddr", self.shopAddrEdit.text())
         self.settings.setValue("ShopContact", self.shopContactEdit.text())
+        self.settings.setValue("ServerUrl", self.serverEdit.text())
         self.settings.endGroup()
         QDialog.done(self, val)
 
@@ -337,7 +437,7 @@ class Invoice(QLabel):
         self.cust_name = ""
         self.address = ""
         self.mob_no = ""
-        self.item_list = []# all item data are str
+        self.item_list = []# each item is [name, quantity, rate, price, pdt_id], all str
         self.delivery_charge = 0
         self.discount = 0
         # table pos an dimension
@@ -363,6 +463,7 @@ class Invoice(QLabel):
         if len(self.item_list)<self.max_item:
             self.item_list.append(item)
 
+    @timed("Invoice.redraw")
     def redraw(self):
         pm = QPixmap(self.page_w, self.page_h)
         pm.fill(Qt.white)
@@ -496,14 +597,14 @@ class Invoice(QLabel):
         total = 0
         for i, item in enumerate(self.item_list):
             painter.drawText(getCellRect(i+1,0), Qt.AlignCenter, str(i+1))
-            for j, text in enumerate(item):
+            for j, text in enumerate(item[:4]):
                 if j==0:
                     painter.drawText(getCellRect(i+1,j+1), Qt.AlignLeft|Qt.AlignVCenter, " "+text)# space is used for padding
                 elif j==1:
                     painter.drawText(getCellRect(i+1,j+1), Qt.AlignCenter, text)
                 else:
                     painter.drawText(getCellRect(i+1,j+1), Qt.AlignRight|Qt.AlignVCenter, text)
-            total += float(item[-1])
+            total += float(item[3])
 
 
         if self.item_list:
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" loads data files in a worker thread, so that the window is usable while loading """
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core import load_data
+
+
+class DataLoader(QThread):
+    # signals
+    productsLoaded = pyqtSignal()
+    dataLoaded = pyqtSignal()# purchases, sales and stock are also loaded
+    loadingFailed = pyqtSignal(str)
+
+    def run(self):
+        try:
+            load_data(self.onProgress)
+        except Exception as e:
+            self.loadingFailed.emit(str(e))
+
+    def onProgress(self, stage):
+        """ called in worker thread, the signals are received in main thread """
+        if stage=="products":
+            self.productsLoaded.emit()
+        else:
+            self.dataLoaded.emit()
@@ -10,7 +10,7 @@ sys.path.append(os.path.dirname(__file__)) # for enabling python 2 like import
 from __init__ import __version__, COPYRIGHT_YEAR, AUTHOR_NAME, AUTHOR_EMAIL
 
 
-from PyQt5.QtCore import Qt, qVersion, pyqtSignal, QSettings, QSize, QPoint
+from PyQt5.QtCore import Qt, qVersion, pyqtSignal, QSettings, QSize, QPoint, QTimer
 
 from PyQt5.QtGui import QIcon, QPixmap, QImage, QPainter
 
@@ -18,19 +18,41 @@ from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QStatusBar, QGridLayout, QWidget,
     QLineEdit, QScrollArea, QDialog, QComboBox, QDialogButtonBox, QLabel, QToolButton,
     QMenu, QHBoxLayout, QVBoxLayout, QStyleOption, QStyle, QSizePolicy, QFileDialog,
-    QMessageBox, QCheckBox, QStyleFactory
+    QMessageBox, QCheckBox, QStyleFactory, QProgressDialog, QInputDialog
 )
 
 import resources_rc
-from purchase_manager import NewPurchaseDialog, PurchaseHistoryDialog, ProductHistoryDialog
-from invoice import InvoiceDialog
+# dialog modules (and printing support used by invoice) are imported on first use,
+# so that they do not delay showing the window
 from common import App, updateDataPaths
 from file_io import *
+from core import (search_products, get_image_path, get_facet_counts, get_categories,
+    filter_products, sort_products, get_product_by_barcode)
+from core.stock import get_stock_text
+from core.replication import sync_folder
+from core.snapshot import save_snapshot
+from core.backup import backup_data, list_backups, restore_backup
+from watcher import DataWatcher
+from loader import DataLoader
+from sparkline import get_sparkline
+from core.profiler import Profiler, timed, measure, set_profiling_enabled, export_trace
 
 import platform
+import multiprocessing
 
 
-categories = ["Electronics", "Electricals", "Grocery", "Hardware",
+# number of product widgets created at once, rest are created after processing
+# events in batches of double size, so that the list is laid out only a few times
+PRODUCTS_PER_BATCH = 50
+
+# sort orders of product list (see core/ordering.py), None keeps the saved order
+SORT_ORDER_NAMES = [(None, "Default Order"), ("name", "Name"), ("price", "Price"),
+        ("recently_purchased", "Recently Purchased"),
+        ("frequently_purchased", "Frequently Purchased"),
+        ("recently_added", "Recently Added")]
+
+# shown in new product dialog when there is no product yet
+DEFAULT_CATEGORIES = ["Electronics", "Electricals", "Grocery", "Hardware",
         "Mobile Accessories", "Stationary", "Services"]
 
 
@@ -49,6 +71,8 @@ class Window(QMainWindow):
         height = int(self.settings.value("WindowHeight", 480))
         maximized = self.settings.value("WindowMaximized", "false") == "true"
         App.last_product_id = self.settings.value("LastProdID", App.last_product_id)
+        index = self.sortCombo.findData(self.settings.value("SortOrder", "", type=str) or None)
+        self.sortCombo.setCurrentIndex(max(index, 0))
 
         # show window
         self.resize(width, height)
@@ -63,10 +87,19 @@ class Window(QMainWindow):
         painter.drawImage(0,0, QImage(":/icons/pricemem.png"))
         painter.end()
         self.productsContainer = None
+        self.pending_products = []
+        self.listed_products = []
+        self.productsTimer = QTimer(self)
+        self.productsTimer.timeout.connect(self.addProductWidgets)
 
-        App.products = read_products_file()
-        self.showProductList(App.products)
-        App.purchases = read_purchases_file()
+        # data is loaded in other thread, actions which need it wait until loaded
+        self.waiting_actions = []
+        self.dataWatcher = None
+        self.loader = DataLoader(self)
+        self.loader.productsLoaded.connect(self.onProductsLoaded)
+        self.loader.dataLoaded.connect(self.onDataLoaded)
+        self.loader.loadingFailed.connect(self.onLoadingFailed)
+        self.loadData()
 
 
     def setupUi(self):
@@ -75,10 +108,26 @@ class Window(QMainWindow):
 
         self.statusbar = QStatusBar(self)
         self.setStatusBar(self.statusbar)
+        # shows last few timings when profiling is enabled
+        self.timingsLabel = QLabel(self.statusbar)
+        self.statusbar.addPermanentWidget(self.timingsLabel)
+        self.timings = []
+        Profiler.listeners.append(self.onTimingMeasured)
 
         # create main menu
         menu = QMenu(self)
         menu.addAction(QIcon(":/icons/edit-clear.png"), "Clear Database", self.clearData)
+        profilingAction = menu.addAction("Profiling", self.toggleProfiling)
+        profilingAction.setCheckable(True)
+        profilingAction.setChecked(Profiler.enabled)
+        menu.addAction("Export Trace...", self.exportTrace)
+        menu.addAction("Sync With Folder...", self.syncWithFolder)
+        menu.addAction("Import Photos...", self.importPhotos)
+        menu.addAction("Change Prices...", lambda : self.whenDataLoaded(self.repriceProducts))
+        menu.addAction("Reports...", lambda : self.whenDataLoaded(self.showReports))
+        menu.addAction("Reorder Suggestions...", lambda : self.whenDataLoaded(self.showReorderSuggestions))
+        menu.addAction("Backup Data", self.backupData)
+        menu.addAction("Restore Backup...", self.restoreBackup)
         menu.addAction(QIcon(":/icons/help-about.png"), "About", self.showAbout)
         # Menu Button
         menuBtn = QToolButton(self.centralwidget)
@@ -114,7 +163,19 @@ class Window(QMainWindow):
         quitBtn.setShortcut("Ctrl+Q")
         quitBtn.setToolTip("Quit")
 
-        searchbar = SearchBar(self.centralwidget)
+        self.searchbar = searchbar = SearchBar(self.centralwidget)
+        # filter products by category and brand
+        self.categoryFilter = QComboBox(self.centralwidget)
+        self.categoryFilter.setToolTip("Category")
+        self.brandFilter = QComboBox(self.centralwidget)
+        self.brandFilter.setToolTip("Brand")
+        self.sortCombo = QComboBox(self.centralwidget)
+        self.sortCombo.setToolTip("Sort By")
+        for order, name in SORT_ORDER_NAMES:
+            self.sortCombo.addItem(name, order)
+        for combo in (self.categoryFilter, self.brandFilter, self.sortCombo):
+            combo.setSizeAdjustPolicy(QComboBox.AdjustToContents)
+            combo.setMaximumWidth(200)
 
         self.scrollArea = QScrollArea(self.centralwidget)
         self.scrollArea.setWidgetResizable(True)
@@ -130,6 +191,9 @@ class Window(QMainWindow):
         self.toolbarLayout.addWidget(purchaseHistoryBtn)
         self.toolbarLayout.addWidget(invoiceBtn)
         self.toolbarLayout.addWidget(searchbar)
+        self.toolbarLayout.addWidget(self.categoryFilter)
+        self.toolbarLayout.addWidget(self.brandFilter)
+        self.toolbarLayout.addWidget(self.sortCombo)
         self.toolbarLayout.addWidget(quitBtn)
         # add other layout  and widgets to main layout
         self.layout = QGridLayout(self.centralwidget)
@@ -137,13 +201,74 @@ class Window(QMainWindow):
         self.layout.addWidget(self.scrollArea, 1,0,1,1)
 
         searchbar.searchRequested.connect(self.search)
-        addProductBtn.clicked.connect(self.addNewProduct)
-        addPurchaseBtn.clicked.connect(self.addNewPurchase)
-        purchaseHistoryBtn.clicked.connect(self.showPurchaseHistory)
-        invoiceBtn.clicked.connect(self.generateInvoice)
+        self.categoryFilter.activated.connect(self.onFilterChanged)
+        self.brandFilter.activated.connect(self.onFilterChanged)
+        self.sortCombo.activated.connect(self.onSortOrderChanged)
+        addProductBtn.clicked.connect(lambda : self.whenDataLoaded(self.addNewProduct))
+        addPurchaseBtn.clicked.connect(lambda : self.whenDataLoaded(self.addNewPurchase))
+        purchaseHistoryBtn.clicked.connect(lambda : self.whenDataLoaded(self.showPurchaseHistory))
+        invoiceBtn.clicked.connect(lambda : self.whenDataLoaded(self.generateInvoice))
         quitBtn.clicked.connect(self.close)
 
 
+    def onProductsLoaded(self):
+        self.updateFilters()
+        # keep the search text typed while loading
+        self.search(self.searchbar.text())
+        self.statusbar.showMessage(self.statusbar.currentMessage() + ", loading purchases...")
+
+    def onDataLoaded(self):
+        App.data_loaded = True
+        self.updateStock()
+        # the list was sorted before purchases were loaded
+        if self.sortCombo.currentData() in ("recently_purchased", "frequently_purchased"):
+            self.search(self.searchbar.text())
+        self.statusbar.showMessage("Loaded %d products and %d purchases" % (
+                                    len(App.products), len(App.purchases)))
+        # watch for changes by other instances using same data directory
+        self.dataWatcher = DataWatcher(self)
+        self.dataWatcher.productsChanged.connect(self.onProductsChanged)
+        self.dataWatcher.stockChanged.connect(self.updateStock)
+        actions, self.waiting_actions = self.waiting_actions, []
+        for func in actions:
+            func()
+
+    def loadData(self):
+        """ load data files in other thread """
+        self.loading_failed = False
+        self.statusbar.showMessage("Loading products...")
+        # the thread may not have finished yet after failure
+        self.loader.wait()
+        self.loader.start()
+
+    def onLoadingFailed(self, error):
+        btn = QMessageBox.critical(self, "Loading Failed", "Could not load data files.\n%s" % error,
+                                    QMessageBox.Retry|QMessageBox.Cancel)
+        if btn==QMessageBox.Retry:
+            return self.loadData()
+        self.loading_failed = True
+        # actions waiting for data can not be done
+        self.statusbar.showMessage("Loading failed" + (self.waiting_actions and
+                ", %d waiting actions cancelled" % len(self.waiting_actions) or ""))
+        self.waiting_actions = []
+
+    def whenDataLoaded(self, func):
+        """ call func now if data is loaded, otherwise after it is loaded """
+        if App.data_loaded:
+            func()
+        elif self.loading_failed:
+            btn = QMessageBox.warning(self, "Data Not Loaded",
+                    "Data files could not be loaded. Try loading again ?",
+                    QMessageBox.Retry|QMessageBox.Cancel)
+            if btn==QMessageBox.Retry:
+                self.waiting_actions.append(func)
+                self.loadData()
+        elif func not in self.waiting_actions:
+            self.waiting_actions.append(func)
+            self.statusbar.showMessage("Waiting for data to be loaded...")
+
+
+    @timed("Window.showProductList")
     def showProductList(self, products):
         if self.productsContainer:
             self.clearProductList()
@@ -152,17 +277,37 @@ class Window(QMainWindow):
         self.scrollAreaLayout.addWidget(self.productsContainer)
 
         self.productsLayout = QVBoxLayout(self.productsContainer)
-
-        for pdt_info in products:
-            item = ProductWidget(pdt_info, self.productsContainer)
-            self.productsLayout.addWidget(item)
         self.productsLayout.addStretch()
+        self.listed_products = products
+        # first screenful is shown now, the rest is added in background
+        self.pending_products = products
+        self.batch_size = PRODUCTS_PER_BATCH
+        self.addProductWidgets()
 
         self.statusbar.showMessage("Showing %d items"%len(products))
 
+    def addProductWidgets(self):
+        """ add widgets of next batch of products to be shown. the widgets are
+        created in a hidden container, as adding each widget to visible list is slow """
+        products = self.pending_products[:self.batch_size]
+        self.pending_products = self.pending_products[self.batch_size:]
+        self.batch_size *= 2
+        batch = QWidget(self.productsContainer)
+        layout = QVBoxLayout(batch)
+        layout.setContentsMargins(0,0,0,0)
+        for pdt_info in products:
+            layout.addWidget(ProductWidget(pdt_info, batch))
+        self.productsLayout.insertWidget(self.productsLayout.count()-1, batch)
+        if self.pending_products:
+            self.productsTimer.start(0)
+        else:
+            self.productsTimer.stop()
+
     def clearProductList(self):
         if not self.productsContainer:
             return
+        self.pending_products = []
+        self.productsTimer.stop()
         count = self.productsLayout.count() - 1 # last one is spacer item
         for i in reversed(range(count)):
             item = self.productsLayout.takeAt(i).widget()
@@ -178,58 +323,229 @@ class Window(QMainWindow):
         dlg = ProductEditDialog(self)
         if dlg.exec()!=QDialog.Accepted:
             return
-        name, brand, category, price, description, image = dlg.getValues()
-        pdt_info = save_new_product(name, brand, category, price, description, image)
+        name, brand, category, price, description, barcode, image = dlg.getValues()
+        pdt_info = save_new_product(name, brand, category, price, description, barcode, image)
         widget = ProductWidget(pdt_info, self.productsContainer)
         self.productsLayout.insertWidget(self.productsLayout.count()-1, widget)
+        self.updateFilters()
         return pdt_info
 
     def addNewPurchase(self):
+        from purchase_manager import NewPurchaseDialog
         dlg = NewPurchaseDialog(self)
         if dlg.exec()==QDialog.Accepted:
             save_new_purchases(dlg.purchases)
+            self.updateStock()
 
     def showPurchaseHistory(self):
+        from purchase_manager import PurchaseHistoryDialog
         dlg = PurchaseHistoryDialog(self)
         dlg.exec()
+        # some purchases may have been deleted
+        self.updateStock()
 
     def generateInvoice(self):
+        from invoice import InvoiceDialog
         dlg = InvoiceDialog(self)
         dlg.exec()
+        self.updateStock()
+
+    def repriceProducts(self):
+        """ change price of all products in the list """
+        from repricing import RepriceDialog
+        dlg = RepriceDialog(self.listed_products, self)
+        if dlg.exec()!=QDialog.Accepted:
+            return
+        # the products are changed in place, so only their widgets are updated
+        changed = set(product[0] for product in dlg.changed_products)
+        for item in self.productsContainer.findChildren(ProductWidget):
+            if item.product_info[0] in changed:
+                item.update()
+        if self.sortCombo.currentData()=="price":
+            self.search(self.searchbar.text())
+        self.statusbar.showMessage("Changed price of %d products" % len(changed))
+
+    def showReports(self):
+        from analytics import AnalyticsDialog
+        dlg = AnalyticsDialog(self)
+        dlg.exec()
+
+    def showReorderSuggestions(self):
+        from reorder import ReorderDialog
+        dlg = ReorderDialog(self)
+        dlg.exec()
+
+    def onProductsChanged(self):
+        """ show the changed products list, keeping current search filter """
+        self.updateFilters()
+        self.search(self.searchbar.text())
+
+    def updateFilters(self):
+        """ update categories and brands and their product counts in filter combos """
+        for combo, field, all_text, empty_text in (
+                (self.categoryFilter, "category", "All Categories", "No Category"),
+                (self.brandFilter, "brand", "All Brands", "No Brand")):
+            selected = combo.currentData()
+            counts = get_facet_counts(field)
+            combo.clear()
+            combo.addItem(all_text, None)
+            for value in sorted(counts, key=str.lower):
+                combo.addItem("%s (%d)" % (value or empty_text, counts[value]), value)
+            # the selected value may not exist anymore
+            index = combo.findData(selected) if selected is not None else 0
+            combo.setCurrentIndex(max(index, 0))
+
+    def onFilterChanged(self):
+        self.search(self.searchbar.text())
+
+    def onSortOrderChanged(self):
+        self.settings.setValue("SortOrder", self.sortCombo.currentData() or "")
+        self.search(self.searchbar.text())
+
+    def updateStock(self):
+        """ update stock labels of the products in list """
+        if not self.productsContainer:
+            return
+        for item in self.productsContainer.findChildren(ProductWidget):
+            item.updateStock()
 
+    @timed("Window.search")
     def search(self, text=""):
-        # filter products
-        if text:
-            result = []# list of (pdt_id, matches_count) tuple
-            words = [x.lower() for x in text.split()]
-            i = 0
-            for product in App.products:
-                product_name = product[1].lower()
-                matches = 0 # number of matched words
-                for word in words:
-                    if word in product_name:
-                        matches += 1
-                if matches:
-                    result.append((i, matches))
-                i += 1
-            # sort the result, according to number of matched words
-            result = sorted(result, key=lambda x: x[1])
-            products = [App.products[i[0]] for i in result]
-        else:
-            products = App.products
-        self.showProductList(products)
+        # without search text, filtered and sorted products are taken from the indexes
+        products = search_products(text) if text else None
+        category, brand = self.categoryFilter.currentData(), self.brandFilter.currentData()
+        if category is not None or brand is not None:
+            products = filter_products(products, category, brand)
+        order = self.sortCombo.currentData()
+        if order:
+            products = sort_products(order, products)
+        self.showProductList(App.products if products is None else products)
 
     def clearData(self):
+        if not App.data_loaded:
+            return self.whenDataLoaded(self.clearData)
         dlg = ClearDataDialog(self)
         if dlg.exec()!=QDialog.Accepted:
             return
+        if not (dlg.productsBtn.isChecked() or dlg.purchasesBtn.isChecked()):
+            return
+        # so that the cleared data can be restored
+        try:
+            name, stats = backup_data("before-clear")
+        except OSError as e:
+            QMessageBox.warning(self, "Backup Failed", "Database is not cleared.\n%s" % e)
+            return
+        self.statusbar.showMessage("Saved backup %s" % name)
         # clear products data
         if dlg.productsBtn.isChecked():
             clear_products_data()
-            self.showProductList(App.products)
+            self.onProductsChanged()
         # clear purchases data
         if dlg.purchasesBtn.isChecked():
             clear_purchases_data()
+            # stock and purchase rate trend of listed products
+            self.updateStock()
+            if self.sortCombo.currentData() in ("recently_purchased", "frequently_purchased"):
+                self.search(self.searchbar.text())
+
+    def toggleProfiling(self, enable):
+        set_profiling_enabled(enable)
+        if not enable:
+            self.timingsLabel.clear()
+
+    def onTimingMeasured(self, name, duration):
+        # nested measurements are also shown, the outermost one comes last
+        if not self.timings:# update label once after a burst of measurements
+            QTimer.singleShot(0, self.showTimings)
+        self.timings = (self.timings + ["%s : %.1f ms" % (name, duration)])[-3:]
+
+    def showTimings(self):
+        self.timingsLabel.setText(" | ".join(self.timings))
+        self.timings = []
+
+    def exportTrace(self):
+        filename, filtr = QFileDialog.getSaveFileName(self, "Export Trace",
+                        "pricemem-trace.json", "Trace Files (*.json);;")
+        if not filename:
+            return
+        export_trace(filename)
+        self.statusbar.showMessage("%d events saved to %s" % (len(Profiler.events), filename))
+
+    def syncWithFolder(self):
+        """ exchange changes with other shop terminals through a shared folder """
+        if not App.data_loaded:
+            return self.whenDataLoaded(self.syncWithFolder)
+        folder = QFileDialog.getExistingDirectory(self, "Shared Sync Folder",
+                        self.settings.value("SyncFolder", "", type=str))
+        if not folder:
+            return
+        self.settings.setValue("SyncFolder", folder)
+        try:
+            sent, received = sync_folder(folder)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Sync Failed", str(e))
+            return
+        if received:
+            self.onProductsChanged()
+        self.statusbar.showMessage("Sent %d, received %d changes" % (sent, received))
+
+    def backupData(self):
+        if not App.data_loaded:
+            return self.whenDataLoaded(self.backupData)
+        try:
+            name, stats = backup_data()
+        except OSError as e:
+            QMessageBox.warning(self, "Backup Failed", str(e))
+            return
+        self.statusbar.showMessage("Saved backup %s (copied %d, unchanged %d files)" % (
+                                    name, stats["copied"], stats["linked"]))
+
+    def restoreBackup(self):
+        if not App.data_loaded:
+            return self.whenDataLoaded(self.restoreBackup)
+        backups = list_backups()[::-1]
+        if not backups:
+            QMessageBox.information(self, "No Backup", "There is no backup to restore.")
+            return
+        name, ok = QInputDialog.getItem(self, "Restore Backup",
+                    "Current data will be replaced by the backup :", backups, 0, False)
+        if not ok:
+            return
+        try:
+            restore_backup(name)
+        except OSError as e:
+            QMessageBox.warning(self, "Restore Failed", str(e))
+        else:
+            self.statusbar.showMessage("Restored backup %s" % name)
+        # data may have been partly restored on failure
+        self.onProductsChanged()
+
+    def importPhotos(self):
+        """ set photos of a folder as images of products, matched by file name """
+        if not App.data_loaded:
+            return self.whenDataLoaded(self.importPhotos)
+        folder = QFileDialog.getExistingDirectory(self, "Folder of Product Photos",
+                        self.settings.value("PhotosFolder", "", type=str))
+        if not folder:
+            return
+        self.settings.setValue("PhotosFolder", folder)
+        from images import import_photos
+        progressDlg = QProgressDialog("Importing Photos...", None, 0, 0, self)
+        progressDlg.setWindowModality(Qt.WindowModal)
+        progressDlg.setMinimumDuration(0)
+        def progress(done, total):
+            progressDlg.setMaximum(total)
+            progressDlg.setValue(done)
+            QApplication.processEvents()
+        try:
+            count = import_photos(folder, progress)
+        except OSError as e:
+            QMessageBox.warning(self, "Import Failed", str(e))
+            return
+        finally:
+            progressDlg.close()
+        self.search(self.searchbar.text())
+        self.statusbar.showMessage("Imported photos of %d products" % count)
 
     def showAbout(self):
         lines = ("<h1>PriceMem</h1>",
@@ -246,6 +562,10 @@ class Window(QMainWindow):
             self.settings.setValue("WindowHeight", self.height())
         self.settings.setValue("WindowMaximized", self.isMaximized())
         self.settings.setValue("LastProdID", App.last_product_id)
+        self.loader.wait()
+        # next start is faster if data is not changed until then
+        if App.data_loaded:
+            save_snapshot()
         QMainWindow.closeEvent(self, ev)
 
 
@@ -265,6 +585,10 @@ class ProductWidget(QWidget):
         self.title = QLabel(self)
         self.title.setStyleSheet("QLabel { color: #000099;}")
         self.price = QLabel(self)
+        self.stock = QLabel(self)
+        self.stock.setStyleSheet("QLabel { color: #555555;}")
+        self.sparkline = QLabel(self)
+        self.sparkline.setToolTip("Purchase rate trend")
         # buttons
         self.editBtn = QToolButton(self)
         self.editBtn.setIcon(QIcon(":/icons/edit.png"))
@@ -279,25 +603,36 @@ class ProductWidget(QWidget):
         layout.addWidget(self.deleteBtn, 0,3,1,1)
         layout.addWidget(self.historyBtn, 0,4,1,1)
         layout.addWidget(self.title, 1,1,1,4)
-        layout.addWidget(self.price, 2,1,1,4)
+        layout.addWidget(self.price, 2,1,1,1)
+        layout.addWidget(self.sparkline, 2,2,1,1)
+        layout.addWidget(self.stock, 2,3,1,2)
         # connect signals
-        self.editBtn.clicked.connect(self.edit)
-        self.deleteBtn.clicked.connect(self.delete)
-        self.historyBtn.clicked.connect(self.showHistory)
+        self.editBtn.clicked.connect(lambda : App.window.whenDataLoaded(self.edit))
+        self.deleteBtn.clicked.connect(lambda : App.window.whenDataLoaded(self.delete))
+        self.historyBtn.clicked.connect(lambda : App.window.whenDataLoaded(self.showHistory))
 
         self.update()
 
     def update(self):
-        pdt_id, name, brand, category, price, description = self.product_info
+        pdt_id, name, brand, category, price, description, barcode = self.product_info
         self.title.setText(name)
         self.brand.setText(brand)
         self.price.setText("Rs. %s/-"%price)
+        self.updateStock()
         # set image
-        img = QImage(App.IMAGES_DIR + "/%s.jpg"%pdt_id)
-        img = img.isNull() and App.product_icon or img.scaled(64,64, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        with measure("ProductWidget.loadImage"):
+            filename = get_image_path(pdt_id)
+            img = QImage(filename) if filename else QImage()
+            img = img.isNull() and App.product_icon or img.scaled(64,64, Qt.KeepAspectRatio, Qt.SmoothTransformation)
         self.thumbnail.setPixmap(QPixmap.fromImage(img))
         #self.setToolTip(description)
 
+    def updateStock(self):
+        """ update stock and purchase rate trend, which change with purchases """
+        if App.data_loaded:
+            self.stock.setText(get_stock_text(self.product_info[0]))
+            self.sparkline.setPixmap(get_sparkline(self.product_info[0]) or QPixmap())
+
     def paintEvent(self, paint_ev):
         """ this function is needed, otherwise stylesheet is not applied properly """
         o = QStyleOption()
@@ -309,43 +644,35 @@ class ProductWidget(QWidget):
         pdt_id = self.product_info[0]
         dlg = ProductEditDialog(self)
         dlg.setWindowTitle("Edit Product Details")
-        img = QImage(App.IMAGES_DIR + "/%s.jpg"%pdt_id)
+        dlg.pdt_id = pdt_id
+        filename = get_image_path(pdt_id)
+        img = QImage(filename) if filename else QImage()
         if img.isNull():
             img = None
         dlg.setValues(*self.product_info[1:], img)
         if dlg.exec()!=QDialog.Accepted:
             return
-        name, brand, category, price, description, image = dlg.getValues()
-        self.product_info.clear()
-        self.product_info += [pdt_id, name, brand, category, price, description]
-        # save the product image
+        name, brand, category, price, description, barcode, image = dlg.getValues()
+        update_product(self.product_info, name, brand, category, price, description, barcode)
+        # save the product image, or remove it if image is None
         if dlg.image_changed:
-            img_filename = App.IMAGES_DIR + "/%s.jpg"%pdt_id
-            if dlg.image and not image.isNull():
-                if not os.path.exists(App.IMAGES_DIR):
-                    os.mkdir(App.IMAGES_DIR)
-                image.save(img_filename)
-            else:
-                # image changed and is None, means image has been removed
-                if os.path.isfile(img_filename):# also checks if file exists
-                    os.remove(img_filename)
+            save_product_image(pdt_id, image)
         self.update()
-        save_products_file()
+        App.window.updateFilters()
 
     def delete(self):
         btn = QMessageBox.warning(self, "Delete Product ?",
                 "Are you sure to delete the product permanently ?", QMessageBox.Ok|QMessageBox.Cancel)
         if btn!=QMessageBox.Ok:
             return
-        img_filename = App.IMAGES_DIR + "/%s.jpg"%self.product_info[0]
-        if os.path.exists(img_filename):
-            os.remove(img_filename)
-        App.products.remove(self.product_info)
-        save_products_file()
+        # the image is also removed, if no other product has same image
+        delete_product(self.product_info)
         self.parent().layout().removeWidget(self)
         self.deleteLater()
+        App.window.updateFilters()
 
     def showHistory(self):
+        from purchase_manager import ProductHistoryDialog
         dlg = ProductHistoryDialog(self.product_info, self)
         dlg.exec()
 
@@ -405,12 +732,18 @@ class ProductEditDialog(QDialog):
         self.nameEdit.setPlaceholderText("Name")
         self.brandEdit = QLineEdit(self)
         self.brandEdit.setPlaceholderText("Brand")
+        # categories of existing products, and a new one can be typed
         self.categoryCombo = QComboBox(self)
-        self.categoryCombo.addItems(["Unknown"] + categories)
+        self.categoryCombo.setEditable(True)
+        self.categoryCombo.setInsertPolicy(QComboBox.NoInsert)
+        categories = get_categories() or DEFAULT_CATEGORIES
+        self.categoryCombo.addItems(["Unknown"] + [x for x in categories if x!="Unknown"])
         self.priceEdit = QLineEdit(self)
         self.priceEdit.setPlaceholderText("Price")
         self.descriptionEdit = QLineEdit(self)
         self.descriptionEdit.setPlaceholderText("Description")
+        self.barcodeEdit = QLineEdit(self)
+        self.barcodeEdit.setPlaceholderText("Barcode")
         self.buttonbox = QDialogButtonBox(QDialogButtonBox.Save|QDialogButtonBox.Cancel, Qt.Horizontal, self)
 
         self.gridLayout = QGridLayout(self)
@@ -419,7 +752,8 @@ class ProductEditDialog(QDialog):
         self.gridLayout.addWidget(self.brandEdit, 1,1,1,2)
         self.gridLayout.addWidget(self.categoryCombo, 2,1,1,1)
         self.gridLayout.addWidget(self.priceEdit, 2,2,1,1)
-        self.gridLayout.addWidget(self.descriptionEdit, 3,0,1,3)
+        self.gridLayout.addWidget(self.descriptionEdit, 3,0,1,2)
+        self.gridLayout.addWidget(self.barcodeEdit, 3,2,1,1)
         self.gridLayout.addWidget(self.buttonbox, 4,0,1,3)
 
         self.imageLabel.mousePressed.connect(self.showThumbnailMenu)
@@ -428,26 +762,27 @@ class ProductEditDialog(QDialog):
 
         self.image = None
         self.image_changed = False
+        # id of the product being edited, which may keep its own barcode
+        self.pdt_id = None
         self.imageLabel.setImage(self.image)
-        index = self.categoryCombo.findText(App.last_category)
-        if index>=0:
-            self.categoryCombo.setCurrentIndex(index)
+        self.categoryCombo.setCurrentText(App.last_category)
 
 
-    def setValues(self, name=None, brand=None, category=None, price=None, description=None, image=None):
+    def setValues(self, name=None, brand=None, category=None, price=None, description=None,
+                    barcode=None, image=None):
         """ this function is used when new product is added """
         if name:
             self.nameEdit.setText(name)
         if brand:
             self.brandEdit.setText(brand)
         if category:
-            index = self.categoryCombo.findText(category)
-            if index>=0:
-                self.categoryCombo.setCurrentIndex(index)
+            self.categoryCombo.setCurrentText(category)
         if price:
             self.priceEdit.setText(price)
         if description:
             self.descriptionEdit.setText(description)
+        if barcode:
+            self.barcodeEdit.setText(barcode)
         if image:
             self.image = image
             self.imageLabel.setImage(self.image)
@@ -455,10 +790,11 @@ class ProductEditDialog(QDialog):
     def getValues(self):
         name = self.nameEdit.text()
         brand = self.brandEdit.text()
-        category = self.categoryCombo.currentText()
+        category = self.categoryCombo.currentText().strip() or "Unknown"
         price = self.priceEdit.text()
         description = self.descriptionEdit.text()
-        return name, brand, category, price, description, self.image
+        barcode = self.barcodeEdit.text().strip()
+        return name, brand, category, price, description, barcode, self.image
 
 
     def showThumbnailMenu(self, pos):
@@ -488,7 +824,15 @@ class ProductEditDialog(QDialog):
     def accept(self):
         if self.nameEdit.text()=="" or self.priceEdit.text()=="":
             return
-        App.last_category = self.categoryCombo.currentText()
+        barcode = self.barcodeEdit.text().strip()
+        product = barcode and get_product_by_barcode(barcode)
+        if product and product[0]!=self.pdt_id:
+            btn = QMessageBox.warning(self, "Barcode Already Used",
+                    "The barcode is already used by '%s'.\nSave anyway ?" % product[1],
+                    QMessageBox.Save|QMessageBox.Cancel)
+            if btn!=QMessageBox.Save:
+                return
+        App.last_category = self.categoryCombo.currentText().strip() or "Unknown"
         QDialog.accept(self)
 
 
@@ -513,6 +857,8 @@ class ClearDataDialog(QDialog):
 
 
 def main():
+    # the photos are imported in worker processes
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     #app.setOrganizationName("Arindamsoft")
     app.setApplicationName("PriceMem")
@@ -13,10 +13,19 @@ from PyQt5.QtWidgets import (
 )
 
 from common import App
-from file_io import save_purchases_file
+from core.common import (get_product_title, is_valid_date, to_sortable_date,
+    to_readable_date, get_quantity_number
+)
+from core.file_io import delete_purchases
+from core.history import (get_date_range, get_purchases, get_product_history,
+    get_purchase_titles, get_purchase_title, get_purchase_on, get_last_rate
+)
+from core.barcodes import get_product_by_barcode
+from core.prices import get_sell_price_on, get_price_versions
+from charts import PriceChart
+from core.profiler import timed
 
 from datetime import datetime
-import calendar
 
 
 class NewPurchaseDialog(QDialog):
@@ -68,10 +77,13 @@ class NewPurchaseDialog(QDialog):
         self.buttonbox.accepted.connect(self.accept)
         self.buttonbox.rejected.connect(self.reject)
         self.addButton.clicked.connect(self.addToList)
+        self.productEdit.barcodeScanned.connect(self.onBarcodeScan)
 
         self.productEdit.updateData()
         # result
         self.purchases = []
+        # {(date, pdt_id) : (row, rate)} of purchases added by scanning barcode
+        self.scanned_rows = {}
 
     def addToList(self):
         # get data
@@ -91,26 +103,59 @@ class NewPurchaseDialog(QDialog):
         if not price:
             QMessageBox.warning(self, "Price Empty", "Price is Empty !")
             return
-        row_data = [date, product[0], get_product_title(product), quantity, price]
+        self.addRow(date, product, quantity, price)
+        # clear fields
+        self.productEdit.clear()
+        self.quantityEdit.clear()
+        self.priceEdit.clear()
+
+    def addRow(self, date, product, quantity, price):
+        """ add purchase in list and show it in table, returns the row """
+        # title is not saved, it is shown from product
+        row_data = [to_sortable_date(date), product[0], "", quantity, price]
         # show data
         row = self.purchaseTable.rowCount()
         self.purchaseTable.insertRow(row)
-        for col,val in enumerate(row_data[:1]+row_data[2:]+[product[4]]):
+        for col,val in enumerate([date, get_product_title(product), quantity, price, product[4]]):
             item = QTableWidgetItem(val)
             self.purchaseTable.setItem(row, col, item)
             if col!=1:
                 item.setTextAlignment(Qt.AlignCenter)
-
-        row_data[0] = to_sortable_date(row_data[0])
         self.purchases.append(row_data)
-        # clear fields
-        self.productEdit.clear()
-        self.quantityEdit.clear()
-        self.priceEdit.clear()
+        return row
+
+    def onBarcodeScan(self, product):
+        """ add one of the scanned product at its last purchase rate, or one more
+        if it has already been scanned """
+        date = self.dateEdit.text()
+        if not is_valid_date(date):
+            QMessageBox.warning(self, "Invalid Date", "Date is not valid !")
+            return
+        scanned = self.scanned_rows.get((date, product[0]))
+        if scanned:
+            row, rate = scanned
+            row_data = self.purchases[row]
+            quantity = get_quantity_number(row_data[3]) + 1
+            row_data[3], row_data[4] = "%g" % quantity, "%g" % round(rate*quantity, 2)
+            self.purchaseTable.item(row, 2).setText(row_data[3])
+            self.purchaseTable.item(row, 3).setText(row_data[4])
+            return
+        rate = get_last_rate(product[0])
+        if rate is None:
+            # never purchased, so price is to be typed
+            self.productEdit.setText(get_product_title(product))
+            self.productEdit.product = product
+            self.quantityEdit.setText("1")
+            self.priceEdit.setFocus()
+            return
+        row = self.addRow(date, product, "1", "%g" % round(rate, 2))
+        self.scanned_rows[(date, product[0])] = (row, rate)
 
 
 class ProductInput(QLineEdit):
     productSelected = pyqtSignal(list)
+    # a barcode scanner types the barcode and presses Enter
+    barcodeScanned = pyqtSignal(list)
 
     def __init__(self, parent):
         QLineEdit.__init__(self, parent)
@@ -133,6 +178,10 @@ class ProductInput(QLineEdit):
 
         self.textEdited.connect(self.onTextEdit)
         self.product = None
+        # list of products shown in completer
+        self.products = []
+        # {barcode : product} of products which are not App.products
+        self.barcodes = None
 
     def onTextEdit(self, text):
         # here we can not check for popup visibility.
@@ -156,19 +205,44 @@ class ProductInput(QLineEdit):
         # index.row() returns the index in completionModel, not the original
         # model we have set. it can be obtained using sibling() method
         index = index.sibling(index.row(), 1).data(Qt.DisplayRole)
-        self.product = App.products[int(index)]
+        self.product = self.products[int(index)]
         self.productSelected.emit(self.product)
 
-    def updateData(self):
+    def updateData(self, products=None):
+        """ load completion data from products list (default : App.products) """
+        self.products = products if products is not None else App.products
+        self.barcodes = None
         model = self._completer.model()
-        model.setRowCount(len(App.products))
+        model.setRowCount(len(self.products))
         model.setColumnCount(2)
-        for i, product in enumerate(App.products):
+        for i, product in enumerate(self.products):
             item = QStandardItem(get_product_title(product))
             model.setItem(i,0, item)
             item = QStandardItem(str(i))
             model.setItem(i,1, item)
 
+    def findBarcode(self, barcode):
+        """ returns the product having the barcode, or None """
+        barcode = barcode.strip()
+        if not barcode:
+            return None
+        if self.products is App.products:
+            return get_product_by_barcode(barcode)
+        # products from price server
+        if self.barcodes is None:
+            self.barcodes = {product[6]: product for product in self.products if product[6]}
+        return self.barcodes.get(barcode)
+
+    def keyPressEvent(self, ev):
+        if ev.key() in (Qt.Key_Return, Qt.Key_Enter):
+            product = self.findBarcode(self.text())
+            if product:
+                # the Enter is not passed to dialog, so that it does not add item
+                self.clear()
+                self.barcodeScanned.emit(product)
+                return
+        QLineEdit.keyPressEvent(self, ev)
+
     def resizeEvent(self, ev):
         self.button.move(self.width()-22,3)
         QLineEdit.resizeEvent(self, ev)
@@ -178,21 +252,6 @@ class ProductInput(QLineEdit):
         self.product = None
 
 
-def get_product_title(product):
-    """ get title in 'NAME (BRAND)' format """
-    s = "%s" % product[1]# name
-    s += product[2] and " (%s)"%product[2] or ""# brand
-    return s
-
-
-def is_valid_date(date):
-    try:
-        datetime.strptime(date, "%d/%m/%Y")
-        return True
-    except:
-        return False
-
-
 class PurchaseHistoryDialog(QDialog):
     def __init__(self, parent):
         QDialog.__init__(self, parent)
@@ -247,35 +306,27 @@ class PurchaseHistoryDialog(QDialog):
         self.toDateEdit.setVisible(show_range)
         self.updateTable()
 
+    @timed("PurchaseHistoryDialog.updateTable")
     def updateTable(self):
         # filter according to dates
         date_filter = self.filterCombo.currentText()
-        if date_filter == "Show All":
-            purchases = App.purchases
+        if date_filter=="Date Range":
+            start_date = self.fromDateEdit.text()
+            end_date = self.toDateEdit.text()
+            if not is_valid_date(start_date) or not is_valid_date(end_date):
+                return
+            start_date = to_sortable_date(start_date)
+            end_date = to_sortable_date(end_date)
         else:
-            today = datetime.today()
-            end_date = today.strftime("%Y%m%d")
-            if date_filter=="1 Month":
-                start_date = monthdelta(today, -1)
-            elif date_filter=="6 Months":
-                start_date = monthdelta(today, -6)
-            elif date_filter=="1 Year":
-                start_date = monthdelta(today, -12)
-            elif date_filter=="Date Range":
-                start_date = self.fromDateEdit.text()
-                end_date = self.toDateEdit.text()
-                if not is_valid_date(start_date) or not is_valid_date(end_date):
-                    return
-                start_date = to_sortable_date(start_date)
-                end_date = to_sortable_date(end_date)
-            purchases = filter(lambda x : start_date<=x[0]<=end_date, App.purchases)
-        # sort according to date
-        self.purchases = sorted(purchases, key=lambda x : x[0])
+            start_date, end_date = get_date_range(date_filter)
+        # sorted according to date
+        self.purchases = get_purchases(start_date, end_date)
+        titles = get_purchase_titles()
 
         self.purchaseTable.clearContents()
         self.purchaseTable.setRowCount(len(self.purchases))
         for row, row_data in enumerate(self.purchases):
-            row_data = [to_readable_date(row_data[0])] + row_data[2:]
+            row_data = [to_readable_date(row_data[0]), get_purchase_title(row_data, titles)] + row_data[3:]
             for col, text in enumerate(row_data):
                 item = QTableWidgetItem(text)
                 self.purchaseTable.setItem(row, col, item)
@@ -297,12 +348,12 @@ class PurchaseHistoryDialog(QDialog):
         rows = self.purchaseTable.selectionModel().selectedRows()
         selected_rows = [item.row() for item in rows]
         selected_rows.sort(reverse=True)
+        deleted = []
         for row in selected_rows:
             self.purchaseTable.removeRow(row)
-            item = self.purchases.pop(row)
-            App.purchases.remove(item)
+            deleted.append(self.purchases.pop(row))
         self.purchaseTable.clearSelection()
-        save_purchases_file()
+        delete_purchases(deleted)
 
 
 
@@ -327,31 +378,23 @@ class DateEdit(QLineEdit):
 
 
 
-# equivalent to datetime.strptime(date, "%d/%m/%Y").strftime("%Y%m%d")
-def to_sortable_date(date):
-    """ convert from human readable DD/MM/YYYY to sortable YYYYMMDD format """
-    return date[6:] + date[3:5] + date[:2]
-
-def to_readable_date(date):
-    """ convert from sortable YYYYMMDD to human readable DD/MM/YYYY format """
-    return "%s/%s/%s" % (date[6:], date[4:6], date[:4])
-
-def monthdelta(date, delta):
-    m, y = (date.month+delta) % 12, date.year + ((date.month)+delta-1) // 12
-    m = m or 12
-    d = min(date.day, calendar.monthrange(y, m)[1])
-    return date.replace(day=d,month=m, year=y).strftime("%Y%m%d")
-
-
-
 class ProductHistoryDialog(QDialog):
     """ Purchase History of a particular product """
     def __init__(self, product_info, parent):
         QDialog.__init__(self, parent)
         self.product_id = product_info[0]
+        self.product_price = product_info[4]
         self.setWindowTitle("Product Purchase History")
-        self.resize(480, 480)
-
+        self.resize(480, 600)
+
+        # purchase rate and sell price on a date
+        self.priceDateLabel = QLabel("Price on", self)
+        self.priceDateEdit = DateEdit(self)
+        self.priceDateEdit.setPlaceholderText("DDMMYYYY")
+        self.priceDateEdit.setMaximumWidth(self.priceDateEdit.height()*3)
+        self.priceDateEdit.setToday()
+        self.priceOnDateLabel = QLabel(self)
+        self.priceChart = PriceChart(self)
         self.purchaseTable = QTableWidget(self)
         self.purchaseTable.setAlternatingRowColors(True)
         self.purchaseTable.setColumnCount(4)
@@ -361,40 +404,47 @@ class ProductHistoryDialog(QDialog):
         self.btnBox = QDialogButtonBox(QDialogButtonBox.Close, Qt.Horizontal, self)
 
         layout = QGridLayout(self)
-        layout.addWidget(self.purchaseTable, 0,0,1,1)
-        layout.addWidget(self.btnBox, 1,0,1,1)
-
+        layout.addWidget(self.priceDateLabel, 0,0,1,1)
+        layout.addWidget(self.priceDateEdit, 0,1,1,1)
+        layout.addWidget(self.priceOnDateLabel, 0,2,1,1)
+        layout.addWidget(self.priceChart, 1,0,1,3)
+        layout.addWidget(self.purchaseTable, 2,0,1,3)
+        layout.addWidget(self.btnBox, 3,0,1,3)
+        layout.setColumnStretch(2, 1)
+
+        self.priceDateEdit.textChanged.connect(self.showPriceOnDate)
         self.btnBox.accepted.connect(self.accept)
         self.btnBox.rejected.connect(self.reject)
 
         self.updateTable()
+        self.showPriceOnDate()
+
+    def showPriceOnDate(self):
+        """ show the purchase rate and sell price effective on entered date """
+        text = self.priceDateEdit.text()
+        if not is_valid_date(text):
+            self.priceOnDateLabel.clear()
+            return
+        date = to_sortable_date(text)
+        purchase = get_purchase_on(self.product_id, date)
+        sell_price = get_sell_price_on(self.product_id, date)
+        rate = purchase and "Rs. %g (bought on %s)" % (purchase[3], to_readable_date(purchase[0]))
+        self.priceOnDateLabel.setText("Purchase Rate : %s,  Sell Price : %s" % (
+                        rate or "-", sell_price and "Rs. %s" % sell_price or "-"))
 
 
+    @timed("ProductHistoryDialog.updateTable")
     def updateTable(self):
-        # filter according to dates
-        purchases = App.purchases
-        purchases = filter(lambda x : x[1]==self.product_id, App.purchases)
-        purchases = sorted(purchases, key=lambda x : x[0])
+        purchases = get_product_history(self.product_id)
+        # a product whose price never changed has its current price since start
+        sell_prices = get_price_versions(self.product_id) or [("00000000", self.product_price)]
+        self.priceChart.setData([(row[0], row[3]) for row in purchases], sell_prices)
 
         self.purchaseTable.setRowCount(len(purchases))
 
-        for row, row_data in enumerate(purchases):
-            date, pdt_id, title, quantity, price = row_data
-            rate = "%g" % (float(price)/get_quantity_number(quantity))
-            row_data = [to_readable_date(date), quantity, price, rate]
+        for row, (date, quantity, price, rate) in enumerate(purchases):
+            row_data = [to_readable_date(date), quantity, price, "%g" % rate]
             for col, text in enumerate(row_data):
                 item = QTableWidgetItem(text)
                 self.purchaseTable.setItem(row, col, item)
                 item.setTextAlignment(Qt.AlignCenter)
-
-import re
-# matches 1 or 1kg or 1.0kg or 1.0 kg
-quantity_re = re.compile("(\d+([.]\d+)?)\D*")
-
-def get_quantity_number(text):
-    """ returns 1.0 from 1.0kg """
-    match = quantity_re.match(text)
-    if match:
-        return float(match.group(1))
-    else:
-        return 1
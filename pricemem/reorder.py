@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import (
+    QDialog, QLabel, QGridLayout, QComboBox, QDialogButtonBox,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+
+from core.common import get_product_title, to_readable_date
+from core.forecast import get_reorder_report, get_reorder_date
+
+# (name, days) of periods in which products are expected to run out
+REORDER_PERIODS = [("1 Week", 7), ("2 Weeks", 14), ("1 Month", 30), ("All Products", None)]
+
+
+class ReorderDialog(QDialog):
+    """ products expected to run out soon, from their purchase history """
+    def __init__(self, parent):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle("Reorder Suggestions")
+        self.resize(640, 480)
+
+        periodLabel = QLabel("Running out in :", self)
+        self.periodCombo = QComboBox(self)
+        for name, days in REORDER_PERIODS:
+            self.periodCombo.addItem(name, days)
+        self.reorderTable = QTableWidget(self)
+        self.reorderTable.setAlternatingRowColors(True)
+        self.reorderTable.setColumnCount(5)
+        self.reorderTable.setHorizontalHeaderLabels(["Product", "Last Purchase",
+                                    "Purchased Every", "Quantity", "Runs Out On"])
+        self.reorderTable.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.reorderTable.verticalHeader().setDefaultSectionSize(25)
+        self.reorderTable.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.btnBox = QDialogButtonBox(QDialogButtonBox.Close, Qt.Horizontal, self)
+
+        layout = QGridLayout(self)
+        layout.addWidget(periodLabel, 0,0,1,1)
+        layout.addWidget(self.periodCombo, 0,1,1,1)
+        layout.addWidget(self.reorderTable, 1,0,1,3)
+        layout.addWidget(self.btnBox, 2,0,1,3)
+        layout.setColumnStretch(2, 1)
+
+        self.periodCombo.currentIndexChanged.connect(self.updateTable)
+        self.btnBox.accepted.connect(self.accept)
+        self.btnBox.rejected.connect(self.reject)
+
+        self.updateTable()
+
+    def updateTable(self):
+        days = self.periodCombo.currentData()
+        report = get_reorder_report(days and get_reorder_date(days))
+        today = get_reorder_date(0)
+        self.reorderTable.setRowCount(len(report))
+        for row, (product, forecast) in enumerate(report):
+            row_data = [get_product_title(product), to_readable_date(forecast["last_date"]),
+                        "%g days" % round(forecast["interval"], 1),
+                        "%g" % round(forecast["quantity"], 2),
+                        to_readable_date(forecast["run_out_date"])]
+            for col, text in enumerate(row_data):
+                item = QTableWidgetItem(text)
+                if col:
+                    item.setTextAlignment(Qt.AlignCenter)
+                # already run out
+                if forecast["run_out_date"] <= today:
+                    item.setForeground(QColor("#cc0000"))
+                self.reorderTable.setItem(row, col, item)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QDoubleValidator
+from PyQt5.QtWidgets import (
+    QDialog, QLabel, QLineEdit, QGridLayout, QComboBox, QDialogButtonBox,
+    QTableWidget, QTableWidgetItem, QHeaderView
+)
+
+from core.common import get_product_title
+from core.repricing import preview_repricing, apply_repricing
+
+# (rule, name, unit of value) see core/repricing.py
+REPRICE_RULE_NAMES = [("percent", "Increase by Percent", "%"),
+        ("amount", "Increase by Amount", "Rs."),
+        ("margin", "Margin over Purchase Rate", "%")]
+
+ROUND_TO = [(0, "No Rounding"), (1, "Round to Rs. 1"), (5, "Round to Rs. 5"),
+        (10, "Round to Rs. 10")]
+
+
+class RepriceDialog(QDialog):
+    """ change sell price of the products shown in list """
+    def __init__(self, products, parent):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle("Change Prices")
+        self.resize(480, 480)
+        self.products = products
+        self.changes = []
+        self.changed_products = []
+
+        self.productsLabel = QLabel("%d products in list will be repriced" % len(products), self)
+        self.ruleCombo = QComboBox(self)
+        for rule, name, unit in REPRICE_RULE_NAMES:
+            self.ruleCombo.addItem(name, rule)
+        self.valueEdit = QLineEdit(self)
+        self.valueEdit.setPlaceholderText("Value")
+        self.valueEdit.setValidator(QDoubleValidator(self))
+        self.unitLabel = QLabel(self)
+        self.roundCombo = QComboBox(self)
+        for step, name in ROUND_TO:
+            self.roundCombo.addItem(name, step)
+        self.previewTable = QTableWidget(self)
+        self.previewTable.setAlternatingRowColors(True)
+        self.previewTable.setColumnCount(3)
+        self.previewTable.setHorizontalHeaderLabels(["Product", "Old Price", "New Price"])
+        self.previewTable.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.previewTable.verticalHeader().setDefaultSectionSize(25)
+        self.previewTable.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.btnBox = QDialogButtonBox(QDialogButtonBox.Apply|QDialogButtonBox.Cancel, Qt.Horizontal, self)
+        self.applyBtn = self.btnBox.button(QDialogButtonBox.Apply)
+
+        layout = QGridLayout(self)
+        layout.addWidget(self.productsLabel, 0,0,1,4)
+        layout.addWidget(self.ruleCombo, 1,0,1,1)
+        layout.addWidget(self.valueEdit, 1,1,1,1)
+        layout.addWidget(self.unitLabel, 1,2,1,1)
+        layout.addWidget(self.roundCombo, 1,3,1,1)
+        layout.addWidget(self.previewTable, 2,0,1,4)
+        layout.addWidget(self.btnBox, 3,0,1,4)
+
+        self.ruleCombo.currentIndexChanged.connect(self.updatePreview)
+        self.valueEdit.textChanged.connect(self.updatePreview)
+        self.roundCombo.currentIndexChanged.connect(self.updatePreview)
+        self.applyBtn.clicked.connect(self.accept)
+        self.btnBox.rejected.connect(self.reject)
+
+        self.updatePreview()
+
+    def updatePreview(self):
+        """ show old and new price of the products whose price will change """
+        rule = self.ruleCombo.currentData()
+        self.unitLabel.setText(REPRICE_RULE_NAMES[self.ruleCombo.currentIndex()][2])
+        try:
+            value = float(self.valueEdit.text())
+        except ValueError:
+            value = None
+        if value is None:
+            self.changes = []
+        else:
+            self.changes = preview_repricing(self.products, rule, value,
+                                            self.roundCombo.currentData())
+        self.previewTable.setRowCount(len(self.changes))
+        for row, (product, price) in enumerate(self.changes):
+            for col, text in enumerate((get_product_title(product), product[4], price)):
+                item = QTableWidgetItem(text)
+                if col:
+                    item.setTextAlignment(Qt.AlignCenter)
+                self.previewTable.setItem(row, col, item)
+        self.applyBtn.setEnabled(bool(self.changes))
+
+    def accept(self):
+        self.changed_products = apply_repricing(self.changes)
+        QDialog.accept(self)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" small chart of purchase rate over time, shown in each product row """
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QPointF
+from PyQt5.QtGui import QPixmap, QPainter, QPen, QColor, QPolygonF
+
+from core.history import get_product_purchases, get_rate
+
+SPARKLINE_WIDTH = 80
+SPARKLINE_HEIGHT = 24
+# number of drawn sparklines kept (about 8 KB each), those of recently shown products
+MAX_CACHED_SPARKLINES = 5000
+
+
+class Sparklines:
+    # {pdt_id : (purchase rows, pixmap)}, the pixmap is drawn again when the
+    # list of purchase rows of the product is replaced (see core/history.py)
+    cache = OrderedDict()
+
+
+def draw_sparkline(rates):
+    """ returns QPixmap of line chart of the rates """
+    pixmap = QPixmap(SPARKLINE_WIDTH, SPARKLINE_HEIGHT)
+    pixmap.fill(Qt.transparent)
+    margin = 3
+    low, high = min(rates), max(rates)
+    scale = (SPARKLINE_HEIGHT - 2*margin) / ((high - low) or 1)
+    step = (SPARKLINE_WIDTH - 2*margin) / max(len(rates) - 1, 1)
+    points = [QPointF(margin + i*step, SPARKLINE_HEIGHT - margin - (rate - low)*scale)
+                for i, rate in enumerate(rates)]
+    if len(points)==1:# a flat line for single purchase
+        points.append(QPointF(SPARKLINE_WIDTH - margin, points[0].y()))
+    # red if cost has risen, green if fallen
+    if rates[-1] > rates[0]:
+        color = QColor("#cc0000")
+    elif rates[-1] < rates[0]:
+        color = QColor("#008800")
+    else:
+        color = QColor("#777777")
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(QPen(color, 1.5))
+    painter.drawPolyline(QPolygonF(points))
+    painter.setBrush(color)
+    painter.drawEllipse(points[-1], 2, 2)
+    painter.end()
+    return pixmap
+
+
+def get_sparkline(pdt_id):
+    """ returns QPixmap of purchase rate trend of the product, or None if it
+    has not been purchased """
+    rows = get_product_purchases(pdt_id)
+    if not rows:
+        return None
+    cached = Sparklines.cache.get(pdt_id)
+    if cached and cached[0] is rows:
+        Sparklines.cache.move_to_end(pdt_id)
+        return cached[1]
+    rates = []
+    for row in rows:
+        try:
+            rates.append(get_rate(row))
+        except (ValueError, ZeroDivisionError):# invalid price or quantity
+            pass
+    pixmap = draw_sparkline(rates) if rates else None
+    Sparklines.cache[pdt_id] = (rows, pixmap)
+    if len(Sparklines.cache) > MAX_CACHED_SPARKLINES:
+        Sparklines.cache.popitem(last=False)
+    return pixmap
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" reloads data files when changed by other PriceMem instances sharing the data directory """
+import os
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from core.common import App
+from core.file_io import sync_products, sync_deleted_products, sync_purchases, sync_sales
+from core.prices import sync_prices, prices_filename
+
+
+class DataWatcher(QObject):
+    # signals
+    productsChanged = pyqtSignal()
+    stockChanged = pyqtSignal()# purchases or sales changed
+
+    def __init__(self, parent):
+        QObject.__init__(self, parent)
+        self.watcher = QFileSystemWatcher(self)
+        # a file is usually changed many times while being written,
+        # so reload once after it has been quiet for a while
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(300)
+        self.timer.timeout.connect(self.reload)
+        self.watcher.fileChanged.connect(self.timer.start)
+        # files which are created or replaced are known from directory change
+        self.watcher.directoryChanged.connect(self.timer.start)
+        # data directory must exist to be watched
+        if not os.path.exists(App.DATA_DIR):
+            os.makedirs(App.DATA_DIR)
+        self.watchFiles()
+
+    def watchFiles(self):
+        """ watch the data files which exist (a removed file is unwatched automatically) """
+        watched = self.watcher.files() + self.watcher.directories()
+        paths = [App.DATA_DIR, App.PRODUCTS_FILE, App.PURCHASES_FILE, App.SALES_FILE,
+                App.DELETED_PRODUCTS_FILE, prices_filename()]
+        paths = [path for path in paths if path not in watched and os.path.exists(path)]
+        if paths:
+            self.watcher.addPaths(paths)
+
+    def reload(self):
+        """ only the new rows are loaded if a file was appended """
+        self.watchFiles()
+        products_changed = sync_products()
+        # titles of deleted products, shown in purchase history
+        sync_deleted_products()
+        # only the price may have changed, without change of products file
+        if sync_prices() or products_changed:
+            self.productsChanged.emit()
+        purchases_changed = sync_purchases()
+        sales_changed = sync_sales()
+        if purchases_changed or sales_changed:
+            self.stockChanged.emit()
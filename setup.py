@@ -33,9 +33,10 @@ setup(
         'Operating System :: MacOS :: MacOS X',
         'Programming Language :: Python :: 3',
     ],
-    packages=['pricemem'],
+    packages=['pricemem', 'pricemem.core'],
     entry_points={
       'gui_scripts': ['pricemem=pricemem.main:main'],
+      'console_scripts': ['pricemem-server=pricemem.core.server:main'],
     },
     data_files = data_files,
     include_package_data=True,
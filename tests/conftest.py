@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" headless tests of pricemem.core, run with `python3 -m pytest tests` """
+import os
+import sys
+import subprocess
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from pricemem.core import App, set_data_dir, load_data
+from pricemem.core.file_io import file_states
+
+
+def use_data_dir(data_dir):
+    """ switch to a data directory and load its data, like a new instance """
+    set_data_dir(str(data_dir))
+    file_states.clear()
+    load_data()
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = tmp_path / "PriceMem"
+    use_data_dir(data_dir)
+    return data_dir
+
+
+def run_instance(data_dir, code):
+    """ run code in other process, as other PriceMem instance using same data directory """
+    script = "\n".join(["import sys", "sys.path.insert(0, %r)" % ROOT_DIR,
+            "from pricemem.core import *", "set_data_dir(%r)" % str(data_dir),
+            "load_data()", code])
+    subprocess.run([sys.executable, "-c", script], check=True)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" spend and margin reports """
+import os
+from datetime import datetime
+
+from pricemem.core import (save_new_product, save_new_purchases, delete_purchases,
+    delete_product, get_monthly_spend, get_top_products, get_margins)
+from pricemem.core.analytics import Analytics, rollups_filename
+
+from conftest import use_data_dir
+
+YEAR = str(datetime.today().year)
+OLD_YEAR = str(datetime.today().year - 5)
+
+
+def test_spend_follows_purchases(data_dir):
+    rice = save_new_product("Rice", "Tata", "Grocery", "50", "")
+    salt = save_new_product("Salt", "Tata", "Spices", "20", "")
+    bulb = save_new_product("Bulb", "Philips", "Electricals", "100", "")
+    save_new_purchases([[YEAR + "0105", rice[0], "", "5kg", "200"],
+                        [YEAR + "0110", salt[0], "", "10", "150"],
+                        [YEAR + "0203", rice[0], "", "2kg", "90"]])
+    assert get_monthly_spend("category")=={YEAR + "01": {"Grocery": 200, "Spices": 150},
+                                           YEAR + "02": {"Grocery": 90}}
+    # rollup is updated, not built again
+    months = Analytics.months
+    save_new_purchases([[YEAR + "0207", bulb[0], "", "4", "320"]])
+    delete_purchases([[YEAR + "0110", salt[0], "", "10", "150"]])
+    assert Analytics.months is months
+    assert get_monthly_spend("brand", YEAR + "0201")=={YEAR + "02": {"Tata": 90, "Philips": 320}}
+    assert get_top_products()==[(bulb[0], 320), (rice[0], 290)]
+    assert get_top_products(count=1)==[(bulb[0], 320)]
+    delete_product(bulb)
+    assert get_monthly_spend("brand", YEAR + "0201")=={YEAR + "02": {"Tata": 90, None: 320}}
+
+
+def test_spend_of_archived_years(data_dir):
+    rice = save_new_product("Rice", "Tata", "Grocery", "50", "")
+    save_new_purchases([[OLD_YEAR + "0105", rice[0], "", "1", "30"],
+                        [OLD_YEAR + "0305", rice[0], "", "1", "35"],
+                        [YEAR + "0105", rice[0], "", "1", "40"]])
+    use_data_dir(data_dir)
+    assert get_monthly_spend("category", OLD_YEAR + "0301")=={
+            OLD_YEAR + "03": {"Grocery": 35}, YEAR + "01": {"Grocery": 40}}
+    assert os.path.exists(rollups_filename())
+    # computed again only when the archived year is changed
+    delete_purchases([[OLD_YEAR + "0305", rice[0], "", "1", "35"]])
+    use_data_dir(data_dir)
+    assert get_top_products()==[(rice[0], 70)]
+
+
+def test_margins(data_dir):
+    rice = save_new_product("Rice", "Tata", "Grocery", "50", "")
+    salt = save_new_product("Salt", "Tata", "Spices", "20", "")
+    save_new_product("Oil", "Fortune", "Grocery", "150", "")
+    save_new_purchases([[YEAR + "0105", rice[0], "", "10kg", "400"],
+                        [YEAR + "0110", salt[0], "", "10", "190"]])
+    assert get_margins()==[[salt, 19.0, 1.0, 5.0], [rice, 40.0, 10.0, 20.0]]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" purchases of closed years in compressed archive """
+import os
+from datetime import datetime
+
+from pricemem.core import (App, save_new_product, save_new_purchases, delete_purchases,
+    get_purchases, get_product_history, get_stock, read_csv_file)
+from pricemem.core.archive import get_index, segment_filename
+
+from conftest import use_data_dir
+
+THIS_YEAR = datetime.today().year
+OLD_YEAR = THIS_YEAR - 5
+
+
+def test_closed_years_are_archived_on_load(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    old = ["%d0105" % OLD_YEAR, rice[0], "", "2", "80"]
+    new = ["%d0105" % THIS_YEAR, rice[0], "", "3", "120"]
+    save_new_purchases([old, new])
+    use_data_dir(data_dir)
+    assert read_csv_file(App.PURCHASES_FILE, 5)==[new]
+    assert App.purchases==[new]
+    assert os.path.exists(segment_filename(OLD_YEAR))
+    assert get_index()[str(OLD_YEAR)]["stock"]=={rice[0]: 2}
+    # queries reaching into closed years include the archive
+    assert get_purchases()==[old, new]
+    assert get_purchases("%d0101" % THIS_YEAR)==[new]
+    assert [item[0] for item in get_product_history(rice[0])]==[old[0], new[0]]
+    assert get_stock(rice[0])==5
+
+
+def test_delete_archived_purchase(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    old = ["%d0105" % OLD_YEAR, rice[0], "", "2", "80"]
+    save_new_purchases([old, ["%d0106" % OLD_YEAR, rice[0], "", "1", "40"]])
+    use_data_dir(data_dir)
+    assert delete_purchases([list(old)])==[old]
+    assert len(get_purchases())==1
+    assert get_stock(rice[0])==1
+    use_data_dir(data_dir)
+    assert get_stock(rice[0])==1
+    assert get_index()[str(OLD_YEAR)]["rows"]==1
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" incremental backups of data directory """
+import os
+import time
+
+from pricemem.core import (App, save_new_product, update_product, save_new_purchases,
+    get_stock, get_image_path, set_product_image, clear_products_data, clear_purchases_data)
+from pricemem.core.backup import backup_data, list_backups, restore_backup, backups_dir
+
+from conftest import use_data_dir
+
+TODAY = time.strftime("%Y%m%d")
+
+
+def make_files_old(data_dir):
+    """ so that the files are not treated as modified just now """
+    old = time.time() - 60
+    for dirpath, dirnames, filenames in os.walk(data_dir):
+        for filename in filenames:
+            os.utime(os.path.join(dirpath, filename), (old, old))
+
+
+def test_unchanged_files_are_linked(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    set_product_image(rice[0], b"photo")
+    make_files_old(data_dir)
+    name, stats = backup_data()
+    assert stats["linked"]==0
+    update_product(rice, "Basmati Rice", "", "Grocery", "50", "")
+    name2, stats = backup_data()
+    assert list_backups()==[name, name2]
+    # only products.csv is changed
+    assert stats["copied"]==1 and stats["linked"]>=2
+    image = os.path.basename(get_image_path(rice[0]))
+    st = os.stat("%s/%s/images/%s" % (backups_dir(), name2, image))
+    assert st.st_nlink==2
+    assert not os.path.exists("%s/%s/snapshot.pickle" % (backups_dir(), name2))
+
+
+def test_restore_cleared_data(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    set_product_image(rice[0], b"photo")
+    save_new_purchases([[TODAY, rice[0], "", "5", "200"]])
+    name, stats = backup_data("before-clear")
+    assert name.endswith("-before-clear")
+    clear_products_data()
+    clear_purchases_data()
+    assert App.products==[] and get_image_path(rice[0]) is None
+    restore_backup(name)
+    assert App.products==[rice]
+    assert get_stock(rice[0])==5
+    with open(get_image_path(rice[0]), "rb") as f:
+        assert f.read()==b"photo"
+    # new rows appended to restored data file do not change the backup
+    save_new_product("Oil", "", "Grocery", "120", "")
+    use_data_dir(data_dir)
+    assert len(App.products)==2
+    restore_backup(name)
+    assert App.products==[rice]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" finding products by barcode """
+from pricemem.core import (App, save_new_product, update_product, delete_product,
+    get_product_by_barcode)
+
+from conftest import run_instance, use_data_dir
+
+
+def test_barcodes_follow_changes(data_dir):
+    rice = save_new_product("Rice", "Tata", "Grocery", "50", "", "8901234567890")
+    salt = save_new_product("Salt", "Tata", "Grocery", "20", "")
+    assert get_product_by_barcode("8901234567890") is rice
+    assert get_product_by_barcode("") is None
+    update_product(salt, "Salt", "Tata", "Grocery", "20", "", "SALT-1")
+    assert get_product_by_barcode("SALT-1") is salt
+    # barcode is kept when not given, and old barcode is removed when changed
+    update_product(rice, "Basmati Rice", "Tata", "Grocery", "60", "")
+    assert get_product_by_barcode("8901234567890")[1]=="Basmati Rice"
+    update_product(rice, "Basmati Rice", "Tata", "Grocery", "60", "", "8900000000001")
+    assert get_product_by_barcode("8901234567890") is None
+    delete_product(salt)
+    assert get_product_by_barcode("SALT-1") is None
+    use_data_dir(data_dir)
+    assert get_product_by_barcode("8900000000001")[0]==rice[0]
+
+
+def test_barcodes_of_other_instance(data_dir):
+    save_new_product("Rice", "Tata", "Grocery", "50", "", "111")
+    assert get_product_by_barcode("111")
+    run_instance(data_dir, 'save_new_product("Oil", "", "Grocery", "120", "", "222")')
+    from pricemem.core import sync_products
+    sync_products()
+    assert get_product_by_barcode("222")[1]=="Oil"
+    assert len(App.products)==2
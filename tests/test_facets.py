@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" category and brand index """
+from pricemem.core import (App, save_new_product, update_product, delete_product,
+    search_products, get_facet_counts, get_categories, filter_products)
+
+from conftest import run_instance, use_data_dir
+
+
+def names(products):
+    return sorted(product[1] for product in products)
+
+
+def test_facets_follow_changes(data_dir):
+    rice = save_new_product("Rice", "Tata", "Grocery", "50", "")
+    salt = save_new_product("Salt", "Tata", "Grocery", "20", "")
+    bulb = save_new_product("Bulb", "Philips", "Electricals", "100", "")
+    assert get_categories()==["Electricals", "Grocery"]
+    assert get_facet_counts("brand")=={"Tata": 2, "Philips": 1}
+    assert names(filter_products(category="Grocery", brand="Tata"))==["Rice", "Salt"]
+    update_product(salt, "Salt", "", "Spices", "20", "")
+    delete_product(bulb)
+    assert get_facet_counts("category")=={"Grocery": 1, "Spices": 1}
+    assert get_facet_counts("brand")=={"Tata": 1, "": 1}
+    assert filter_products(brand="Philips")==[]
+    assert names(filter_products(brand=""))==["Salt"]
+    assert filter_products()==App.products
+
+
+def test_filter_search_result(data_dir):
+    save_new_product("Basmati Rice", "Tata", "Grocery", "90", "")
+    save_new_product("Rice Cooker", "Philips", "Electricals", "2000", "")
+    result = search_products("rice")
+    assert names(filter_products(result, category="Grocery"))==["Basmati Rice"]
+    assert filter_products(result, category="Grocery", brand="Philips")==[]
+
+
+def test_facets_of_reloaded_data(data_dir):
+    save_new_product("Rice", "Tata", "Grocery", "50", "")
+    assert get_categories()==["Grocery"]
+    run_instance(data_dir, 'save_new_product("Bulb", "Philips", "Electricals", "100", "")')
+    use_data_dir(data_dir)
+    assert get_categories()==["Electricals", "Grocery"]
+    save_new_product("Salt", "Tata", "Grocery", "20", "")
+    assert get_facet_counts("category")=={"Electricals": 1, "Grocery": 2}
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+from pricemem.core.file_io import (read_csv_file, read_new_csv_rows, append_csv_rows,
+    write_csv_file, PRODUCTS_HEADER)
+
+DESCRIPTIONS = ["", 'multi\nline "quoted"\n', "a,b", '""', "x\r\n\n,", "semi;colon"]
+
+
+def make_products(start, count):
+    return [["P%05d" % i, "Name %d" % i, "Brand", "Grocery", "10",
+            DESCRIPTIONS[i % len(DESCRIPTIONS)]] for i in range(start, start+count)]
+
+
+def test_quoted_newlines_round_trip(tmp_path):
+    filename = str(tmp_path / "products.csv")
+    rows = make_products(0, 300)
+    write_csv_file(filename, PRODUCTS_HEADER, rows)
+    # \r\n inside a quoted field is read back as \n in text mode
+    expected = [row[:5] + [row[5].replace("\r\n", "\n")] for row in rows]
+    assert read_csv_file(filename, 6)==expected
+
+
+def test_appended_rows_are_read_incrementally(tmp_path):
+    filename = str(tmp_path / "products.csv")
+    write_csv_file(filename, PRODUCTS_HEADER, make_products(0, 10))
+    assert len(read_csv_file(filename, 6))==10
+    assert read_new_csv_rows(filename, 6)==[]
+    new_rows = make_products(10, 5)
+    # appended by other instance
+    with open(filename, "a") as f:
+        f.write('P00010,"Name\n10",Brand,Grocery,10,\n')
+    assert read_new_csv_rows(filename, 6)==[["P00010", "Name\n10", "Brand", "Grocery", "10", ""]]
+    append_csv_rows(filename, PRODUCTS_HEADER, new_rows[1:])
+    assert read_new_csv_rows(filename, 6)==[]
+    assert len(read_csv_file(filename, 6))==15
+
+
+def test_rewritten_file_needs_full_read(tmp_path):
+    filename = str(tmp_path / "products.csv")
+    write_csv_file(filename, PRODUCTS_HEADER, make_products(0, 10))
+    read_csv_file(filename, 6)
+    with open(filename, "w") as f:
+        f.write(PRODUCTS_HEADER + "P00001,Other,,,5,\n")
+    assert read_new_csv_rows(filename, 6) is None
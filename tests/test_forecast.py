@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" reorder suggestions from purchase history """
+import time
+
+from pricemem.core import (save_new_product, save_new_purchases, delete_purchases,
+    delete_product, get_reorder_report)
+from pricemem.core.forecast import Forecasts
+
+YEAR = time.strftime("%Y")
+
+
+def test_reorder_report(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    salt = save_new_product("Salt", "", "Grocery", "20", "")
+    oil = save_new_product("Oil", "", "Grocery", "120", "")
+    save_new_purchases([[YEAR + "0101", rice[0], "", "10kg", "400"],
+                        [YEAR + "0111", rice[0], "", "10kg", "400"],
+                        [YEAR + "0121", rice[0], "", "5kg", "200"],
+                        [YEAR + "0101", salt[0], "", "2", "30"],
+                        [YEAR + "0301", salt[0], "", "4", "60"],
+                        [YEAR + "0101", oil[0], "", "1", "110"]])
+    report = get_reorder_report()
+    # oil purchased only once
+    assert [product[1] for product, forecast in report]==["Rice", "Salt"]
+    forecast = report[0][1]
+    assert (forecast["count"], forecast["interval"], forecast["daily_usage"])==(3, 10, 1)
+    assert forecast["run_out_date"]==YEAR + "0126"
+    assert get_reorder_report(YEAR + "0126")==report[:1]
+    # only forecast of changed product is computed again
+    salt_forecast = Forecasts.cache[salt[0]][1]
+    save_new_purchases([[YEAR + "0104", oil[0], "", "1", "110"]])
+    report = get_reorder_report()
+    assert Forecasts.cache[salt[0]][1] is salt_forecast
+    assert [product[1] for product, forecast in report]==["Oil", "Rice", "Salt"]
+    delete_purchases([[YEAR + "0104", oil[0], "", "1", "110"]])
+    delete_product(rice)
+    assert [product[1] for product, forecast in get_reorder_report()]==["Salt"]
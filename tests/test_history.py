@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" purchase history of products """
+import time
+
+from pricemem.core import (save_new_product, save_new_purchases, delete_purchases,
+    get_product_history)
+from pricemem.core.history import get_product_purchases
+
+from conftest import run_instance, use_data_dir
+
+YEAR = time.strftime("%Y")
+
+
+def test_product_purchases_follow_changes(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    oil = save_new_product("Oil", "", "Grocery", "120", "")
+    save_new_purchases([[YEAR + "0110", rice[0], "", "5", "200"],
+                        [YEAR + "0105", rice[0], "", "2", "90"],
+                        [YEAR + "0107", oil[0], "", "1", "110"]])
+    rows = get_product_purchases(rice[0])
+    assert [row[0] for row in rows]==[YEAR + "0105", YEAR + "0110"]
+    # the list is replaced only when purchases of the product change
+    save_new_purchases([[YEAR + "0108", oil[0], "", "1", "115"]])
+    assert get_product_purchases(rice[0]) is rows
+    save_new_purchases([[YEAR + "0107", rice[0], "", "1", "42"]])
+    assert get_product_purchases(rice[0]) is not rows
+    delete_purchases([[YEAR + "0110", rice[0], "", "5", "200"]])
+    assert get_product_history(rice[0])==[[YEAR + "0105", "2", "90", 45.0],
+                                          [YEAR + "0107", "1", "42", 42.0]]
+
+
+def test_history_of_reloaded_data(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_purchases([[YEAR + "0105", rice[0], "", "2", "90"]])
+    assert len(get_product_purchases(rice[0]))==1
+    run_instance(data_dir, 'save_new_purchases([[%r, %r, "", "1", "50"]])' % (YEAR + "0106", rice[0]))
+    use_data_dir(data_dir)
+    assert [row[4] for row in get_product_purchases(rice[0])]==["90", "50"]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" content addressed store of product images """
+import os
+
+from pricemem.core import (App, save_new_product, delete_product, get_image_path,
+    set_product_image, set_product_images)
+from pricemem.core.images import get_reference_counts
+
+from conftest import use_data_dir
+
+
+def image_files():
+    return sorted(name for name in os.listdir(App.IMAGES_DIR) if name.endswith(".jpg"))
+
+
+def test_same_image_is_saved_once(data_dir):
+    set_product_images({"P00001": b"photo", "P00002": b"photo", "P00003": b"other"})
+    assert get_image_path("P00001")==get_image_path("P00002")
+    assert len(image_files())==2
+    assert sorted(get_reference_counts().values())==[1, 2]
+    with open(get_image_path("P00003"), "rb") as f:
+        assert f.read()==b"other"
+
+
+def test_image_is_removed_when_not_referred(data_dir):
+    set_product_images({"P00001": b"photo", "P00002": b"photo"})
+    filename = get_image_path("P00001")
+    set_product_image("P00001", None)
+    assert get_image_path("P00001") is None
+    assert os.path.exists(filename)
+    # replacing the image of last product releases the old one
+    set_product_image("P00002", b"new photo")
+    assert not os.path.exists(filename)
+    assert len(image_files())==1
+
+
+def test_deleted_product_releases_image(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    set_product_image(rice[0], b"photo")
+    delete_product(rice)
+    assert get_image_path(rice[0]) is None
+    assert image_files()==[]
+
+
+def test_images_of_old_version_are_migrated(tmp_path):
+    data_dir = tmp_path / "PriceMem"
+    images_dir = data_dir / "images"
+    images_dir.mkdir(parents=True)
+    for pdt_id, data in (("P00001", b"photo"), ("P00002", b"photo"), ("P00003", b"other")):
+        (images_dir / (pdt_id + ".jpg")).write_bytes(data)
+    use_data_dir(data_dir)
+    assert len(image_files())==2
+    assert get_image_path("P00001")==get_image_path("P00002")
+    with open(get_image_path("P00003"), "rb") as f:
+        assert f.read()==b"other"
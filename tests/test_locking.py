@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" multiple instances writing in same data directory """
+import subprocess
+import sys
+from datetime import datetime
+
+from pricemem.core import (App, save_new_product, update_product, delete_product,
+    save_new_purchases, delete_purchases, get_purchases, get_stock, read_csv_file)
+from pricemem.core.file_io import update_last_product_id
+
+from conftest import ROOT_DIR, run_instance, use_data_dir
+
+
+def test_edit_keeps_products_deleted_by_other_instance(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    oil = save_new_product("Oil", "", "Grocery", "120", "")
+    run_instance(data_dir, "delete_product(App.products[0])")
+    update_product(oil, "Oil", "Fortune", "Grocery", "125", "")
+    rows = read_csv_file(App.PRODUCTS_FILE, 7)
+    assert rows==[[oil[0], "Oil", "Fortune", "Grocery", "125", "", ""]]
+    assert App.products==rows
+
+
+def test_delete_keeps_products_edited_by_other_instance(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    oil = save_new_product("Oil", "", "Grocery", "120", "")
+    run_instance(data_dir, "update_product(App.products[0], 'Rice', 'Aroma', 'Grocery', '55', '')")
+    delete_product(oil)
+    assert read_csv_file(App.PRODUCTS_FILE, 7)==[[rice[0], "Rice", "Aroma", "Grocery", "55", "", ""]]
+
+
+def test_delete_after_other_instance_archived(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    old_year = datetime.today().year - 5
+    this_year = datetime.today().year
+    save_new_purchases([["%d0105" % old_year, rice[0], "", "2", "80"],
+                        ["%d0105" % this_year, rice[0], "", "3", "120"],
+                        ["%d0106" % this_year, rice[0], "", "1", "40"]])
+    # other instance moves the old purchase to archive, rewriting purchases file
+    run_instance(data_dir, "")
+    delete_purchases([["%d0106" % this_year, rice[0], "", "1", "40"]])
+    live = read_csv_file(App.PURCHASES_FILE, 5)
+    assert live==[["%d0105" % this_year, rice[0], "", "3", "120"]]
+    assert len(get_purchases())==2
+    assert get_stock(rice[0])==5
+    use_data_dir(data_dir)
+    assert get_stock(rice[0])==5
+
+
+def test_concurrent_new_products_get_unique_ids(data_dir):
+    script = "\n".join(["import sys", "sys.path.insert(0, %r)" % ROOT_DIR,
+        "from pricemem.core import *", "set_data_dir(%r)" % str(data_dir), "load_data()",
+        "for i in range(20): save_new_product('Item %d' % i, '', 'G', '1', '')"])
+    processes = [subprocess.Popen([sys.executable, "-c", script]) for i in range(4)]
+    for process in processes:
+        assert process.wait()==0
+    use_data_dir(data_dir)
+    ids = [product[0] for product in App.products]
+    assert len(ids)==80 and len(set(ids))==80
+
+
+def test_product_id_after_P99999(data_dir):
+    save_new_product("Salt", "", "Grocery", "20", "")
+    update_last_product_id([["P99999"]])
+    product = save_new_product("Rice", "", "Grocery", "50", "")
+    assert product[0]=="P100000"
+    save_new_product("Oil", "", "Grocery", "120", "")
+    use_data_dir(data_dir)
+    assert App.last_product_id=="P100001"
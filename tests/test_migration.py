@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" conversion of purchases of old format, which had title in every row """
+from datetime import datetime
+
+from pricemem.core import (App, save_new_product, delete_product, get_purchases,
+    get_purchase_titles, get_purchase_title, read_csv_file)
+from pricemem.core.file_io import PURCHASES_HEADER, PRODUCTS_HEADER
+from pricemem.core.archive import read_segment
+
+from conftest import use_data_dir
+
+OLD_PRODUCTS = """ID, Name, Brand, Category, Price, Description
+P00001,Rice,Aroma,Grocery,50,
+P00002,Oil,,Grocery,120,
+"""
+
+def old_purchases(year):
+    return """Date, Product ID, Title, Quantity, Price
+{0}0105,P00001,Rice (Aroma),2kg,80
+{0}0106,P00002,Tea Old,1,40
+{0}0107,P00003,Sugar (Old),1kg,45
+""".format(year)
+
+
+def write_old_data(data_dir, year):
+    data_dir.mkdir(parents=True, exist_ok=True)
+    (data_dir / "products.csv").write_text(OLD_PRODUCTS)
+    (data_dir / "purchases.csv").write_text(old_purchases(year))
+
+
+def shown_titles():
+    titles = get_purchase_titles()
+    return [get_purchase_title(row, titles) for row in get_purchases()]
+
+
+def test_migration_keeps_titles_of_other_items(tmp_path):
+    data_dir = tmp_path / "PriceMem"
+    write_old_data(data_dir, datetime.today().year)
+    use_data_dir(data_dir)
+    with open(App.PURCHASES_FILE) as f:
+        assert f.readline()==PURCHASES_HEADER
+    # only the title same as current product is removed
+    assert [row[2] for row in read_csv_file(App.PURCHASES_FILE, 5)]==["", "Tea Old", "Sugar (Old)"]
+    assert shown_titles()==["Rice (Aroma)", "Tea Old", "Sugar (Old)"]
+
+
+def test_products_get_barcode_column(tmp_path):
+    data_dir = tmp_path / "PriceMem"
+    write_old_data(data_dir, datetime.today().year)
+    use_data_dir(data_dir)
+    with open(App.PRODUCTS_FILE) as f:
+        assert f.readline()==PRODUCTS_HEADER
+    assert App.products[1]==["P00002", "Oil", "", "Grocery", "120", "", ""]
+
+
+def test_archived_rows_are_migrated(tmp_path):
+    data_dir = tmp_path / "PriceMem"
+    write_old_data(data_dir, datetime.today().year - 5)
+    use_data_dir(data_dir)
+    year = str(datetime.today().year - 5)
+    assert [row[2] for row in read_segment(year)]==["", "Tea Old", "Sugar (Old)"]
+    assert shown_titles()==["Rice (Aroma)", "Tea Old", "Sugar (Old)"]
+
+
+def test_ids_in_purchases_are_not_reused(tmp_path):
+    data_dir = tmp_path / "PriceMem"
+    write_old_data(data_dir, datetime.today().year)
+    use_data_dir(data_dir)
+    product = save_new_product("Salt", "", "Grocery", "20", "")
+    assert product[0]=="P00004"
+    assert shown_titles()==["Rice (Aroma)", "Tea Old", "Sugar (Old)"]
+
+
+def test_renamed_and_deleted_products(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    from pricemem.core import save_new_purchases, update_product
+    save_new_purchases([["20240105", rice[0], "", "2", "80"]])
+    update_product(rice, "Basmati Rice", "", "Grocery", "60", "")
+    assert shown_titles()==["Basmati Rice"]
+    delete_product(rice)
+    use_data_dir(data_dir)
+    assert shown_titles()==["Basmati Rice"]
+    assert save_new_product("Oil", "", "Grocery", "120", "")[0]=="P00002"
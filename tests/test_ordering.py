@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" maintained sort orders of products """
+import time
+
+from pricemem.core import (App, save_new_product, update_product, delete_product,
+    save_new_purchases, delete_purchases, search_products, sort_products)
+from pricemem.core.ordering import build_ordering, Ordering
+
+from conftest import run_instance, use_data_dir
+
+YEAR = time.strftime("%Y")
+
+
+def names(products):
+    return [product[1] for product in products]
+
+
+def test_orders_follow_changes(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    salt = save_new_product("salt", "", "Grocery", "20", "")
+    oil = save_new_product("Oil", "", "Grocery", "120", "")
+    assert names(sort_products("name"))==["Oil", "Rice", "salt"]
+    assert names(sort_products("price"))==["salt", "Rice", "Oil"]
+    assert names(sort_products("recently_added"))==["Oil", "salt", "Rice"]
+    save_new_purchases([[YEAR + "0105", rice[0], "", "5", "200"],
+                        [YEAR + "0110", rice[0], "", "5", "200"],
+                        [YEAR + "0108", salt[0], "", "5", "80"]])
+    assert names(sort_products("recently_purchased"))==["Rice", "salt", "Oil"]
+    assert names(sort_products("frequently_purchased"))==["Rice", "salt", "Oil"]
+    delete_purchases([[YEAR + "0110", rice[0], "", "5", "200"]])
+    assert names(sort_products("recently_purchased"))==["salt", "Rice", "Oil"]
+    update_product(oil, "Mustard Oil", "", "Grocery", "10", "")
+    delete_product(salt)
+    assert names(sort_products("price"))==["Mustard Oil", "Rice"]
+    assert names(sort_products("name"))==["Mustard Oil", "Rice"]
+    # same as built from scratch
+    sorted_keys = Ordering.sorted_keys
+    build_ordering()
+    assert Ordering.sorted_keys==sorted_keys
+
+
+def test_delete_archived_purchase(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    salt = save_new_product("Salt", "", "Grocery", "20", "")
+    old = ["20150105", rice[0], "", "1", "40"]
+    save_new_purchases([old, [YEAR + "0105", rice[0], "", "5", "200"],
+                        [YEAR + "0110", rice[0], "", "5", "200"]])
+    # the old purchase is moved to archive
+    use_data_dir(data_dir)
+    sort_products("frequently_purchased")
+    save_new_purchases([[YEAR + "0106", salt[0], "", "1", "20"],
+                        [YEAR + "0107", salt[0], "", "1", "20"]])
+    delete_purchases([list(old), [YEAR + "0106", salt[0], "", "1", "20"]])
+    assert Ordering.purchase_count=={rice[0]: 2, salt[0]: 1}
+    assert names(sort_products("frequently_purchased"))==["Rice", "Salt"]
+
+
+def test_pages_and_search_result(data_dir):
+    for i in range(20):
+        save_new_product("Item %02d" % i, "", "Grocery", str(100 - i), "")
+    assert names(sort_products("price", start=5, count=3))==["Item 14", "Item 13", "Item 12"]
+    result = search_products("1")
+    assert names(sort_products("name", result, count=2))==["Item 01", "Item 10"]
+    assert names(sort_products("price", result[:2]))==["Item 10", "Item 01"]
+
+
+def test_orders_of_reloaded_data(data_dir):
+    save_new_product("Rice", "", "Grocery", "50", "")
+    assert names(sort_products("name"))==["Rice"]
+    run_instance(data_dir, 'save_new_product("Oil", "", "Grocery", "120", "")')
+    use_data_dir(data_dir)
+    assert names(sort_products("name"))==["Oil", "Rice"]
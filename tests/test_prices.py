@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" sell price versions and prices on a date """
+import time
+
+from pricemem.core import (App, save_new_product, update_product, save_new_purchases,
+    get_purchase_on, get_sell_price_on, get_price_versions)
+from pricemem.core.file_io import clear_products_data
+from pricemem.core.prices import save_price_change, sync_prices
+
+from conftest import run_instance, use_data_dir
+
+YEAR = time.strftime("%Y")
+TODAY = time.strftime("%Y%m%d")
+
+
+def test_sell_price_on_date(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    # never changed, so the current price
+    assert get_sell_price_on(rice[0], "20200101")=="50"
+    save_price_change(rice[0], "50", "55", YEAR + "0110")
+    save_price_change(rice[0], "55", "60", YEAR + "0120")
+    assert get_sell_price_on(rice[0], "20200101")=="50"
+    assert get_sell_price_on(rice[0], YEAR + "0110")=="55"
+    assert get_sell_price_on(rice[0], YEAR + "0119")=="55"
+    assert get_sell_price_on(rice[0], YEAR + "1231")=="60"
+    # the last change of a day is effective
+    save_price_change(rice[0], "60", "58", YEAR + "0120")
+    assert [price for date, price in get_price_versions(rice[0])]==["50", "55", "58"]
+
+
+def test_edit_saves_price_version(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    update_product(rice, "Basmati Rice", "", "Grocery", "50", "")
+    assert get_price_versions(rice[0])==[]
+    update_product(rice, "Basmati Rice", "", "Grocery", "65", "")
+    assert get_price_versions(rice[0])==[("00000000", "50"), (TODAY, "65")]
+    # saved by other instance
+    run_instance(data_dir, 'update_product(App.products[0], "Rice", "", "Grocery", "70", "")')
+    assert get_sell_price_on(rice[0], TODAY)=="70"
+    use_data_dir(data_dir)
+    assert len(get_price_versions(rice[0]))==2
+
+
+def test_cleared_products_prices_not_reused(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    update_product(rice, "Rice", "", "Grocery", "60", "")
+    clear_products_data()
+    soap = save_new_product("Soap", "", "Toiletries", "20", "")
+    # id of deleted product is reused, as it was never purchased
+    assert soap[0]==rice[0]
+    assert get_price_versions(soap[0])==[]
+    use_data_dir(data_dir)
+    assert App.products[0][4]=="20"
+    assert get_sell_price_on(soap[0], TODAY)=="20"
+
+
+def test_purchase_on_date(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_purchases([[YEAR + "0110", rice[0], "", "2", "90"],
+                        [YEAR + "0105", rice[0], "", "1", "40"]])
+    assert get_purchase_on(rice[0], YEAR + "0101") is None
+    assert get_purchase_on(rice[0], YEAR + "0109")==[YEAR + "0105", "1", "40", 40.0]
+    assert get_purchase_on(rice[0], YEAR + "1231")[0]==YEAR + "0110"
+
+
+def test_price_only_edit_appends_version(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_product("Oil", "", "Grocery", "120", "")
+    with open(App.PRODUCTS_FILE) as f:
+        products_csv = f.read()
+    update_product(rice, "Rice", "", "Grocery", "55", "")
+    with open(App.PRODUCTS_FILE) as f:
+        assert f.read()==products_csv
+    assert App.products[0][4]=="55"
+    # price of latest version is loaded
+    use_data_dir(data_dir)
+    assert App.products[0][4]=="55"
+    run_instance(data_dir, 'update_product(App.products[0], "Rice", "", "Grocery", "60", "")')
+    assert sync_prices()
+    assert App.products[0][4]=="60"
+    # products file is rewritten with latest price, when other details are changed
+    update_product(App.products[0], "Basmati Rice", "", "Grocery", "60", "")
+    use_data_dir(data_dir)
+    assert App.products[0][1:5]==["Basmati Rice", "", "Grocery", "60"]
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" two nodes syncing through a shared folder """
+import json
+import shutil
+
+import pytest
+
+from pricemem.core import (App, save_new_product, update_product, save_new_purchases,
+    save_new_sales, get_purchases, get_stock, read_sales_file)
+from pricemem.core.prices import get_price_versions
+from pricemem.core.replication import Replication, enable_replication, sync_folder
+
+from conftest import run_instance, use_data_dir
+
+
+@pytest.fixture
+def nodes(tmp_path):
+    """ returns (node_a, node_b, shared folder). node_a is loaded """
+    folder = tmp_path / "shared"
+    folder.mkdir()
+    node_a, node_b = tmp_path / "A", tmp_path / "B"
+    for node in (node_b, node_a):
+        use_data_dir(node)
+        enable_replication()
+    return node_a, node_b, str(folder)
+
+
+def sync(node, folder):
+    use_data_dir(node)
+    return sync_folder(folder)
+
+
+def titles():
+    return sorted(product[1] for product in App.products)
+
+
+def test_products_added_on_both_nodes_are_kept(nodes):
+    node_a, node_b, folder = nodes
+    oil = save_new_product("Oil", "", "Grocery", "120", "")
+    use_data_dir(node_b)
+    salt = save_new_product("Salt", "", "Grocery", "20", "")
+    assert oil[0]!=salt[0]
+    sync(node_a, folder)
+    sync(node_b, folder)
+    sync(node_a, folder)
+    assert titles()==["Oil", "Salt"]
+    use_data_dir(node_b)
+    assert titles()==["Oil", "Salt"]
+
+
+def test_latest_edit_wins_on_both_nodes(nodes):
+    node_a, node_b, folder = nodes
+    save_new_product("Rice", "", "Grocery", "50", "")
+    sync(node_a, folder)
+    sync(node_b, folder)
+    update_product(App.products[0], "Rice", "", "Grocery", "55", "")
+    use_data_dir(node_a)
+    update_product(App.products[0], "Rice", "", "Grocery", "60", "")
+    sync(node_a, folder)
+    sync(node_b, folder)
+    sync(node_a, folder)
+    assert App.products[0][4]=="60"
+    use_data_dir(node_b)
+    assert App.products[0][4]=="60"
+
+
+def test_price_changed_by_other_instance_while_receiving(nodes):
+    node_a, node_b, folder = nodes
+    use_data_dir(node_b)
+    save_new_product("Salt", "", "Grocery", "20", "")
+    sync_folder(folder)
+    # other instance (of a version without replication) adds and later renames
+    # and reprices a product, which is loaded while the received one is saved
+    no_replication = "from pricemem.core.replication import Replication\nReplication.enabled = False\n"
+    run_instance(node_a, no_replication + 'save_new_product("Rice", "", "Grocery", "50", "")')
+    use_data_dir(node_a)
+    rice = App.products[0]
+    run_instance(node_a, no_replication +
+                'update_product(App.products[0], "Basmati Rice", "", "Grocery", "70", "")')
+    sync_folder(folder)
+    assert titles()==["Basmati Rice", "Salt"]
+    assert [price for date, price in get_price_versions(rice[0])]==["50", "70"]
+
+
+def test_seeded_copies_do_not_duplicate_history(tmp_path):
+    folder = tmp_path / "shared"
+    folder.mkdir()
+    node_a, node_b = tmp_path / "A", tmp_path / "B"
+    use_data_dir(node_a)
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_purchases([["20240105", rice[0], "", "2", "80"],
+                        ["20240105", rice[0], "", "2", "80"]])
+    save_new_sales([["20240106", "1", rice[0], "1", "50"]])
+    # node B starts from a copy of the same data
+    shutil.copytree(node_a, node_b)
+    for node in (node_a, node_b):
+        use_data_dir(node)
+        enable_replication()
+    for node in (node_a, node_b, node_a):
+        sync(node, str(folder))
+    for node in (node_a, node_b):
+        use_data_dir(node)
+        assert len(get_purchases())==2
+        assert len(read_sales_file())==1
+        assert get_stock(rice[0])==3
+
+
+def test_new_node_receives_seeded_data(nodes, tmp_path):
+    node_a, node_b, folder = nodes
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_purchases([["20240105", rice[0], "", "5", "200"]])
+    save_new_sales([["20240106", "1", rice[0], "1", "50"]])
+    sync(node_a, folder)
+    node_c = tmp_path / "C"
+    use_data_dir(node_c)
+    sync_folder(folder)
+    assert titles()==["Rice"]
+    assert get_stock(rice[0])==4
+
+
+def test_deltas_after_gap_are_imported_later(nodes):
+    node_a, node_b, folder = nodes
+    save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_product("Oil", "", "Grocery", "120", "")
+    sync(node_a, folder)
+    # the first delta of A is missing from its log, e.g not yet copied by a file sync tool
+    log_filename = "%s/%s.log" % (folder, Replication.node_id)
+    with open(log_filename) as f:
+        lines = f.readlines()
+    with open(log_filename, "w") as f:
+        f.writelines(lines[1:])
+    sync(node_b, folder)
+    assert titles()==[]
+    with open(log_filename, "w") as f:
+        f.writelines(lines)
+    # the log was rewritten, so read it again from beginning
+    use_data_dir(node_b)
+    with open(str(node_b) + "/sync_state.json") as f:
+        state = json.load(f)
+    assert state["imported"][log_filename.split("/")[-1]]==0
+    sync_folder(folder)
+    assert titles()==["Oil", "Rice"]
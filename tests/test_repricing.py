@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" changing price of many products at once """
+import time
+
+from pricemem.core import (App, save_new_product, save_new_purchases, filter_products,
+    sort_products, get_price_versions, preview_repricing, apply_repricing)
+
+from conftest import use_data_dir
+
+YEAR = time.strftime("%Y")
+
+
+def prices(changes):
+    return {product[1]: price for product, price in changes}
+
+
+def test_repricing_rules(data_dir):
+    rice = save_new_product("Rice", "Tata", "Grocery", "50", "")
+    salt = save_new_product("Salt", "Tata", "Grocery", "21", "")
+    save_new_product("Oil", "Fortune", "Grocery", "abc", "")
+    grocery = filter_products(category="Grocery")
+    assert prices(preview_repricing(grocery, "percent", 10))=={"Rice": "55", "Salt": "23.1"}
+    assert prices(preview_repricing(grocery, "percent", 10, 5))=={"Rice": "55", "Salt": "25"}
+    assert prices(preview_repricing(grocery, "amount", -1))=={"Rice": "49", "Salt": "20"}
+    # margin over last purchase rate, products never purchased are skipped
+    save_new_purchases([[YEAR + "0101", rice[0], "", "10kg", "400"],
+                        [YEAR + "0105", rice[0], "", "5kg", "225"]])
+    assert prices(preview_repricing(grocery, "margin", 20))=={"Rice": "54"}
+    # unchanged prices are not in preview
+    assert preview_repricing([salt], "percent", 0)==[]
+
+
+def test_apply_repricing(data_dir):
+    rice = save_new_product("Rice", "Tata", "Grocery", "50", "")
+    salt = save_new_product("Salt", "Tata", "Grocery", "20", "")
+    save_new_product("Bulb", "Philips", "Electricals", "100", "")
+    with open(App.PRODUCTS_FILE) as f:
+        products_csv = f.read()
+    changes = preview_repricing(filter_products(brand="Tata"), "percent", 10)
+    assert apply_repricing(changes)==[rice, salt]
+    assert rice[4]=="55" and salt[4]=="22"
+    assert [product[1] for product in sort_products("price")]==["Salt", "Rice", "Bulb"]
+    # saved in prices file only
+    with open(App.PRODUCTS_FILE) as f:
+        assert f.read()==products_csv
+    use_data_dir(data_dir)
+    assert [product[4] for product in App.products]==["55", "22", "100"]
+    assert [price for date, price in get_price_versions(salt[0])]==["20", "22"]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" price server and client """
+import time
+import socket
+import asyncio
+import threading
+from urllib.error import HTTPError
+
+import pytest
+
+from pricemem.core import App, save_new_product, get_stock
+from pricemem.core.server import PriceServer
+from pricemem.core.client import PriceClient
+
+from conftest import run_instance
+
+
+async def stop_server(server, tcp_server):
+    tcp_server.close()
+    server.sync_task.cancel()
+    await asyncio.gather(server.sync_task, return_exceptions=True)
+
+@pytest.fixture
+def server_url(data_dir):
+    """ runs price server with token 'secret' in other thread, returns its url """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    server = PriceServer("secret")
+    server.sync_interval = 0.1
+    start = server.start("127.0.0.1", 0)
+    tcp_server = asyncio.run_coroutine_threadsafe(start, loop).result(5)
+    yield "%s:%d" % tcp_server.sockets[0].getsockname()[:2]
+    asyncio.run_coroutine_threadsafe(stop_server(server, tcp_server), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_purchases_and_sales_update_stock(server_url):
+    rice = save_new_product("Rice", "", "Grocery", "50", "", "8901234567890")
+    client = PriceClient("secret@" + server_url)
+    assert client.products()==[rice]
+    assert client.price(rice[0])=="50"
+    client.saveNewPurchases([["20240105", rice[0], "", "5", "200"]])
+    client.saveNewSales([["20240106", "1", rice[0], "2", "100"]])
+    assert client.product(rice[0])["stock"]==3
+    assert get_stock(rice[0])==3
+    assert client.get("/purchases")==[["20240105", rice[0], "Rice", "5", "200"]]
+    assert len(client.history(rice[0]))==1
+
+
+def test_changes_of_other_instance_are_served(server_url, data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    client = PriceClient(server_url)
+    assert client.price(rice[0])=="50"
+    run_instance(data_dir, 'update_product(App.products[0], "Rice", "", "Grocery", "70", "")\n'
+                'save_new_product("Oil", "", "Grocery", "150", "")\n'
+                'save_new_purchases([["20240105", App.products[0][0], "", "5", "200"]])')
+    # loaded by the server within its sync interval
+    deadline = time.time() + 5
+    while client.product(rice[0])["stock"]!=5 and time.time()<deadline:
+        time.sleep(0.05)
+    assert client.product(rice[0])["stock"]==5
+    assert client.price(rice[0])=="70"
+    assert [p[1] for p in client.search("oil")]==["Oil"]
+
+
+def test_post_requires_token(server_url):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    for client in (PriceClient(server_url), PriceClient("wrong@" + server_url)):
+        with pytest.raises(HTTPError) as error:
+            client.saveNewPurchases([["20240105", rice[0], "", "5", "200"]])
+        assert error.value.code==401
+    # reading does not require token
+    assert PriceClient(server_url).price(rice[0])=="50"
+    assert App.purchases==[]
+
+
+@pytest.mark.parametrize("request_data", [
+    b"GARBAGE\r\n\r\n",
+    b"GET /products HTTP/1.1\r\nBad Header\r\n\r\n",
+    b"POST /sales HTTP/1.1\r\nContent-Length: ten\r\n\r\n",
+])
+def test_malformed_request(server_url, request_data):
+    host, port = server_url.split(":")
+    with socket.create_connection((host, int(port)), timeout=5) as sock:
+        sock.sendall(request_data)
+        assert sock.recv(1024).startswith(b"HTTP/1.1 400 Bad Request")
+
+
+@pytest.mark.parametrize("row", [
+    ["05/01/2024", "P00001", "", "5", "200"],
+    ["20241305", "P00001", "", "5", "200"],
+    ["20240105", "", "", "5", "200"],
+    ["20240105", "P00001", "", "kg", "200"],
+    ["20240105", "P00001", "", "5", "abc"],
+    ["20240105", "P00001", "", "5", "nan"],
+    ["20240105", "P00001", "5", "200"],
+])
+def test_invalid_purchase_is_rejected(server_url, row):
+    with pytest.raises(HTTPError) as error:
+        PriceClient("secret@" + server_url).saveNewPurchases([row])
+    assert error.value.code==400
+    assert App.purchases==[]
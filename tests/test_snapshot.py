@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" snapshot of loaded data """
+import os
+import time
+from datetime import datetime
+
+from pricemem.core import App, save_new_product, save_new_purchases, get_stock
+from pricemem.core.snapshot import (load_snapshot, save_snapshot, snapshot_filename,
+    data_filenames)
+
+from conftest import run_instance, use_data_dir
+
+TODAY = datetime.today().strftime("%Y%m%d")
+
+
+def make_data_files_old():
+    """ data files modified just before the snapshot are never trusted """
+    old = time.time() - 60
+    for filename in data_filenames():
+        if os.path.exists(filename):
+            os.utime(filename, (old, old))
+    assert save_snapshot()
+
+
+def make_data(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_purchases([[TODAY, rice[0], "", "5", "200"]])
+    use_data_dir(data_dir)
+    make_data_files_old()
+    return rice
+
+
+def test_unchanged_data_is_loaded_from_snapshot(data_dir):
+    rice = make_data(data_dir)
+    products, purchases = App.products, App.purchases
+    App.products, App.purchases, App.stock = [], [], {}
+    assert load_snapshot()
+    assert App.products==products==[rice]
+    assert App.purchases==purchases
+    assert get_stock(rice[0])==5
+
+
+def test_changed_data_is_parsed(data_dir):
+    rice = make_data(data_dir)
+    run_instance(data_dir, "save_new_purchases([[%r, %r, '', '2', '80']])" % (TODAY, rice[0]))
+    assert load_snapshot() is None
+    use_data_dir(data_dir)
+    assert len(App.purchases)==2
+    assert get_stock(rice[0])==7
+
+
+def test_recently_modified_data_is_parsed(data_dir):
+    make_data(data_dir)
+    os.utime(App.PRODUCTS_FILE)
+    assert load_snapshot() is None
+
+
+def test_corrupted_snapshot_is_ignored(data_dir):
+    rice = make_data(data_dir)
+    with open(snapshot_filename(), "wb") as f:
+        f.write(b"garbage")
+    use_data_dir(data_dir)
+    assert App.products==[rice]
+    assert get_stock(rice[0])==5
+
+
+def test_snapshot_is_not_saved_when_file_changed_after_read(data_dir):
+    rice = make_data(data_dir)
+    run_instance(data_dir, "save_new_product('Oil', '', 'Grocery', '120', '')")
+    assert not save_snapshot()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# This file is a part of PriceMem Program which is GNU GPLv3 licensed
+# Copyright (C) 2024 Arindam Chaudhuri <arindamsoft94@gmail.com>
+""" loading changes made by other instance, as done on file change notification """
+from datetime import datetime
+
+from pricemem.core import (App, save_new_product, save_new_purchases, save_new_sales, get_stock,
+    sync_products, sync_deleted_products, sync_purchases, sync_sales)
+from pricemem.core.common import data_listeners
+
+from conftest import run_instance
+
+TODAY = datetime.today().strftime("%Y%m%d")
+
+
+def test_appended_data_is_loaded_incrementally(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_purchases([[TODAY, rice[0], "", "5", "200"]])
+    save_new_sales([[TODAY, "1", rice[0], "1", "50"]])
+    changes = []
+    data_listeners.append(lambda op, data, local : changes.append((op, local)))
+    try:
+        run_instance(data_dir, "\n".join([
+            "save_new_product('Oil', '', 'Grocery', '120', '')",
+            "save_new_purchases([[%r, %r, '', '2', '80']])" % (TODAY, rice[0]),
+            "save_new_sales([[%r, '2', %r, '1', '50']])" % (TODAY, rice[0])]))
+        assert sync_products() and sync_purchases() and sync_sales()
+        assert not (sync_products() or sync_purchases() or sync_sales())
+    finally:
+        data_listeners.pop()
+    assert [product[1] for product in App.products]==["Rice", "Oil"]
+    assert len(App.purchases)==2
+    assert get_stock(rice[0])==5
+    assert changes==[("add_product", False), ("add_purchases", False), ("add_sales", False)]
+
+
+def test_rewritten_file_is_reloaded(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    oil = save_new_product("Oil", "", "Grocery", "120", "")
+    run_instance(data_dir, "delete_product(App.products[0])")
+    assert sync_products()
+    assert App.products==[oil]
+    assert App.deleted_products=={rice[0]: "Rice"}
+
+
+def test_deleted_products_are_loaded(data_dir):
+    rice = save_new_product("Rice", "", "Grocery", "50", "")
+    save_new_product("Oil", "", "Grocery", "120", "")
+    assert not sync_deleted_products()
+    run_instance(data_dir, "delete_product(App.products[0])")
+    assert sync_deleted_products()
+    assert not sync_deleted_products()
+    assert App.deleted_products=={rice[0]: "Rice"}